@@ -12,21 +12,54 @@ __version__ = "0.1.0"
 __author__ = "Saber Zerhoudi"
 __email__ = "saber.zerhoudi@uni-passau.de"
 
-from .analyzer import LegalCrawlAnalyzer
-from .detector import LegalDocumentDetector
-from .extractor import HTMLContentExtractor
-from .fetcher import CommonCrawlFetcher
-from .gpt_analyzer import GPTLegalAnalyzer
-from .models import (
-    LegalDocument,
-    CopyrightClause,
-    AccessLevel,
-    PhaseOneStats,
-    PhaseTwoStats
-)
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+# Public names and the submodules that define them. They are imported on first
+# attribute access (PEP 562), so `import legal_crawl_analysis` or a single submodule
+# import doesn't pull in pandas, warcio, bs4, readability or the LLM clients.
+_LAZY_ATTRIBUTES = {
+    "LegalCrawlAnalyzer": ".analyzer",
+    "ThreePhaseLegalAnalyzer": ".analyzer",
+    "LegalDocumentDetector": ".detector",
+    "HTMLContentExtractor": ".extractor",
+    "CommonCrawlFetcher": ".fetcher",
+    "GPTLegalAnalyzer": ".gpt_analyzer",
+    "LegalDocument": ".models",
+    "CopyrightClause": ".models",
+    "AccessLevel": ".models",
+    "PhaseOneStats": ".models",
+    "PhaseTwoStats": ".models",
+}
+
+if TYPE_CHECKING:
+    from .analyzer import LegalCrawlAnalyzer, ThreePhaseLegalAnalyzer
+    from .detector import LegalDocumentDetector
+    from .extractor import HTMLContentExtractor
+    from .fetcher import CommonCrawlFetcher
+    from .gpt_analyzer import GPTLegalAnalyzer
+    from .models import (
+        LegalDocument,
+        CopyrightClause,
+        AccessLevel,
+        PhaseOneStats,
+        PhaseTwoStats
+    )
+
+def __getattr__(name):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
 
 __all__ = [
     "LegalCrawlAnalyzer",
+    "ThreePhaseLegalAnalyzer",
     "LegalDocumentDetector", 
     "HTMLContentExtractor",
     "CommonCrawlFetcher",
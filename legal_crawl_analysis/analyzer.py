@@ -7,36 +7,86 @@ Phase 3: Passage extraction and storage (parquet format)
 
 import json
 import gzip
+import importlib.util
 import time
 import logging
 import signal
 import shutil
 import re
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 from dataclasses import asdict
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
-# Try to import pandas, fall back gracefully if not available
-try:
-    import pandas as pd
-    HAS_PANDAS = True
-except ImportError:
-    HAS_PANDAS = False
+# pandas is only needed to write parquet and is imported there (it dominates startup time)
+HAS_PANDAS = importlib.util.find_spec('pandas') is not None
+if not HAS_PANDAS:
     logging.warning("pandas not available. Install with: pip install pandas pyarrow")
 
 from warcio.archiveiterator import ArchiveIterator
-from warcio.warcwriter import WARCWriter
 from warcio.statusandheaders import StatusAndHeaders
-import tldextract
 
 from .models import LegalDocument, CopyrightClause, AccessLevel, PhaseOneStats, PhaseTwoStats
-from .fetcher import CommonCrawlFetcher
+from .fetcher import CommonCrawlFetcher, CONTENT_RECORD_TYPES, warc_stem
 from .detector import LegalDocumentDetector
 from .extractor import HTMLContentExtractor
+from .domains import domain_info
 from .gpt_analyzer import GPTLegalAnalyzer
+from .llm_backends import LLMBackend
+from .router import ModelTierRouter
+from .scheduler import Phase3Scheduler, Phase3WorkItem
+from .preclassifier import PreClassifier, estimate_analysis_tokens
+from .work_queue import WorkQueue, LeaseHeartbeat
+from .progress_store import SQLiteProgressTracker
+from .handoff import RenameClaimer, partial_path, publish, mark_phase_complete, is_phase_complete
+from .profiling import PhaseProfiler
+from .pattern_profiler import PatternStats, instrument_detector
+from .domain_quota import DomainQuota, phase2_candidate, phase3_candidate
+from .index_fetch import UrlIndex, RangeFetcher, CdxServerIndex
+from .link_graph import LinkGraph
+from .sampling import CrawlSample
+from .record_store import IndexingWarcWriter, WarcRecordStore, move_warc, remove_warc
+from .segments import SegmentRoller
+from .metrics import RECORDS, BYTES, DOCUMENTS, ERRORS
+from .concurrency import AIMDController, QueueDrivenController, AdaptiveLimiter, ConcurrencyMonitor
+from .streaming import PipelineStage, StreamingWarcContext, WarcEnd, buffer_record, rewind_record
+from .config import (
+    PRECLASSIFIER_MODEL_PATH,
+    PRECLASSIFIER_SKIP_THRESHOLD,
+    PRECLASSIFIER_MODE,
+    GPT_COST_PER_TOKEN_USD,
+    PIPELINE_MODE,
+    INPUT_FORMAT,
+    URL_INDEX_PATH,
+    INDEX_FETCH_BASE_URL,
+    CDX_SERVER_URL,
+    LINK_DISCOVERY,
+    LINK_SOURCE,
+    SAMPLE_PLAN_FILE,
+    PHASE3_DEFERRED_FILE,
+    SEGMENT_OUTPUTS,
+    SEGMENT_WARC_BYTES,
+    SEGMENT_PARQUET_BYTES,
+    STREAMING_QUEUE_SIZE,
+    WATCH_POLL_SECONDS,
+    HANDOFF_CLAIM_TIMEOUT_SECONDS,
+    HANDOFF_MAX_ATTEMPTS,
+    ADAPTIVE_CONCURRENCY,
+    GPT_MIN_CONCURRENCY,
+    GPT_MAX_CONCURRENCY,
+    DOWNLOAD_MAX_WORKERS,
+    CPU_STAGE_MAX_WORKERS,
+    CPU_TARGET_UTILIZATION,
+    CONCURRENCY_SAMPLE_SECONDS,
+    PATTERN_PROFILE_TOP_PATTERNS,
+    DOMAIN_QUOTA_PHASE2,
+    DOMAIN_QUOTA_PHASE3
+)
 
 logger = logging.getLogger(__name__)
 
@@ -68,7 +118,9 @@ class ThreePhaseProgressTracker:
                 'legal_documents_found_phase1': 0,
                 'legal_documents_filtered_phase2': 0,
                 'passages_extracted_phase3': 0,
-                'total_openai_tokens_used': 0
+                'total_openai_tokens_used': 0,
+                'preclassifier_skipped_phase3': 0,
+                'preclassifier_tokens_saved_estimate': 0
             }
         }
     
@@ -102,16 +154,23 @@ class ThreePhaseProgressTracker:
         self.progress_data['overall_stats']['legal_documents_filtered_phase2'] += filtered_docs
         self.save_progress()
     
-    def update_phase_3(self, file_index: int, warc_name: str, extracted_passages: int, tokens_used: int):
+    def update_phase_3(self, file_index: int, warc_name: str, extracted_passages: int, tokens_used: int,
+                       preclassifier_skipped: int = 0, tokens_saved_estimate: int = 0):
         """Update Phase 3 progress"""
         self.progress_data['phase_3']['current_file_index'] = file_index
         self.progress_data['phase_3']['stats'][warc_name] = {
             'extracted_passages': extracted_passages,
             'tokens_used': tokens_used,
+            'preclassifier_skipped': preclassifier_skipped,
             'timestamp': datetime.now().isoformat()
         }
-        self.progress_data['overall_stats']['passages_extracted_phase3'] += extracted_passages
-        self.progress_data['overall_stats']['total_openai_tokens_used'] += tokens_used
+        overall_stats = self.progress_data['overall_stats']
+        overall_stats['passages_extracted_phase3'] += extracted_passages
+        overall_stats['total_openai_tokens_used'] += tokens_used
+        # Older progress files predate the pre-classifier counters
+        overall_stats['preclassifier_skipped_phase3'] = overall_stats.get('preclassifier_skipped_phase3', 0) + preclassifier_skipped
+        overall_stats['preclassifier_tokens_saved_estimate'] = (
+            overall_stats.get('preclassifier_tokens_saved_estimate', 0) + tokens_saved_estimate)
         self.save_progress()
     
     def complete_phase(self, phase: int):
@@ -123,26 +182,174 @@ class ThreePhaseProgressTracker:
         """Get the starting index for resuming a phase"""
         return self.progress_data[f'phase_{phase}']['current_file_index']
     
+    def get_completed_files(self, phase: int) -> set:
+        """Keys of the WARCs a phase has finished"""
+        return set(self.progress_data[f'phase_{phase}']['stats'])
+    
+    def get_completed_records(self, phase: int, warc_key: str) -> set:
+        """The JSON tracker does not record individual documents"""
+        return set()
+    
+    def mark_record_done(self, phase: int, warc_key: str, record_id: str, tokens_used: int = 0):
+        pass
+    
+    def record_spend(self, phase: int, warc_key: str, tokens_used: int):
+        """Spend reaches the JSON tracker through update_phase_3"""
+        pass
+    
+    def get_overall_stats(self) -> Dict:
+        return self.progress_data['overall_stats']
+    
     def reset(self):
         """Reset all progress"""
         self.progress_data = self._load_progress().__class__(self.progress_file)._load_progress()
         self.save_progress()
 
+def create_progress_tracker(progress_file: str):
+    """
+    SQLite progress store, or the legacy JSON tracker for *.json progress files.
+    A new store next to a JSON progress file of the same name (analysis_progress.json
+    from before the SQLite store) is seeded from it, so --resume keeps its place.
+    """
+    if progress_file.endswith('.json'):
+        return ThreePhaseProgressTracker(progress_file)
+    
+    legacy_file = os.path.splitext(progress_file)[0] + '.json'
+    if os.path.exists(progress_file) or not os.path.exists(legacy_file):
+        return SQLiteProgressTracker(progress_file)
+    
+    # Starting over would silently re-spend GPT tokens on finished work, so an unreadable
+    # legacy file stops the run before the store is created
+    try:
+        with open(legacy_file, 'r') as f:
+            legacy = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RuntimeError(f"Could not import legacy progress file {legacy_file}: {e}. Fix or move it, "
+                           f"or pass --progress-file {legacy_file} to keep using the JSON tracker") from e
+    tracker = SQLiteProgressTracker(progress_file)
+    tracker.import_legacy_progress(legacy)
+    logger.warning(f"Imported legacy progress file {legacy_file} into {progress_file}; "
+                   f"the JSON file is no longer updated")
+    return tracker
+
 class ThreePhaseLegalAnalyzer:
     """Enhanced 3-phase legal document analyzer with WARC preservation"""
     
     def __init__(self, output_dir: str = "analysis_output", max_files: Optional[int] = 5, 
-                 progress_file: str = "analysis_progress.json", keep_original_warcs: bool = False):
+                 progress_file: str = "analysis_progress.db", keep_original_warcs: bool = False,
+                 preclassifier_path: Optional[str] = PRECLASSIFIER_MODEL_PATH,
+                 preclassifier_threshold: float = PRECLASSIFIER_SKIP_THRESHOLD,
+                 preclassifier_mode: str = PRECLASSIFIER_MODE,
+                 llm_backend: Optional[LLMBackend] = None, gpt_model: Optional[str] = None,
+                 model_router: Optional[ModelTierRouter] = None,
+                 phase3_scheduler: Optional[Phase3Scheduler] = None,
+                 pipeline_mode: str = PIPELINE_MODE, streaming_queue_size: int = STREAMING_QUEUE_SIZE,
+                 adaptive_concurrency: bool = ADAPTIVE_CONCURRENCY, max_gpt_concurrency: int = GPT_MAX_CONCURRENCY,
+                 profiler: Optional[PhaseProfiler] = None, pattern_stats: Optional[PatternStats] = None,
+                 domain_quota_phase2: Optional[int] = DOMAIN_QUOTA_PHASE2,
+                 domain_quota_phase3: Optional[int] = DOMAIN_QUOTA_PHASE3,
+                 input_format: str = INPUT_FORMAT, url_index: Optional[str] = URL_INDEX_PATH,
+                 index_base_url: str = INDEX_FETCH_BASE_URL, cdx_server_url: Optional[str] = CDX_SERVER_URL,
+                 link_discovery: Optional[str] = LINK_DISCOVERY,
+                 link_source: str = LINK_SOURCE, sample: Optional[CrawlSample] = None,
+                 segment_outputs: bool = SEGMENT_OUTPUTS, segment_warc_bytes: int = SEGMENT_WARC_BYTES,
+                 segment_parquet_bytes: int = SEGMENT_PARQUET_BYTES):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         self.max_files = max_files
         self.keep_original_warcs = keep_original_warcs
         
+        # Optional pre-classifier that lets Phase 3 skip or defer confident negatives
+        self.preclassifier = PreClassifier.load(Path(preclassifier_path)) if preclassifier_path else None
+        self.preclassifier_threshold = preclassifier_threshold
+        self.preclassifier_mode = preclassifier_mode
+        
+        # Phase 3 LLM backend (None = hosted OpenAI with the API key passed to the run)
+        self.llm_backend = llm_backend
+        self.gpt_model = gpt_model
+        self.model_router = model_router
+        
+        # Budget-aware priority scheduling for Phase 3 (None = process WARCs in order)
+        self.phase3_scheduler = phase3_scheduler
+        
+        # "phased" runs each phase over every file, "streaming" fuses all three per record
+        if pipeline_mode not in ('phased', 'streaming'):
+            raise ValueError(f"Unknown pipeline mode: {pipeline_mode}")
+        self.pipeline_mode = pipeline_mode
+        self.streaming_queue_size = streaming_queue_size
+        self.pipeline_stats: Dict = {}
+        
+        # "warc" parses HTML from full WARCs; "wet" reads CommonCrawl's extracted text and
+        # pulls full WARC records only for documents that survive Phase 2
+        if input_format not in ('warc', 'wet'):
+            raise ValueError(f"Unknown input format: {input_format}")
+        self.input_format = input_format
+        
+        # Link discovery: legal pages named by the anchor text of links from their own site,
+        # read from the HTML of each page or from CommonCrawl WAT link metadata
+        if link_discovery not in (None, 'prioritize', 'restrict'):
+            raise ValueError(f"Unknown link discovery mode: {link_discovery}")
+        if link_source not in ('html', 'wat'):
+            raise ValueError(f"Unknown link source: {link_source}")
+        if link_discovery and input_format == 'wet' and link_source == 'html':
+            raise ValueError("WET records carry no HTML links; use the WAT link source with WET input")
+        self.link_discovery = link_discovery
+        self.link_source = link_source
+        self.link_stats: Dict[str, int] = defaultdict(int)
+        
+        # Adaptive concurrency: an AIMD limit on in-flight GPT calls (halved on 429s) and,
+        # in streaming mode, queue/CPU driven worker counts for the download and CPU stages
+        self.adaptive_concurrency = adaptive_concurrency
+        self.gpt_concurrency = (AIMDController('gpt_in_flight', GPT_MIN_CONCURRENCY, max_gpt_concurrency)
+                                if adaptive_concurrency else None)
+        self.gpt_limiter = AdaptiveLimiter(self.gpt_concurrency) if self.gpt_concurrency else None
+        
+        # Optional per-phase profiler (--profile); profiles go to <crawl dir>/profiles
+        self.profiler = profiler
+        
+        # Per-phase caps on documents per registered domain and document type
+        self.domain_quotas: Dict[int, DomainQuota] = {
+            phase: DomainQuota(phase, limit)
+            for phase, limit in ((2, domain_quota_phase2), (3, domain_quota_phase3)) if limit
+        }
+        
+        # Phase 3 results and progress may be written from several worker threads
+        self._results_lock = threading.RLock()
+        
         # Initialize components
         self.fetcher = CommonCrawlFetcher()
         self.detector = LegalDocumentDetector()
+        
+        # Optional URL index: Phase 1 then range-fetches only records whose URL matches a Phase 1 pattern
+        if url_index and input_format == 'wet':
+            raise ValueError("A URL index selects WARC records; it cannot be combined with WET input")
+        self.url_index = UrlIndex(url_index, self.detector.lightning_detector.url_patterns) if url_index else None
+        # WET input range-fetches its Phase 2 survivors' full records, located through the CDX server
+        self.range_fetcher = RangeFetcher(index_base_url) if url_index or input_format == 'wet' else None
+        self.cdx_server_url = cdx_server_url
+        self._cdx_server_index: Optional[CdxServerIndex] = None
+        
+        # Optional crawl sample: the phases see only its WARCs and records, the report adds estimates
+        if sample and url_index:
+            raise ValueError("A URL index reads only candidate records; sampling needs every record of a WARC counted")
+        self.sample = sample
+        
+        # Optional rolled outputs: finished WARCs' Phase 3 files are appended to target-size segments
+        if segment_outputs and not HAS_PANDAS:
+            raise ValueError("Rolled output segments are written as Parquet and need pandas and pyarrow")
+        self.segment_outputs = segment_outputs
+        self.segment_warc_bytes = segment_warc_bytes
+        self.segment_parquet_bytes = segment_parquet_bytes
+        self.segment_roller: Optional[SegmentRoller] = None
+        self._segment_pending: List[str] = []
+        self._segment_pending_bytes = 0
+        
+        # Optional per-pattern cost/hit-rate instrumentation of both detectors (--pattern-profile)
+        self.pattern_stats = pattern_stats
+        if pattern_stats:
+            instrument_detector(self.detector, pattern_stats)
         self.extractor = HTMLContentExtractor()
-        self.progress_tracker = ThreePhaseProgressTracker(progress_file)
+        self.progress_tracker = create_progress_tracker(progress_file)
         
         # Phase directories (will be set during analysis)
         self.crawl_dir = None
@@ -163,7 +370,7 @@ class ThreePhaseLegalAnalyzer:
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
     
-    def run_three_phase_analysis(self, openai_api_key: str, resume: bool = False) -> Dict:
+    def run_three_phase_analysis(self, openai_api_key: Optional[str], resume: bool = False) -> Dict:
         """
         Run complete 3-phase analysis with WARC preservation:
         Phase 1: Lightning fast detection → Save WARC records
@@ -174,28 +381,12 @@ class ThreePhaseLegalAnalyzer:
         
         # Get crawl information
         crawl_info = self.fetcher.get_latest_crawl_info()
-        crawl_name = crawl_info['name']
-        
-        # Setup crawl-specific directories
-        self.crawl_dir = self.output_dir / crawl_name
-        self.crawl_dir.mkdir(exist_ok=True)
-        
-        self.phase1_dir = self.crawl_dir / "phase1_fast_detection"
-        self.phase2_dir = self.crawl_dir / "phase2_sophisticated_filtering"
-        self.phase3_dir = self.crawl_dir / "phase3_passages_and_warc"
-        
-        for dir_path in [self.phase1_dir, self.phase2_dir, self.phase3_dir]:
-            dir_path.mkdir(exist_ok=True)
-        
-        # Store crawl info
-        self.progress_tracker.progress_data['crawl_name'] = crawl_name
-        
-        # Determine files to process
-        all_warc_paths = crawl_info['warc_paths']
-        if self.max_files is None:
-            warc_paths = all_warc_paths
-        else:
-            warc_paths = all_warc_paths[:self.max_files]
+        self._setup_crawl_directories(crawl_info['name'])
+        warc_paths = self.select_warc_paths(crawl_info)
+        if self.sample:
+            if resume and self._sample_plan_path().exists():
+                self.sample.restore_observations(self._sample_plan_path())
+            self.sample.save(self._sample_plan_path())
         
         self.progress_tracker.progress_data['total_files_to_process'] = len(warc_paths)
         if not self.progress_tracker.progress_data['start_time']:
@@ -204,10 +395,21 @@ class ThreePhaseLegalAnalyzer:
         overall_start_time = time.time()
         
         try:
+            if self.pipeline_mode == 'streaming' and not self.progress_tracker.progress_data['phase_3']['completed']:
+                logger.info("=== STREAMING PIPELINE: Phases 1-3 fused per record ===")
+                self._create_gpt_analyzer(openai_api_key)
+                with self._profile('streaming'):
+                    self._run_streaming_pipeline(warc_paths, resume)
+                for phase in (1, 2, 3):
+                    self.progress_tracker.complete_phase(phase)
+                self._roll_segments(final=True)
+                return self._generate_final_report(time.time() - overall_start_time)
+            
             # Phase 1: Lightning Fast Detection → Save WARC records
             if not self.progress_tracker.progress_data['phase_1']['completed']:
                 logger.info("=== PHASE 1: Lightning Fast Detection + WARC Storage ===")
-                self._run_phase_1(warc_paths, resume)
+                with self._profile('phase1'):
+                    self._run_phase_1(warc_paths, resume)
                 self.progress_tracker.complete_phase(1)
             else:
                 logger.info("Phase 1 already completed, skipping")
@@ -215,7 +417,8 @@ class ThreePhaseLegalAnalyzer:
             # Phase 2: Sophisticated Legal Filtering → Move/delete WARC + create metadata parquet
             if not self.progress_tracker.progress_data['phase_2']['completed']:
                 logger.info("=== PHASE 2: Sophisticated Filtering + WARC Management ===")
-                self._run_phase_2(resume)
+                with self._profile('phase2'):
+                    self._run_phase_2(resume)
                 self.progress_tracker.complete_phase(2)
             else:
                 logger.info("Phase 2 already completed, skipping")
@@ -223,11 +426,16 @@ class ThreePhaseLegalAnalyzer:
             # Phase 3: Passage Extraction → Copy WARC + metadata + create GPT analysis parquet
             if not self.progress_tracker.progress_data['phase_3']['completed']:
                 logger.info("=== PHASE 3: Passage Extraction + Final WARC Storage ===")
-                self.gpt_analyzer = GPTLegalAnalyzer(openai_api_key)
-                self._run_phase_3(resume)
+                self._create_gpt_analyzer(openai_api_key)
+                with self._profile('phase3'):
+                    if self.phase3_scheduler:
+                        self._run_phase_3_scheduled()
+                    else:
+                        self._run_phase_3(resume)
                 self.progress_tracker.complete_phase(3)
             else:
                 logger.info("Phase 3 already completed, skipping")
+            self._roll_segments(final=True)
             
             total_time = time.time() - overall_start_time
             final_report = self._generate_final_report(total_time)
@@ -239,22 +447,432 @@ class ThreePhaseLegalAnalyzer:
             self.progress_tracker.save_progress()
             raise
     
+    def _setup_crawl_directories(self, crawl_name: str):
+        """Create the crawl-specific phase directories"""
+        self.crawl_dir = self.output_dir / crawl_name
+        self.crawl_dir.mkdir(exist_ok=True)
+        
+        self.phase1_dir = self.crawl_dir / "phase1_fast_detection"
+        self.phase2_dir = self.crawl_dir / "phase2_sophisticated_filtering"
+        self.phase3_dir = self.crawl_dir / "phase3_passages_and_warc"
+        
+        for dir_path in [self.phase1_dir, self.phase2_dir, self.phase3_dir]:
+            dir_path.mkdir(exist_ok=True)
+        if self.segment_outputs:
+            self.segment_roller = SegmentRoller(self.phase3_dir, self.segment_warc_bytes, self.segment_parquet_bytes)
+        
+        # Store crawl info
+        self.progress_tracker.progress_data['crawl_name'] = crawl_name
+    
+    def select_warc_paths(self, crawl_info: Dict) -> List[str]:
+        """WARC paths of a crawl limited to max_files, or the sampled WARCs"""
+        all_warc_paths = crawl_info['warc_paths']
+        if self.sample:
+            return self.sample.draw_files(all_warc_paths)
+        if self.max_files is None:
+            return all_warc_paths
+        return all_warc_paths[:self.max_files]
+    
+    def run_worker(self, work_queue: WorkQueue, openai_api_key: Optional[str], worker_id: str,
+                   max_items: Optional[int] = None, phases: Tuple[int, ...] = (1, 2, 3)) -> Dict:
+        """
+        Claim WARC paths from a shared work queue and run all three phases on each
+        until the queue is drained. Stats per WARC are reported back to the queue.
+        """
+        crawl_name = work_queue.get_crawl_name()
+        if not crawl_name:
+            raise ValueError(f"Work queue {work_queue.path} has not been seeded")
+        
+        self._setup_crawl_directories(crawl_name)
+        if 3 in phases:
+            self._create_gpt_analyzer(openai_api_key)
+        logger.info(f"Worker {worker_id} started on {crawl_name} (queue: {work_queue.path})")
+        
+        worker_stats = {'worker_id': worker_id, 'items_completed': 0, 'items_failed': 0}
+        while max_items is None or worker_stats['items_completed'] + worker_stats['items_failed'] < max_items:
+            lease = work_queue.claim(worker_id)
+            if lease is None:
+                break
+            
+            logger.info(f"Worker {worker_id}: claimed {lease.warc_path} (attempt {lease.attempt})")
+            before = dict(self.progress_tracker.progress_data['overall_stats'])
+            start_time = time.time()
+            try:
+                with LeaseHeartbeat(work_queue, lease) as heartbeat:
+                    self._process_single_warc(lease.warc_path, phases)
+                if heartbeat.lost:
+                    # Another worker owns the item now; its results win
+                    worker_stats['items_failed'] += 1
+                    continue
+                
+                after = self.progress_tracker.progress_data['overall_stats']
+                item_stats = {key: after.get(key, 0) - before.get(key, 0) for key in after}
+                item_stats['processing_time_seconds'] = time.time() - start_time
+                work_queue.complete(lease, item_stats)
+                worker_stats['items_completed'] += 1
+            except Exception as e:
+                work_queue.fail(lease, str(e))
+                worker_stats['items_failed'] += 1
+        
+        if 3 in phases:
+            self._roll_segments(final=True)
+        worker_stats['overall_stats'] = dict(self.progress_tracker.progress_data['overall_stats'])
+        worker_stats['pattern_profile'] = self._write_pattern_profile()
+        worker_stats['domain_quotas'] = self._domain_quota_stats()
+        worker_stats['link_discovery'] = self._link_discovery_stats()
+        logger.info(f"Worker {worker_id} finished: {worker_stats['items_completed']} WARCs completed, "
+                    f"{worker_stats['items_failed']} failed")
+        return worker_stats
+    
+    def _process_single_warc(self, warc_path: str, phases: Tuple[int, ...] = (1, 2, 3)):
+        """Run the given phases on one WARC path (used by queue workers)"""
+        warc_file = self._download_input(warc_path)
+        if not warc_file:
+            raise RuntimeError(f"Failed to download WARC file: {warc_path}")
+        
+        if self.pipeline_mode == 'streaming' and phases == (1, 2, 3):
+            # The streaming pipeline finds the downloaded file already in place
+            with self._profile('streaming'):
+                self._run_streaming_pipeline([warc_path], resume=False)
+            return
+        
+        with self._profile('phase1'):
+            legal_docs_found, records_processed = self._process_warc_phase_1(warc_file, warc_path)
+        self.progress_tracker.update_phase_1(0, warc_path, legal_docs_found, records_processed)
+        
+        phase1_warc_file = self.phase1_dir / f"{warc_stem(warc_file)}_legal_docs.warc.gz"
+        warc_name = phase1_warc_file.stem.replace('_legal_docs', '')
+        if 2 not in phases or not phase1_warc_file.exists():
+            return
+        
+        with self._profile('phase2'):
+            filtered_docs = self._process_phase2_warc_filtering(phase1_warc_file)
+        self.progress_tracker.update_phase_2(0, warc_name, len(filtered_docs))
+        
+        phase2_warc_file = self.phase2_dir / phase1_warc_file.name
+        if 3 not in phases or not phase2_warc_file.exists():
+            return
+        
+        with self._profile('phase3'):
+            extracted_passages, tokens_used, skipped_documents = self._process_phase3_gpt_analysis(phase2_warc_file)
+        tokens_saved = sum(doc['estimated_tokens_saved'] for doc in skipped_documents)
+        self.progress_tracker.update_phase_3(0, warc_name, len(extracted_passages), tokens_used,
+                                             len(skipped_documents), tokens_saved)
+        self._segment_finished_warc(self.phase3_dir / phase2_warc_file.name)
+    
+    def run_single_phase(self, phase: int, openai_api_key: Optional[str], resume: bool = False,
+                         watch: bool = False, poll_seconds: float = WATCH_POLL_SECONDS) -> Dict:
+        """
+        Run one phase as a standalone process. Phase 1 processes the crawl's WARCs;
+        Phases 2 and 3 claim the previous phase's published outputs, and with watch=True
+        keep polling until the previous phase has marked itself complete.
+        """
+        crawl_info = self.fetcher.get_latest_crawl_info()
+        self._setup_crawl_directories(crawl_info['name'])
+        start_time = time.time()
+        
+        if phase == 1:
+            warc_paths = self.select_warc_paths(crawl_info)
+            self.progress_tracker.progress_data['total_files_to_process'] = len(warc_paths)
+            with self._profile('phase1'):
+                self._run_phase_1(warc_paths, resume)
+            self.progress_tracker.complete_phase(1)
+            mark_phase_complete(self.phase1_dir, 1)
+        else:
+            if phase == 3:
+                self._create_gpt_analyzer(openai_api_key)
+            with self._profile(f'phase{phase}'):
+                if phase == 3 and self.phase3_scheduler and not watch:
+                    self._run_phase_3_scheduled()
+                else:
+                    if phase == 3 and self.phase3_scheduler:
+                        logger.warning("Phase 3 budget scheduling needs all of Phase 2 up front; ignored in watch mode")
+                    self._consume_phase_outputs(phase, resume, watch, poll_seconds)
+            if phase == 3:
+                self._roll_segments(final=True)
+        
+        return self._generate_final_report(time.time() - start_time)
+    
+    def _consume_phase_outputs(self, phase: int, resume: bool, watch: bool, poll_seconds: float):
+        """Claim and process the previous phase's outputs until none are left (or upstream is done, when watching)"""
+        input_dir = self.phase1_dir if phase == 2 else self.phase2_dir
+        claimer = RenameClaimer(input_dir, "*_legal_docs.warc.gz", HANDOFF_CLAIM_TIMEOUT_SECONDS, HANDOFF_MAX_ATTEMPTS)
+        processed = 0
+        
+        # Phase 3 files an interrupted consumer already moved out of the hand-off directory
+        if phase == 3 and resume:
+            completed = self.progress_tracker.get_completed_files(3)
+            for phase3_warc_file in sorted(self.phase3_dir.glob("*_legal_docs.warc.gz")):
+                if self._warc_key(phase3_warc_file) not in completed:
+                    self._process_claimed_output(3, phase3_warc_file, processed)
+                    processed += 1
+        
+        logger.info(f"Phase {phase}: consuming outputs from {input_dir}" + (" (watching)" if watch else ""))
+        while True:
+            claimer.release_stale()
+            claimed = claimer.claim_next()
+            
+            if claimed is None:
+                upstream_complete = is_phase_complete(input_dir, phase - 1)
+                if upstream_complete and claimer.in_flight() == 0:
+                    # Last consumer out signals the next phase
+                    self.progress_tracker.complete_phase(phase)
+                    mark_phase_complete(self.phase2_dir if phase == 2 else self.phase3_dir, phase)
+                    break
+                if not watch or upstream_complete:
+                    break
+                time.sleep(poll_seconds)
+                continue
+            
+            logger.info(f"Phase {phase}: claimed {claimed.name}")
+            with claimer.heartbeat(claimed):
+                self._process_claimed_output(phase, claimed, processed)
+            # Consuming a file moves it on; a claim still in place failed (and was logged)
+            if claimed.exists():
+                claimer.release_failed(claimed)
+            else:
+                claimer.finish(claimed)
+            processed += 1
+        
+        logger.info(f"Phase {phase}: processed {processed} WARC files")
+    
+    def _process_claimed_output(self, phase: int, warc_file: Path, file_index: int):
+        """Run Phase 2 or 3 on one claimed WARC and record its progress"""
+        try:
+            if phase == 2:
+                filtered_docs = self._process_phase2_warc_filtering(warc_file)
+                self.progress_tracker.update_phase_2(file_index, self._warc_key(warc_file), len(filtered_docs))
+            else:
+                extracted_passages, tokens_used, skipped_documents = self._process_phase3_gpt_analysis(warc_file)
+                tokens_saved = sum(doc['estimated_tokens_saved'] for doc in skipped_documents)
+                self.progress_tracker.update_phase_3(file_index, self._warc_key(warc_file), len(extracted_passages),
+                                                     tokens_used, len(skipped_documents), tokens_saved)
+                self._segment_finished_warc(self.phase3_dir / warc_file.name)
+        except Exception as e:
+            logger.error(f"Error in Phase {phase} processing {warc_file}: {e}")
+            ERRORS.labels(stage=f'phase{phase}').inc()
+    
+    def _profile(self, phase: str):
+        """Profile the with-block as the given phase when a profiler is configured"""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.profile(phase, self.crawl_dir / "profiles")
+    
+    def _write_pattern_profile(self) -> Dict:
+        """Write the full pattern ranking to the crawl dir and return its head for the report"""
+        if self.pattern_stats is None:
+            return {}
+        pattern_file = self.crawl_dir / "pattern_profile.json"
+        report = self.pattern_stats.write(pattern_file)
+        return {
+            'file': str(pattern_file),
+            'documents': report['documents'],
+            'total_seconds': report['total_seconds'],
+            'top_patterns': report['patterns'][:PATTERN_PROFILE_TOP_PATTERNS],
+            'dead_patterns': report['dead_patterns'],
+            'never_decisive': report['never_decisive']
+        }
+    
+    def _domain_quota_stats(self) -> Dict:
+        """Kept and dropped counts of each configured domain quota"""
+        return {f"phase{phase}": quota.get_stats() for phase, quota in self.domain_quotas.items()}
+    
+    def _sample_plan_path(self) -> Path:
+        return self.crawl_dir / SAMPLE_PLAN_FILE
+    
+    def _segment_finished_warc(self, phase3_warc_file: Path):
+        """Queue a WARC whose Phase 3 is done for rolling; roll once a WARC segment's worth is waiting"""
+        if not self.segment_roller or not phase3_warc_file.exists():
+            return
+        with self._results_lock:
+            self._segment_pending.append(phase3_warc_file.name)
+            self._segment_pending_bytes += phase3_warc_file.stat().st_size
+            if self._segment_pending_bytes < self.segment_warc_bytes:
+                return
+        self._roll_segments()
+    
+    def _roll_segments(self, final: bool = False):
+        """Roll the queued WARCs; the final roll also picks up WARCs an interrupted run finished but did not roll"""
+        if not self.segment_roller:
+            return
+        with self._results_lock:
+            warc_names, self._segment_pending, self._segment_pending_bytes = self._segment_pending, [], 0
+        if final:
+            warc_names += self._finished_phase3_warcs()
+        try:
+            self.segment_roller.roll(warc_names)
+        except Exception as e:
+            logger.error(f"Error rolling output segments: {e}")
+            ERRORS.labels(stage='segments').inc()
+    
+    def _finished_phase3_warcs(self) -> List[str]:
+        """Phase 3 WARC names recorded as complete, except those with documents the scheduler deferred"""
+        deferred_path = self.phase3_dir / (self.phase3_scheduler.deferred_file if self.phase3_scheduler
+                                           else PHASE3_DEFERRED_FILE)
+        deferred = set()
+        if deferred_path.exists():
+            with open(deferred_path, 'r', encoding='utf-8') as f:
+                deferred = {entry['warc_file'] for entry in json.load(f).get('documents', [])}
+        completed = self.progress_tracker.get_completed_files(3)
+        # Progress keys drop '_legal_docs' from the stem, so match them against the files on disk
+        return [path.name for path in sorted(self.phase3_dir.glob("*_legal_docs.warc.gz"))
+                if self._warc_key(path) in completed and path.name not in deferred]
+    
+    def _output_rows(self, warc_name: str, table: str) -> List[Dict]:
+        """Rows of a WARC's metadata or GPT analysis, from its JSON file or from the segment it was rolled into"""
+        stem = Path(warc_name).stem
+        if table == 'metadata':
+            candidates = [self.phase3_dir / f"{stem}_metadata.json", self.phase2_dir / f"{stem}_metadata.json"]
+        else:
+            candidates = [self.phase3_dir / f"{stem}_gpt_analysis.json"]
+        for path in candidates:
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        if self.segment_roller:
+            return self.segment_roller.table_rows(warc_name, table) or []
+        return []
+    
+    def _observe_sampled_warc(self, warc_path: str, records_total: int, sampled_ids: List[str], phase1_candidates: int):
+        """Record a sampled WARC's record counts and sampled IDs in the saved plan"""
+        self.sample.observe_file(warc_path, records_total, sampled_ids, phase1_candidates)
+        self.sample.save(self._sample_plan_path())
+    
+    def _sample_counts(self, warc_path: str, phase1_candidates: int) -> Dict[str, int]:
+        """Per-metric counts of one sampled WARC's records, read back from its Phase 2 and Phase 3 outputs"""
+        counts: Dict[str, int] = defaultdict(int)
+        counts['phase1_candidates'] = phase1_candidates
+        warc_name = f"{warc_stem(Path(warc_path))}_legal_docs.warc.gz"
+        
+        for doc in self._output_rows(warc_name, 'metadata'):
+            counts['legal_documents'] += 1
+            primary_type = json.loads(doc['phase2_analysis']).get('primary_type')
+            if primary_type:
+                counts[f"legal_documents:{primary_type}"] += 1
+        
+        for passage in self._output_rows(warc_name, 'gpt_analysis'):
+            counts['gpt_analyzed'] += 1
+            clauses = json.loads(passage['gpt_analysis']).get('copyright_clauses', [])
+            categories = {clause.get('category') for clause in clauses if clause.get('category')}
+            counts['copyright_documents'] += bool(categories)
+            for category in categories:
+                counts[f"copyright:{category}"] += 1
+        return dict(counts)
+    
+    def _sample_estimates(self) -> Dict:
+        """Crawl-wide estimates from the sample (empty without one)"""
+        if not self.sample:
+            return {}
+        counts = {sampled.warc_path: self._sample_counts(sampled.warc_path, sampled.phase1_candidates)
+                  for sampled in self.sample.files.values() if sampled.observed}
+        self.sample.save(self._sample_plan_path())
+        return {**self.sample.estimate(counts), 'plan_file': str(self._sample_plan_path())}
+    
+    def _link_discovery_stats(self) -> Dict:
+        """Link-graph counters summed over all WARCs (empty without link discovery)"""
+        if not self.link_discovery:
+            return {}
+        with self._results_lock:
+            return {'mode': self.link_discovery, 'source': self.link_source, **self.link_stats}
+    
+    def _quota_dropped_urls(self, phase: int, candidates: List) -> set:
+        """URLs the phase's domain quota drops from a batch (empty without a quota)"""
+        quota = self.domain_quotas.get(phase)
+        if quota is None:
+            return set()
+        return {candidate.url for candidate in quota.select(candidates)}
+    
+    def _phase2_quota_dropped_urls(self, phase1_warc_file: Path, link_graph: Optional[LinkGraph] = None) -> set:
+        """Header-only pass over a Phase 1 WARC: the records the Phase 2 quota keeps out of extraction"""
+        if 2 not in self.domain_quotas:
+            return set()
+        candidates = []
+        with gzip.open(phase1_warc_file, 'rb') as f:
+            for record in ArchiveIterator(f):
+                if record.rec_type in CONTENT_RECORD_TYPES:
+                    url = record.rec_headers.get_header('WARC-Target-URI')
+                    if url:
+                        link_target = link_graph.target(url) if link_graph else None
+                        candidates.append(phase2_candidate(url, self.detector, link_target))
+        return self._quota_dropped_urls(2, candidates)
+    
+    def _link_graph_path(self, phase1_warc_file: Path) -> Path:
+        """Link graph handed from Phase 1 to Phase 2 (in the Phase 1 directory, also for claimed WARCs)"""
+        return self.phase1_dir / f"{phase1_warc_file.stem}_links.json"
+    
+    def _load_link_graph(self, phase1_warc_file: Path) -> Optional[LinkGraph]:
+        link_graph_path = self._link_graph_path(phase1_warc_file)
+        return LinkGraph.load(link_graph_path) if link_graph_path.exists() else None
+    
+    def _record_link_graph(self, link_graph: LinkGraph):
+        with self._results_lock:
+            self.link_stats['pages_scanned'] += link_graph.pages_scanned
+            self.link_stats['legal_links'] += link_graph.legal_links
+            self.link_stats['hosts_with_targets'] += len(link_graph.targets)
+            self.link_stats['targets'] += link_graph.target_count()
+    
+    def _count_link_stat(self, key: str, count: int = 1):
+        with self._results_lock:
+            self.link_stats[key] += count
+    
+    def _prebuilt_link_graph(self, warc_path: str) -> Optional[LinkGraph]:
+        """Link graph of a WARC read from its WAT file before Phase 1 (None for the HTML link source)"""
+        if not self.link_discovery or self.link_source != 'wat':
+            return None
+        wat_file = self.fetcher.download_wat_file(warc_path)
+        if not wat_file:
+            logger.warning(f"No WAT file for {warc_path}; collecting links from the HTML instead")
+            return None
+        link_graph = LinkGraph.from_wat(wat_file)
+        self._record_link_graph(link_graph)
+        return link_graph
+    
+    def _scan_link_graph(self, warc_file: Path) -> LinkGraph:
+        """Link graph from the head and tail of every HTML page of a WARC"""
+        link_graph = LinkGraph()
+        with gzip.open(warc_file, 'rb') as f:
+            for record in ArchiveIterator(f):
+                url = record.rec_headers.get_header('WARC-Target-URI')
+                if record.rec_type == 'response' and url:
+                    link_graph.add_page(url, record.content_stream().read().decode('utf-8', errors='ignore'))
+        self._record_link_graph(link_graph)
+        return link_graph
+    
+    def _apply_link_graph(self, link_graph: LinkGraph, legal_urls: set, seen_urls: set) -> set:
+        """Phase 1 survivors with link discovery: keyword hits plus link targets, only targets of their host in restrict mode"""
+        targets = {url for url in seen_urls if link_graph.classify(url)}
+        survivors = legal_urls | targets
+        if self.link_discovery == 'restrict':
+            survivors = {url for url in survivors if link_graph.classify(url) is not False}
+        dropped = len(legal_urls - survivors)
+        self._count_link_stat('targets_in_warcs', len(targets))
+        self._count_link_stat('keyword_candidates_dropped', dropped)
+        DOCUMENTS.labels(phase='1', outcome='link_target').inc(len(targets - legal_urls))
+        DOCUMENTS.labels(phase='1', outcome='link_restricted').inc(dropped)
+        return survivors
+    
+    def _create_gpt_analyzer(self, openai_api_key: Optional[str]):
+        """Build the Phase 3 GPT analyzer on the configured backend"""
+        gpt_kwargs = {'model': self.gpt_model} if self.gpt_model else {}
+        self.gpt_analyzer = GPTLegalAnalyzer(openai_api_key, backend=self.llm_backend,
+                                             concurrency_controller=self.gpt_concurrency, **gpt_kwargs)
+    
     def _run_phase_1(self, warc_paths: List[str], resume: bool):
         """Phase 1: Lightning fast detection and WARC record storage"""
-        start_index = 0
+        completed = self.progress_tracker.get_completed_files(1) if resume else set()
         if resume:
-            start_index = self.progress_tracker.get_phase_start_index(1)
-            logger.info(f"Resuming Phase 1 from file index {start_index}")
+            logger.info(f"Resuming Phase 1: {len(completed & set(warc_paths))} WARC files already done")
         
         logger.info(f"Phase 1: Processing {len(warc_paths)} WARC files with lightning fast detection")
         
-        for i in range(start_index, len(warc_paths)):
-            warc_path = warc_paths[i]
+        for i, warc_path in enumerate(warc_paths):
+            if warc_path in completed:
+                continue
             logger.info(f"Phase 1: Processing {i+1}/{len(warc_paths)}: {warc_path}")
             
             try:
                 # Download WARC file
-                warc_file = self.fetcher.download_warc_file(warc_path)
+                warc_file = self._download_input(warc_path)
                 if not warc_file:
                     logger.error(f"Failed to download WARC file: {warc_path}")
                     continue
@@ -269,28 +887,46 @@ class ThreePhaseLegalAnalyzer:
                 
             except Exception as e:
                 logger.error(f"Error in Phase 1 processing {warc_path}: {e}")
+                ERRORS.labels(stage='phase1').inc()
             
             finally:
                 # Keep the original WARC file - NEVER DELETE
                 if warc_file and warc_file.exists():
                     logger.info(f"Preserved original WARC file: {warc_file}")
     
+    def _download_input(self, warc_path: str) -> Optional[Path]:
+        """The file Phase 1 reads for a WARC path: the WARC, its WET file, or its URL-index candidates"""
+        if self.url_index:
+            return self.fetcher.download_candidate_records(warc_path, self.url_index, self.range_fetcher)
+        return self.fetcher.download_input_file(warc_path, self.input_format)
+    
     def _process_warc_phase_1(self, warc_file: Path, warc_path: str) -> Tuple[int, int]:
         """Process single WARC file in Phase 1 - extract and save legal document WARC records"""
         legal_docs_found = 0
         records_processed = 0
         
         # Create output WARC file for legal documents
-        output_warc_file = self.phase1_dir / f"{warc_file.stem}_legal_docs.warc.gz"
+        output_warc_file = self.phase1_dir / f"{warc_stem(warc_file)}_legal_docs.warc.gz"
         
         try:
             # First pass: identify legal documents
             legal_urls = set()
+            records_metric = RECORDS.labels(phase='1')
+            bytes_metric = BYTES.labels(stage='phase1_read')
+            
+            # Link discovery: a WAT link graph is complete before the pass, an HTML one is collected during it
+            link_graph = self._prebuilt_link_graph(warc_path)
+            collect_links = bool(self.link_discovery) and link_graph is None
+            if collect_links:
+                link_graph = LinkGraph()
+            seen_urls = set()
+            sampled_ids = []
             
             with gzip.open(warc_file, 'rb') as input_f:
                 for record in ArchiveIterator(input_f):
-                    if record.rec_type == 'response':
+                    if record.rec_type in CONTENT_RECORD_TYPES:
                         records_processed += 1
+                        records_metric.inc()
                         
                         if records_processed % 5000 == 0:
                             logger.info(f"Phase 1: Processed {records_processed} records, found {legal_docs_found} potential legal documents")
@@ -300,15 +936,37 @@ class ThreePhaseLegalAnalyzer:
                         if not url:
                             continue
                         
+                        if self.sample:
+                            record_id = record.rec_headers.get_header('WARC-Record-ID')
+                            if not self.sample.selects(warc_path, record_id):
+                                continue
+                            sampled_ids.append(record_id)
+                        
+                        if link_graph is not None and not collect_links:
+                            # Known targets need no keyword scan; restrict mode never scans the rest of their host
+                            is_target = link_graph.classify(url)
+                            if is_target:
+                                seen_urls.add(url)
+                                continue
+                            if is_target is False and self.link_discovery == 'restrict':
+                                self._count_link_stat('detection_skipped')
+                                continue
+                        
                         content = record.content_stream().read()
                         if not content:
                             continue
+                        bytes_metric.inc(len(content))
                         
                         try:
                             html_content = content.decode('utf-8', errors='ignore')
                         except:
                             continue
                         
+                        if collect_links:
+                            seen_urls.add(url)
+                            if record.rec_type == 'response':
+                                link_graph.add_page(url, html_content)
+                        
                         # Lightning fast detection
                         detection_result = self.detector.phase_one_detection(url, html_content)
                         
@@ -316,16 +974,26 @@ class ThreePhaseLegalAnalyzer:
                             legal_urls.add(url)
                             legal_docs_found += 1
             
+            if link_graph is not None:
+                if collect_links:
+                    self._record_link_graph(link_graph)
+                legal_urls = self._apply_link_graph(link_graph, legal_urls, seen_urls)
+                legal_docs_found = len(legal_urls)
+            DOCUMENTS.labels(phase='1', outcome='legal').inc(legal_docs_found)
+            if self.sample:
+                self._observe_sampled_warc(warc_path, records_processed, sampled_ids, legal_docs_found)
+            
             # Second pass: copy the legal records if any were found
             if legal_urls:
                 urls_to_copy = legal_urls.copy()  # Make a copy to track what we still need
                 
+                # Written under a temporary name so Phase 2 consumers only ever see complete files
                 with gzip.open(warc_file, 'rb') as input_f:
-                    with open(output_warc_file, 'wb') as output_f:
-                        writer = WARCWriter(output_f, gzip=True)
+                    with open(partial_path(output_warc_file), 'wb') as output_f:
+                        writer = IndexingWarcWriter(output_f, output_warc_file)
                         
                         for record in ArchiveIterator(input_f):
-                            if record.rec_type == 'response':
+                            if record.rec_type in CONTENT_RECORD_TYPES:
                                 url = record.rec_headers.get_header('WARC-Target-URI')
                                 if url in urls_to_copy:
                                     # Copy the original record directly - this preserves all structure
@@ -336,18 +1004,27 @@ class ThreePhaseLegalAnalyzer:
                                     if not urls_to_copy:
                                         break
                 
+                # Sidecars go first: Phase 2 consumers pick the WARC up as soon as it is published
+                writer.write_index()
+                if link_graph is not None:
+                    link_graph.save(self._link_graph_path(output_warc_file))
+                publish(partial_path(output_warc_file), output_warc_file)
                 logger.info(f"Successfully wrote {len(legal_urls)} legal document records to {output_warc_file}")
             else:
                 logger.info("No legal documents found to write")
         
         except Exception as e:
             logger.error(f"Error processing WARC file {warc_file} in Phase 1: {e}")
+            ERRORS.labels(stage='phase1').inc()
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
         
+        if partial_path(output_warc_file).exists():
+            partial_path(output_warc_file).unlink()
+        
         # Remove empty output file
         if legal_docs_found == 0 and output_warc_file.exists():
-            output_warc_file.unlink()
+            remove_warc(output_warc_file)
             logger.debug(f"Removed empty WARC file: {output_warc_file}")
         
         return legal_docs_found, records_processed
@@ -355,29 +1032,27 @@ class ThreePhaseLegalAnalyzer:
     def _run_phase_2(self, resume: bool):
         """Phase 2: Sophisticated legal filtering with WARC management and metadata creation"""
         # Get all Phase 1 WARC files
-        phase1_warc_files = list(self.phase1_dir.glob("*_legal_docs.warc.gz"))
+        phase1_warc_files = sorted(self.phase1_dir.glob("*_legal_docs.warc.gz"))
         logger.info(f"Phase 2: Processing {len(phase1_warc_files)} Phase 1 WARC files")
         
-        start_index = 0
-        if resume:
-            start_index = self.progress_tracker.get_phase_start_index(2)
-            logger.info(f"Resuming Phase 2 from file index {start_index}")
+        completed = self.progress_tracker.get_completed_files(2) if resume else set()
         
-        for i in range(start_index, len(phase1_warc_files)):
-            phase1_warc_file = phase1_warc_files[i]
+        for i, phase1_warc_file in enumerate(phase1_warc_files):
+            if self._warc_key(phase1_warc_file) in completed:
+                continue
             logger.info(f"Phase 2: Processing {i+1}/{len(phase1_warc_files)}: {phase1_warc_file.name}")
             
             try:
                 filtered_docs = self._process_phase2_warc_filtering(phase1_warc_file)
                 
                 # Update progress
-                warc_name = phase1_warc_file.stem.replace('_legal_docs', '')
-                self.progress_tracker.update_phase_2(i, warc_name, len(filtered_docs))
+                self.progress_tracker.update_phase_2(i, self._warc_key(phase1_warc_file), len(filtered_docs))
                 
                 logger.info(f"Phase 2 completed for {phase1_warc_file.name}: {len(filtered_docs)} documents passed sophisticated filtering")
                 
             except Exception as e:
                 logger.error(f"Error in Phase 2 processing {phase1_warc_file}: {e}")
+                ERRORS.labels(stage='phase2').inc()
     
     def _process_phase2_warc_filtering(self, phase1_warc_file: Path) -> List[Dict]:
         """Process Phase 1 WARC file with sophisticated legal detection"""
@@ -385,13 +1060,17 @@ class ThreePhaseLegalAnalyzer:
         documents_to_keep = []  # Store actual WARC records to keep
         
         try:
+            # Link targets found by Phase 1; records over their domain's quota are never extracted
+            link_graph = self._load_link_graph(phase1_warc_file)
+            quota_dropped = self._phase2_quota_dropped_urls(phase1_warc_file, link_graph)
+            
             # First pass: analyze all records and decide which to keep
             with gzip.open(phase1_warc_file, 'rb') as f:
                 for record in ArchiveIterator(f):
-                    if record.rec_type == 'response':
+                    if record.rec_type in CONTENT_RECORD_TYPES:
                         # Extract URL and content
                         url = record.rec_headers.get_header('WARC-Target-URI')
-                        if not url:
+                        if not url or url in quota_dropped:
                             continue
                         
                         content = record.content_stream().read()
@@ -403,190 +1082,574 @@ class ThreePhaseLegalAnalyzer:
                         except:
                             continue
                         
-                        # Extract clean text for sophisticated analysis
-                        clean_text = self.extractor.extract_clean_text(html_content)
-                        
-                        if not clean_text or len(clean_text) < 30:
-                            continue
-                        
-                        # Sophisticated legal detection
-                        sophisticated_result = self.detector.phase_two_detection(url, html_content, clean_text)
+                        # Extract clean text (WET records already are text) and run sophisticated legal detection
+                        clean_text = html_content if record.rec_type == 'conversion' else self.extractor.extract_clean_text(html_content)
+                        doc_metadata = self._phase2_document_metadata(url, html_content, clean_text, phase1_warc_file.name,
+                                                                      link_graph)
                         
-                        if sophisticated_result['is_legal'] and sophisticated_result['total_confidence'] > 0.3:
-                            # Prepare metadata
-                            doc_metadata = {
-                                'url': url,
-                                'domain': tldextract.extract(url).domain,
-                                'warc_path': phase1_warc_file.name,
-                                'confidence_score': sophisticated_result['total_confidence'],
-                                'detection_method': 'sophisticated_analysis',
-                                'document_types': json.dumps(sophisticated_result['document_types']),
-                                'timestamp': datetime.now().isoformat(),
-                                'html_content_length': len(html_content),
-                                'clean_text_length': len(clean_text),
-                                'phase2_analysis': json.dumps(sophisticated_result)
-                            }
-                            
+                        if doc_metadata:
                             filtered_documents.append(doc_metadata)
                             documents_to_keep.append(record)
             
             # If we have documents that passed filtering
             if filtered_documents:
+                # Metadata first: the WARC appearing in Phase 2 is what signals Phase 3 consumers
+                self._write_phase2_metadata(self.phase2_dir, phase1_warc_file.stem, filtered_documents)
+                
                 # Move WARC file to Phase 2 directory
                 phase2_warc_file = self.phase2_dir / phase1_warc_file.name
-                shutil.move(str(phase1_warc_file), str(phase2_warc_file))
-                
-                # Create metadata parquet file
-                if HAS_PANDAS:
-                    metadata_df = pd.DataFrame(filtered_documents)
-                    metadata_parquet = self.phase2_dir / f"{phase1_warc_file.stem}_metadata.parquet"
-                    metadata_df.to_parquet(metadata_parquet, index=False)
-                    logger.debug(f"Saved metadata parquet: {metadata_parquet}")
-                
-                # Also save JSON for debugging
-                metadata_json = self.phase2_dir / f"{phase1_warc_file.stem}_metadata.json"
-                with open(metadata_json, 'w', encoding='utf-8') as f:
-                    json.dump(filtered_documents, f, indent=2, ensure_ascii=False)
+                if self.input_format == 'wet':
+                    self._write_survivor_warc(phase1_warc_file, phase2_warc_file,
+                                              {doc['url'] for doc in filtered_documents})
+                    remove_warc(phase1_warc_file)
+                else:
+                    move_warc(phase1_warc_file, phase2_warc_file)
                 
                 logger.info(f"Moved WARC to Phase 2 and created metadata for {len(filtered_documents)} documents")
             else:
                 # Delete WARC file if no documents passed filtering
-                phase1_warc_file.unlink()
+                remove_warc(phase1_warc_file)
                 logger.info(f"Deleted WARC file - no documents passed sophisticated filtering")
         
         except Exception as e:
             logger.error(f"Error processing Phase 2 WARC file {phase1_warc_file}: {e}")
+            ERRORS.labels(stage='phase2').inc()
             # Clean up on error
             if phase1_warc_file.exists():
-                phase1_warc_file.unlink()
+                remove_warc(phase1_warc_file)
+        
+        # Link-graph columns are in the metadata now
+        self._link_graph_path(phase1_warc_file).unlink(missing_ok=True)
         
         return filtered_documents
     
+    def _write_survivor_warc(self, text_warc_file: Path, output_warc_file: Path, urls: set) -> int:
+        """
+        WET input: write the survivors' text records followed by their full WARC response
+        records, in place of the whole text WARC; returns the number of full records copied
+        """
+        refers_to: Dict[str, Optional[str]] = {}
+        with gzip.open(text_warc_file, 'rb') as input_f, open(partial_path(output_warc_file), 'wb') as output_f:
+            writer = IndexingWarcWriter(output_f, output_warc_file)
+            for record in ArchiveIterator(input_f):
+                url = record.rec_headers.get_header('WARC-Target-URI')
+                if record.rec_type == 'conversion' and url in urls and url not in refers_to:
+                    writer.write_record(record)
+                    refers_to[url] = record.rec_headers.get_header('WARC-Refers-To')
+            warc_name = text_warc_file.name.replace('_legal_docs.warc.gz', '.gz')
+            full_records = self.fetcher.copy_full_records(warc_name, refers_to, writer,
+                                                          self._survivor_record_index(), self.range_fetcher)
+        writer.write_index()
+        publish(partial_path(output_warc_file), output_warc_file)
+        return full_records
+    
+    def _survivor_record_index(self) -> Optional[CdxServerIndex]:
+        """CDX server lookups of the current crawl, None when disabled"""
+        if not self.cdx_server_url:
+            return None
+        if self._cdx_server_index is None:
+            self._cdx_server_index = CdxServerIndex(self.cdx_server_url, self.crawl_dir.name)
+        return self._cdx_server_index
+    
+    def _phase2_document_metadata(self, url: str, html_content: str, clean_text: str, warc_name: str,
+                                  link_graph: Optional[LinkGraph] = None) -> Optional[Dict]:
+        """Sophisticated detection for one document; returns its metadata row if it passes Phase 2"""
+        if not clean_text or len(clean_text) < 30:
+            DOCUMENTS.labels(phase='2', outcome='no_text').inc()
+            return None
+        
+        # Sophisticated legal detection
+        sophisticated_result = self.detector.phase_two_detection(url, html_content, clean_text)
+        if not (sophisticated_result['is_legal'] and sophisticated_result['total_confidence'] > 0.3):
+            DOCUMENTS.labels(phase='2', outcome='rejected').inc()
+            return None
+        DOCUMENTS.labels(phase='2', outcome='kept').inc()
+        
+        url_domain = domain_info(url)
+        doc_metadata = {
+            'url': url,
+            'domain': url_domain.domain,
+            'registered_domain': url_domain.registered_domain,
+            'warc_path': warc_name,
+            'confidence_score': sophisticated_result['total_confidence'],
+            'detection_method': 'sophisticated_analysis',
+            'document_types': json.dumps(sophisticated_result['document_types']),
+            'timestamp': datetime.now().isoformat(),
+            'html_content_length': len(html_content),
+            'clean_text_length': len(clean_text),
+            'phase2_analysis': json.dumps(sophisticated_result)
+        }
+        if link_graph is not None:
+            doc_metadata.update(link_graph.document_fields(url))
+        if self.preclassifier:
+            doc_metadata['preclassifier_score'] = self.preclassifier.predict_proba(clean_text)
+        return doc_metadata
+    
+    def _write_phase2_metadata(self, directory: Path, stem: str, filtered_documents: List[Dict]):
+        """Write Phase 2 metadata as parquet (when pandas is available) and JSON"""
+        if HAS_PANDAS:
+            import pandas as pd
+            metadata_df = pd.DataFrame(filtered_documents)
+            metadata_parquet = directory / f"{stem}_metadata.parquet"
+            metadata_df.to_parquet(metadata_parquet, index=False)
+            logger.debug(f"Saved metadata parquet: {metadata_parquet}")
+        
+        # Also save JSON for debugging
+        metadata_json = directory / f"{stem}_metadata.json"
+        with open(metadata_json, 'w', encoding='utf-8') as f:
+            json.dump(filtered_documents, f, indent=2, ensure_ascii=False)
+    
     def _run_phase_3(self, resume: bool):
         """Phase 3: Passage extraction with WARC and metadata preservation"""
         # Get all Phase 2 WARC files
-        phase2_warc_files = list(self.phase2_dir.glob("*_legal_docs.warc.gz"))
-        logger.info(f"Phase 3: Processing {len(phase2_warc_files)} Phase 2 WARC files")
+        phase2_warc_files = sorted(self.phase2_dir.glob("*_legal_docs.warc.gz"))
         
-        start_index = 0
+        # WARCs an interrupted run already moved into Phase 3 are finished record by record
         if resume:
-            start_index = self.progress_tracker.get_phase_start_index(3)
-            logger.info(f"Resuming Phase 3 from file index {start_index}")
+            completed = self.progress_tracker.get_completed_files(3)
+            interrupted = [f for f in sorted(self.phase3_dir.glob("*_legal_docs.warc.gz"))
+                           if self._warc_key(f) not in completed]
+            if interrupted:
+                logger.info(f"Resuming Phase 3: {len(interrupted)} partially analyzed WARC files")
+            phase2_warc_files = interrupted + phase2_warc_files
+        
+        logger.info(f"Phase 3: Processing {len(phase2_warc_files)} Phase 2 WARC files")
         
-        for i in range(start_index, len(phase2_warc_files)):
-            phase2_warc_file = phase2_warc_files[i]
+        for i, phase2_warc_file in enumerate(phase2_warc_files):
             logger.info(f"Phase 3: Processing {i+1}/{len(phase2_warc_files)}: {phase2_warc_file.name}")
             
             try:
-                extracted_passages, tokens_used = self._process_phase3_gpt_analysis(phase2_warc_file)
+                extracted_passages, tokens_used, skipped_documents = self._process_phase3_gpt_analysis(phase2_warc_file)
                 
                 # Update progress
-                warc_name = phase2_warc_file.stem.replace('_legal_docs', '')
-                self.progress_tracker.update_phase_3(i, warc_name, len(extracted_passages), tokens_used)
+                tokens_saved = sum(doc['estimated_tokens_saved'] for doc in skipped_documents)
+                self.progress_tracker.update_phase_3(i, self._warc_key(phase2_warc_file), len(extracted_passages),
+                                                     tokens_used, len(skipped_documents), tokens_saved)
+                self._segment_finished_warc(self.phase3_dir / phase2_warc_file.name)
                 
                 logger.info(f"Phase 3 completed for {phase2_warc_file.name}: {len(extracted_passages)} passages extracted")
                 
             except Exception as e:
                 logger.error(f"Error in Phase 3 processing {phase2_warc_file}: {e}")
+                ERRORS.labels(stage='phase3').inc()
     
-    def _process_phase3_gpt_analysis(self, phase2_warc_file: Path) -> Tuple[List[Dict], int]:
-        """Process Phase 2 WARC file with GPT analysis and create final storage"""
+    def _run_phase_3_scheduled(self):
+        """Phase 3 in global priority order across all Phase 2 outputs, within the scheduler's budget"""
+        scheduler = self.phase3_scheduler
+        candidates = scheduler.collect_candidates(self.phase2_dir, self.phase3_dir)
+        if 3 in self.domain_quotas:
+            # Highest-priority documents of a domain take its slots
+            ranked = sorted(candidates, key=lambda item: (-item.priority, item.url))
+            quota_dropped = self._quota_dropped_urls(3, [phase3_candidate(item.metadata) for item in ranked])
+            candidates = [item for item in candidates if item.url not in quota_dropped]
+        selected, deferred = scheduler.plan(candidates)
+        
+        # Visit WARCs in the order of their best-ranked document, documents within a WARC by rank
+        items_by_warc: Dict[str, List[Phase3WorkItem]] = {}
+        for item in selected:
+            items_by_warc.setdefault(item.warc_file, []).append(item)
+        
+        logger.info(f"Phase 3 (scheduled, priority={scheduler.priority}): {len(selected)} documents "
+                    f"in {len(items_by_warc)} WARC files")
+        
+        for i, (warc_name, items) in enumerate(items_by_warc.items()):
+            if not scheduler.budget.can_afford(min(item.estimated_tokens for item in items)):
+                deferred.extend(items)
+                continue
+            
+            logger.info(f"Phase 3: Processing {i+1}/{len(items_by_warc)}: {warc_name} ({len(items)} scheduled documents)")
+            try:
+                extracted_passages, tokens_used, skipped_documents, leftover = \
+                    self._process_phase3_scheduled_warc(warc_name, items)
+                deferred.extend(leftover)
+                
+                tokens_saved = sum(doc['estimated_tokens_saved'] for doc in skipped_documents)
+                self.progress_tracker.update_phase_3(i, self._warc_key(self.phase3_dir / warc_name),
+                                                     len(extracted_passages), tokens_used,
+                                                     len(skipped_documents), tokens_saved)
+                if not leftover:
+                    self._segment_finished_warc(self.phase3_dir / warc_name)
+            except Exception as e:
+                logger.error(f"Error in Phase 3 processing {warc_name}: {e}")
+                ERRORS.labels(stage='phase3').inc()
+                deferred.extend(items)
+        
+        scheduler.write_deferred(self.phase3_dir, deferred)
+        budget_stats = scheduler.budget.get_stats()
+        logger.info(f"Phase 3 budget: {budget_stats['tokens_spent']:,} tokens spent "
+                    f"(~${budget_stats['estimated_cost_usd']:.2f}), {len(deferred)} documents deferred")
+    
+    def _process_phase3_scheduled_warc(self, warc_name: str, items: List[Phase3WorkItem]) -> Tuple[List[Dict], int, List[Dict], List[Phase3WorkItem]]:
+        """Analyze the scheduled documents of one WARC; returns passages, tokens, skipped and unaffordable items"""
+        budget = self.phase3_scheduler.budget
+        
+        # A WARC deferred in an earlier run is already in the Phase 3 directory
+        phase2_warc_file = self.phase2_dir / warc_name
+        if phase2_warc_file.exists():
+            phase3_warc_file, _ = self._stage_phase3_warc(phase2_warc_file)
+        else:
+            phase3_warc_file = self.phase3_dir / warc_name
+        
+        stem = Path(warc_name).stem
+        gpt_parquet = self.phase3_dir / f"{stem}_gpt_analysis.parquet"
+        gpt_json = self.phase3_dir / f"{stem}_gpt_analysis.json"
+        
+        # Continue the existing results of a partially analyzed WARC
         extracted_passages = []
+        if gpt_json.exists():
+            with open(gpt_json, 'r', encoding='utf-8') as f:
+                extracted_passages = json.load(f)
+        previous_passages = len(extracted_passages)
+        
+        done_urls = self.progress_tracker.get_completed_records(3, self._warc_key(phase3_warc_file))
+        items = [item for item in items if item.url not in done_urls]
+        items_by_url = {item.url: item for item in items}
+        texts = dict(self._iter_phase3_documents(phase3_warc_file, set(items_by_url)))
+        
+        total_tokens_used = 0
+        skipped_documents = []
+        leftover = []
+        
+        for item in items:
+            clean_text = texts.get(item.url)
+            if clean_text is None:
+                continue
+            
+            preclassifier_score = None
+            if self.preclassifier:
+                preclassifier_score = self.preclassifier.predict_proba(clean_text)
+                if preclassifier_score < self.preclassifier_threshold and self.preclassifier_mode == 'skip':
+                    skipped_documents.append({
+                        'url': item.url,
+                        'preclassifier_score': preclassifier_score,
+                        'estimated_tokens_saved': estimate_analysis_tokens(clean_text)
+                    })
+                    continue
+            
+            if not budget.can_afford(estimate_analysis_tokens(clean_text)):
+                leftover.append(item)
+                continue
+            
+            budget.throttle()
+            phase2_result = json.loads(item.metadata['phase2_analysis']) if item.metadata.get('phase2_analysis') else None
+            tokens_used = self._analyze_phase3_document(
+                item.url, clean_text, phase3_warc_file, extracted_passages, gpt_parquet, gpt_json,
+                preclassifier_score, phase2_result
+            )
+            budget.charge(tokens_used)
+            total_tokens_used += tokens_used
+        
+        return extracted_passages[previous_passages:], total_tokens_used, skipped_documents, leftover
+    
+    def _process_phase3_gpt_analysis(self, phase2_warc_file: Path) -> Tuple[List[Dict], int, List[Dict]]:
+        """Process Phase 2 WARC file with GPT analysis and create final storage"""
+        skipped_documents = []
         total_tokens_used = 0
         
         # Create incremental output files
         gpt_parquet = self.phase3_dir / f"{phase2_warc_file.stem}_gpt_analysis.parquet"
         gpt_json = self.phase3_dir / f"{phase2_warc_file.stem}_gpt_analysis.json"
         
+        # Documents finished before an interruption keep their rows and are not re-sent to GPT
+        extracted_passages, done_urls = self._load_resumed_gpt_rows(self._warc_key(phase2_warc_file), gpt_json)
+        previous_passages = len(extracted_passages)
+        
         try:
-            # Move WARC file to Phase 3 directory (not copy)
-            phase3_warc_file = self.phase3_dir / phase2_warc_file.name
-            shutil.move(str(phase2_warc_file), str(phase3_warc_file))
-            
-            # Move metadata parquet file to Phase 3 directory (not copy)
-            metadata_parquet = self.phase2_dir / f"{phase2_warc_file.stem}_metadata.parquet"
-            if metadata_parquet.exists():
-                phase3_metadata_parquet = self.phase3_dir / f"{phase2_warc_file.stem}_metadata.parquet"
-                shutil.move(str(metadata_parquet), str(phase3_metadata_parquet))
-            
-            # Also move the JSON metadata file if it exists
-            metadata_json = self.phase2_dir / f"{phase2_warc_file.stem}_metadata.json"
-            if metadata_json.exists():
+            if phase2_warc_file.parent == self.phase3_dir:
+                phase3_warc_file = phase2_warc_file
                 phase3_metadata_json = self.phase3_dir / f"{phase2_warc_file.stem}_metadata.json"
-                shutil.move(str(metadata_json), str(phase3_metadata_json))
+            else:
+                phase3_warc_file, phase3_metadata_json = self._stage_phase3_warc(phase2_warc_file)
             
-            # Process WARC file for GPT analysis (now reading from phase3 location)
-            document_count = 0
+            # Phase 2 signals per URL feed the model-tier router
+            phase2_signals = self._load_phase2_signals(phase3_metadata_json) if self.model_router else {}
+            # The WARC also holds the records Phase 2 rejected; like the streaming pipeline, only survivors
+            # the Phase 3 quota keeps go to GPT
+            admitted_urls = self._phase3_admitted_urls(phase3_metadata_json, done_urls)
             
-            with gzip.open(phase3_warc_file, 'rb') as f:
-                for record in ArchiveIterator(f):
-                    if record.rec_type == 'response':
-                        # Extract URL and content
-                        url = record.rec_headers.get_header('WARC-Target-URI')
-                        if not url:
-                            continue
-                        
-                        content = record.content_stream().read()
-                        if not content:
-                            continue
-                        
-                        try:
-                            html_content = content.decode('utf-8', errors='ignore')
-                        except:
-                            continue
-                        
-                        # Extract clean text
-                        clean_text = self.extractor.extract_clean_text(html_content)
-                        if not clean_text or len(clean_text) < 200:
+            # Process WARC file for GPT analysis (now reading from phase3 location)
+            def analysis_jobs():
+                """Yield _analyze_phase3_document arguments, deferred confident negatives last"""
+                document_count = 0
+                deferred_documents = []
+                
+                for url, clean_text in self._iter_phase3_documents(phase3_warc_file, admitted_urls):
+                    # Pre-classifier: skip or defer confident negatives
+                    preclassifier_score = None
+                    if self.preclassifier:
+                        preclassifier_score = self.preclassifier.predict_proba(clean_text)
+                        if preclassifier_score < self.preclassifier_threshold:
+                            if self.preclassifier_mode == 'defer':
+                                deferred_documents.append((url, clean_text, preclassifier_score))
+                            else:
+                                skipped_documents.append({
+                                    'url': url,
+                                    'preclassifier_score': preclassifier_score,
+                                    'estimated_tokens_saved': estimate_analysis_tokens(clean_text)
+                                })
                             continue
-                        
-                        document_count += 1
-                        logger.info(f"Phase 3: Processing document {document_count} - {url}")
-                        
-                        # Track tokens used for THIS document only
-                        previous_token_count = self.gpt_analyzer.total_tokens_used
-                        gpt_result = self.gpt_analyzer.analyze_document(clean_text, url)
-                        tokens_for_this_doc = self.gpt_analyzer.total_tokens_used - previous_token_count
-                        total_tokens_used += tokens_for_this_doc
-                        
-                        # Prepare GPT analysis data
-                        passage_data = {
-                            'url': url,
-                            'domain': tldextract.extract(url).domain,
-                            'warc_file': phase3_warc_file.name,
-                            'gpt_analysis': json.dumps(gpt_result),
-                            'clean_text_length': len(clean_text),
-                            'copyright_clauses_count': len(gpt_result.get('copyright_clauses', [])),
-                            'access_level': gpt_result.get('access_level', {}).get('level', 'unknown'),
-                            'technical_protection_measures_count': len(gpt_result.get('technical_protection_measures', [])),
-                            'liability_clauses_count': len(gpt_result.get('liability_clauses', [])),
-                            'jurisdiction_clauses_count': len(gpt_result.get('jurisdiction_clauses', [])),
-                            'data_licensing_count': len(gpt_result.get('data_licensing', [])),
-                            'extraction_timestamp': datetime.now().isoformat(),
-                            'tokens_used': tokens_for_this_doc
-                        }
-                        
-                        extracted_passages.append(passage_data)
-                        
-                        # SAVE AFTER EACH DOCUMENT - This is the key improvement
-                        self._save_incremental_gpt_results(extracted_passages, gpt_parquet, gpt_json)
-                        
-                        logger.info(f"Saved GPT analysis for {url} - {len(gpt_result.get('copyright_clauses', []))} copyright clauses found")
+                
+                    document_count += 1
+                    logger.info(f"Phase 3: Processing document {document_count} - {url}")
+                    yield (url, clean_text, phase3_warc_file, extracted_passages, gpt_parquet, gpt_json,
+                           preclassifier_score, phase2_signals.get(url))
+                
+                # Deferred confident negatives are analyzed only after everything else
+                for url, clean_text, preclassifier_score in deferred_documents:
+                    document_count += 1
+                    logger.info(f"Phase 3: Processing deferred document {document_count} - {url}")
+                    yield (url, clean_text, phase3_warc_file, extracted_passages, gpt_parquet, gpt_json,
+                           preclassifier_score, phase2_signals.get(url))
+            
+            # Sequential unless adaptive concurrency runs several GPT calls at once
+            total_tokens_used = self._run_phase3_jobs(analysis_jobs())
+            
+            if skipped_documents:
+                self._write_preclassifier_skipped(phase2_warc_file.stem, skipped_documents)
             
             logger.info(f"Phase 3 completed: WARC + metadata moved, {len(extracted_passages)} GPT analyses saved")
             
         except Exception as e:
             logger.error(f"Error in Phase 3 processing {phase2_warc_file}: {e}")
+            ERRORS.labels(stage='phase3').inc()
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
         
-        return extracted_passages, total_tokens_used
+        return extracted_passages[previous_passages:], total_tokens_used, skipped_documents
+    
+    @staticmethod
+    def _warc_key(warc_file: Path) -> str:
+        """Stable progress key of a Phase 1-3 WARC, independent of the directory it is in"""
+        return warc_file.stem.replace('_legal_docs', '')
+    
+    def _load_resumed_gpt_rows(self, warc_key: str, gpt_json: Path) -> Tuple[List[Dict], set]:
+        """GPT rows of documents recorded as done for this WARC, and their URLs"""
+        done_urls = self.progress_tracker.get_completed_records(3, warc_key)
+        if not done_urls or not gpt_json.exists():
+            return [], set()
+        
+        with open(gpt_json, 'r', encoding='utf-8') as f:
+            rows = [row for row in json.load(f) if row['url'] in done_urls]
+        logger.info(f"Resuming {warc_key}: {len(rows)} documents already analyzed")
+        return rows, {row['url'] for row in rows}
+    
+    def _write_preclassifier_skipped(self, stem: str, skipped_documents: List[Dict]):
+        """Record the confident negatives the pre-classifier kept away from GPT"""
+        skipped_json = self.phase3_dir / f"{stem}_preclassifier_skipped.json"
+        with open(skipped_json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'model_version': self.preclassifier.model_version,
+                'threshold': self.preclassifier_threshold,
+                'documents': skipped_documents
+            }, f, indent=2, ensure_ascii=False)
+        DOCUMENTS.labels(phase='3', outcome='preclassifier_skipped').inc(len(skipped_documents))
+        logger.info(f"Pre-classifier skipped {len(skipped_documents)} confident negatives")
+    
+    def _stage_phase3_warc(self, phase2_warc_file: Path) -> Tuple[Path, Path]:
+        """Move a Phase 2 WARC and its metadata into the Phase 3 directory, return (WARC, metadata JSON)"""
+        # Move WARC file to Phase 3 directory (not copy)
+        phase3_warc_file = self.phase3_dir / phase2_warc_file.name
+        move_warc(phase2_warc_file, phase3_warc_file)
+        
+        # Move metadata parquet file to Phase 3 directory (not copy)
+        metadata_parquet = self.phase2_dir / f"{phase2_warc_file.stem}_metadata.parquet"
+        if metadata_parquet.exists():
+            phase3_metadata_parquet = self.phase3_dir / f"{phase2_warc_file.stem}_metadata.parquet"
+            shutil.move(str(metadata_parquet), str(phase3_metadata_parquet))
+        
+        # Also move the JSON metadata file if it exists
+        metadata_json = self.phase2_dir / f"{phase2_warc_file.stem}_metadata.json"
+        phase3_metadata_json = self.phase3_dir / f"{phase2_warc_file.stem}_metadata.json"
+        if metadata_json.exists():
+            shutil.move(str(metadata_json), str(phase3_metadata_json))
+        
+        return phase3_warc_file, phase3_metadata_json
+    
+    def _iter_phase3_documents(self, phase3_warc_file: Path, urls: Optional[set] = None):
+        """Yield (url, clean_text) for analyzable response records, optionally only for the given URLs"""
+        if urls is not None:
+            # A few documents of the file: seek to their records instead of scanning it
+            yield from self._iter_indexed_documents(phase3_warc_file, urls)
+            return
+        
+        # WET text records precede the full records of the same documents, which are then skipped
+        text_urls = set()
+        with gzip.open(phase3_warc_file, 'rb') as f:
+            for record in ArchiveIterator(f):
+                if record.rec_type in CONTENT_RECORD_TYPES:
+                    # Extract URL and content
+                    url = record.rec_headers.get_header('WARC-Target-URI')
+                    if not url or url in text_urls:
+                        continue
+                    
+                    if record.rec_type == 'conversion':
+                        text_urls.add(url)
+                    clean_text = self._phase3_document_text(record)
+                    if clean_text:
+                        yield url, clean_text
+    
+    def _iter_indexed_documents(self, phase3_warc_file: Path, urls: set):
+        """Yield (url, clean_text) of the given URLs, reading only their records through the sidecar index"""
+        store = WarcRecordStore(phase3_warc_file)
+        entries = []
+        for url in urls:
+            # The WET text record of a document takes precedence over its full record
+            entry = (store.lookup(url, rec_types=('conversion',))
+                     or store.lookup(url, rec_types=CONTENT_RECORD_TYPES))
+            if entry:
+                entries.append(entry)
+        
+        for record in store.iter_records(entries):
+            clean_text = self._phase3_document_text(record)
+            if clean_text:
+                yield record.rec_headers.get_header('WARC-Target-URI'), clean_text
+    
+    def _phase3_document_text(self, record) -> Optional[str]:
+        """Clean text of a content record, None when it is too short to analyze"""
+        content = record.content_stream().read()
+        if not content:
+            return None
+        
+        html_content = content.decode('utf-8', errors='ignore')
+        
+        # Extract clean text
+        clean_text = html_content if record.rec_type == 'conversion' else self.extractor.extract_clean_text(html_content)
+        if not clean_text or len(clean_text) < 200:
+            return None
+        return clean_text
+    
+    def _run_phase3_jobs(self, jobs) -> int:
+        """Run _analyze_phase3_document for each argument tuple, return total tokens used"""
+        if self.gpt_limiter is None:
+            return sum(self._analyze_phase3_document(*job) for job in jobs)
+        
+        def run(job):
+            with self.gpt_limiter:
+                return self._analyze_phase3_document(*job)
+        
+        # The AIMD controller sets how many calls are in flight; the pool only caps the threads
+        max_workers = self.gpt_concurrency.max_limit
+        pending = threading.BoundedSemaphore(2 * max_workers)
+        futures = []
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gpt") as executor:
+            for job in jobs:
+                pending.acquire()
+                future = executor.submit(run, job)
+                future.add_done_callback(lambda _: pending.release())
+                futures.append(future)
+        return sum(future.result() for future in futures)
+    
+    def _analyze_phase3_document(self, url: str, clean_text: str, phase3_warc_file: Path,
+                                 extracted_passages: List[Dict], gpt_parquet: Path, gpt_json: Path,
+                                 preclassifier_score: Optional[float] = None,
+                                 phase2_result: Optional[Dict] = None) -> int:
+        """Run GPT analysis on one document, append and save its passage data, return tokens used"""
+        # Track tokens used for THIS document only (per thread, so concurrent calls don't mix)
+        model_tier = None
+        if self.model_router:
+            gpt_result, model_tier, tokens_for_this_doc, failed = self._analyze_with_routing(clean_text, url, phase2_result)
+        else:
+            gpt_result = self.gpt_analyzer.analyze_document(clean_text, url)
+            tokens_for_this_doc = self.gpt_analyzer.last_call_tokens
+            failed = self.gpt_analyzer.last_call_failed
+        self.progress_tracker.record_spend(3, self._warc_key(phase3_warc_file), tokens_for_this_doc)
+        
+        # A failed call yields an empty analysis: keep it out of the results and leave the record
+        # unmarked, so resuming the WARC sends it again
+        if failed:
+            DOCUMENTS.labels(phase='3', outcome='failed').inc()
+            logger.warning(f"GPT analysis failed for {url}; it will be retried when its WARC is resumed")
+            return tokens_for_this_doc
+        
+        # Prepare GPT analysis data
+        url_domain = domain_info(url)
+        passage_data = {
+            'url': url,
+            'domain': url_domain.domain,
+            'registered_domain': url_domain.registered_domain,
+            'warc_file': phase3_warc_file.name,
+            'gpt_analysis': json.dumps(gpt_result),
+            'clean_text_length': len(clean_text),
+            'copyright_clauses_count': len(gpt_result.get('copyright_clauses', [])),
+            'access_level': gpt_result.get('access_level', {}).get('level', 'unknown'),
+            'technical_protection_measures_count': len(gpt_result.get('technical_protection_measures', [])),
+            'liability_clauses_count': len(gpt_result.get('liability_clauses', [])),
+            'jurisdiction_clauses_count': len(gpt_result.get('jurisdiction_clauses', [])),
+            'data_licensing_count': len(gpt_result.get('data_licensing', [])),
+            'extraction_timestamp': datetime.now().isoformat(),
+            'tokens_used': tokens_for_this_doc
+        }
+        if preclassifier_score is not None:
+            passage_data['preclassifier_score'] = preclassifier_score
+        if model_tier:
+            passage_data['model_tier'] = model_tier
+        
+        with self._results_lock:
+            extracted_passages.append(passage_data)
+            
+            # SAVE AFTER EACH DOCUMENT - This is the key improvement
+            self._save_incremental_gpt_results(extracted_passages, gpt_parquet, gpt_json)
+            self.progress_tracker.mark_record_done(3, self._warc_key(phase3_warc_file), url, tokens_for_this_doc)
+        
+        DOCUMENTS.labels(phase='3', outcome='analyzed').inc()
+        logger.info(f"Saved GPT analysis for {url} - {len(gpt_result.get('copyright_clauses', []))} copyright clauses found")
+        return tokens_for_this_doc
 
+    def _analyze_with_routing(self, clean_text: str, url: str, phase2_result: Optional[Dict]) -> Tuple[Dict, str, int, bool]:
+        """Analyze on the tier chosen by the router, escalating ambiguous cheap-tier answers; returns tokens and failure too"""
+        decision = self.model_router.route(clean_text, phase2_result)
+        tier = decision.tier
+        
+        start_time = time.time()
+        gpt_result = self.gpt_analyzer.analyze_document(clean_text, url, model=tier.model, max_tokens=tier.max_tokens)
+        tokens_used = self.gpt_analyzer.last_call_tokens
+        failed = self.gpt_analyzer.last_call_failed
+        self.model_router.record(tier, decision.reason, tokens_used, time.time() - start_time)
+        
+        if not failed and self.model_router.needs_escalation(decision, gpt_result):
+            full_tier = self.model_router.full_tier
+            logger.info(f"Escalating {url} from {decision.tier.name} to {full_tier.name} tier")
+            start_time = time.time()
+            escalated_result = self.gpt_analyzer.analyze_document(clean_text, url, model=full_tier.model,
+                                                                  max_tokens=full_tier.max_tokens)
+            escalation_tokens = self.gpt_analyzer.last_call_tokens
+            tokens_used += escalation_tokens
+            self.model_router.record(full_tier, 'escalated_ambiguous_result', escalation_tokens,
+                                     time.time() - start_time, escalation=True)
+            # A failed escalation keeps the cheap tier's answer
+            if not self.gpt_analyzer.last_call_failed:
+                gpt_result, tier = escalated_result, full_tier
+        
+        return gpt_result, tier.name, tokens_used, failed
+    
+    def _phase3_admitted_urls(self, metadata_json: Path, done_urls: set) -> set:
+        """Phase 2 survivors of a WARC still to analyze that the Phase 3 quota keeps (all of them without a quota)"""
+        if not metadata_json.exists():
+            return set()
+        with open(metadata_json, 'r', encoding='utf-8') as f:
+            # Too short to analyze: never sent to GPT, so they take no quota slot (as in streaming mode)
+            documents = [doc for doc in json.load(f)
+                         if doc['url'] not in done_urls and doc.get('clean_text_length', 200) >= 200]
+        quota_dropped = self._quota_dropped_urls(3, [phase3_candidate(doc) for doc in documents])
+        return {doc['url'] for doc in documents} - quota_dropped
+    
+    def _load_phase2_signals(self, metadata_json: Path) -> Dict[str, Dict]:
+        """Map URL -> Phase 2 sophisticated analysis from a metadata JSON file"""
+        if not metadata_json.exists():
+            return {}
+        try:
+            with open(metadata_json, 'r', encoding='utf-8') as f:
+                return {doc['url']: json.loads(doc['phase2_analysis']) for doc in json.load(f)}
+        except Exception as e:
+            logger.warning(f"Could not load Phase 2 signals from {metadata_json}: {e}")
+            return {}
+    
     def _save_incremental_gpt_results(self, extracted_passages: List[Dict], gpt_parquet: Path, gpt_json: Path):
         """Save GPT analysis results incrementally after each document"""
         try:
             # Save as parquet (overwrites previous version)
             if extracted_passages and HAS_PANDAS:
+                import pandas as pd
                 gpt_analysis_df = pd.DataFrame(extracted_passages)
                 gpt_analysis_df.to_parquet(gpt_parquet, index=False)
             
@@ -599,11 +1662,294 @@ class ThreePhaseLegalAnalyzer:
             
         except Exception as e:
             logger.error(f"Error saving incremental GPT results: {e}")
+            ERRORS.labels(stage='phase3_save').inc()
+    
+    def _run_streaming_pipeline(self, warc_paths: List[str], resume: bool):
+        """
+        Fused pipeline: each record is decompressed and parsed once, then flows through
+        Phase 1 detection -> Phase 2 filtering -> Phase 3 GPT analysis in bounded stages.
+        Per-phase artifacts are written exactly as the phased pipeline leaves them.
+        """
+        if self.phase3_scheduler:
+            logger.warning("Phase 3 budget scheduling needs all of Phase 2 up front; ignored in streaming mode")
+        
+        completed = self.progress_tracker.get_completed_files(1) if resume else set()
+        
+        self._streaming_start_time = time.time()
+        self.pipeline_stats = {'mode': 'streaming', 'time_to_first_result_seconds': None}
+        
+        phase3_stage = PipelineStage('phase3_gpt_analysis', self._streaming_phase3,
+                                     queue_size=self.streaming_queue_size, **self._stage_workers(self.gpt_limiter))
+        phase2_stage = PipelineStage('phase2_filtering', self._streaming_phase2, output=phase3_stage,
+                                     queue_size=self.streaming_queue_size,
+                                     **self._stage_workers(self._queue_limiter('phase2_filtering', CPU_STAGE_MAX_WORKERS)))
+        # Downloaded files wait in a queue of one, so prefetching never gets far ahead of Phase 1
+        phase1_stage = PipelineStage('phase1_detection', self._streaming_read, output=phase2_stage, queue_size=1,
+                                     **self._stage_workers(self._queue_limiter('phase1_detection', CPU_STAGE_MAX_WORKERS)))
+        download_stage = PipelineStage('download', self._streaming_download, output=phase1_stage,
+                                       queue_size=len(warc_paths) + 1,
+                                       **self._stage_workers(self._queue_limiter('download', DOWNLOAD_MAX_WORKERS,
+                                                                                 cpu_bound=False)))
+        stages = [download_stage, phase1_stage, phase2_stage, phase3_stage]
+        for stage in stages:
+            stage.start()
+        
+        monitor = ConcurrencyMonitor(stages, CONCURRENCY_SAMPLE_SECONDS) if self.adaptive_concurrency else None
+        if monitor:
+            monitor.start()
+        
+        try:
+            for i, warc_path in enumerate(warc_paths):
+                if warc_path in completed:
+                    continue
+                download_stage.put((i, warc_path))
+        finally:
+            # Drains every queued file and record through Phase 3 before returning
+            download_stage.close()
+            if monitor:
+                monitor.stop()
+        
+        self.pipeline_stats['stages'] = [stage.get_stats() for stage in stages]
+        if self.adaptive_concurrency:
+            self.pipeline_stats['concurrency_decisions'] = {
+                stage.name: stage.limiter.controller.decisions for stage in stages if stage.limiter
+            }
+        logger.info(f"Streaming pipeline finished; first GPT result after "
+                    f"{self.pipeline_stats['time_to_first_result_seconds'] or 0:.1f}s")
+    
+    def _queue_limiter(self, name: str, max_workers: int, cpu_bound: bool = True) -> Optional[AdaptiveLimiter]:
+        """Worker limit for a download or CPU stage, or None when concurrency is not adaptive"""
+        if not self.adaptive_concurrency:
+            return None
+        return AdaptiveLimiter(QueueDrivenController(name, max_limit=max_workers, cpu_bound=cpu_bound,
+                                                     target_utilization=CPU_TARGET_UTILIZATION))
+    
+    @staticmethod
+    def _stage_workers(limiter: Optional[AdaptiveLimiter]) -> Dict:
+        """PipelineStage arguments: one worker, or a thread per slot the controller may grant"""
+        if limiter is None:
+            return {}
+        return {'limiter': limiter, 'max_workers': limiter.controller.max_limit}
+    
+    def _streaming_download(self, item, emit):
+        """Download stage: fetch one input WARC"""
+        i, warc_path = item
+        warc_file = self._download_input(warc_path)
+        if not warc_file:
+            logger.error(f"Failed to download WARC file: {warc_path}")
+            return
+        emit((i, warc_path, warc_file))
+    
+    def _streaming_read(self, item, emit):
+        """Phase 1 stage: set up the per-file context and stream the WARC's records to Phase 2"""
+        i, warc_path, warc_file = item
+        logger.info(f"Streaming: Processing {i+1}: {warc_path}")
+        
+        phase1_warc_file = self.phase1_dir / f"{warc_stem(warc_file)}_legal_docs.warc.gz"
+        extracted_passages, done_urls = self._load_resumed_gpt_rows(
+            self._warc_key(phase1_warc_file),
+            self.phase3_dir / f"{phase1_warc_file.stem}_gpt_analysis.json"
+        )
+        context = StreamingWarcContext(
+            file_index=i,
+            warc_path=warc_path,
+            phase1_warc_file=phase1_warc_file,
+            extracted_passages=extracted_passages,
+            done_urls=done_urls
+        )
+        if self.link_discovery:
+            # Records are handed on as they are read, so the whole graph has to be known up front
+            context.link_graph = self._prebuilt_link_graph(warc_path) or self._scan_link_graph(warc_file)
+        self._streaming_phase1(warc_file, context, emit)
+    
+    def _streaming_phase1(self, warc_file: Path, context: StreamingWarcContext, emit: Callable):
+        """Read the input WARC once: detect, copy hits to the Phase 1 WARC and hand them to Phase 2"""
+        try:
+            records_metric = RECORDS.labels(phase='1')
+            bytes_metric = BYTES.labels(stage='phase1_read')
+            legal_metric = DOCUMENTS.labels(phase='1', outcome='legal')
+            sampled_ids = []
+            
+            with gzip.open(warc_file, 'rb') as input_f, open(context.phase1_warc_file, 'wb') as output_f:
+                writer = IndexingWarcWriter(output_f, context.phase1_warc_file)
+                
+                for record in ArchiveIterator(input_f):
+                    if record.rec_type not in CONTENT_RECORD_TYPES:
+                        continue
+                    context.records_processed += 1
+                    records_metric.inc()
+                    
+                    url = record.rec_headers.get_header('WARC-Target-URI')
+                    if not url:
+                        continue
+                    
+                    if self.sample:
+                        record_id = record.rec_headers.get_header('WARC-Record-ID')
+                        if not self.sample.selects(context.warc_path, record_id):
+                            continue
+                        sampled_ids.append(record_id)
+                    
+                    is_target = context.link_graph.classify(url) if context.link_graph else None
+                    if is_target is False and self.link_discovery == 'restrict':
+                        self._count_link_stat('detection_skipped')
+                        continue
+                    
+                    raw = buffer_record(record)
+                    content = record.content_stream().read()
+                    if not content:
+                        continue
+                    bytes_metric.inc(len(content))
+                    html_content = content.decode('utf-8', errors='ignore')
+                    
+                    if is_target:
+                        self._count_link_stat('targets_in_warcs')
+                    elif not self.detector.phase_one_detection(url, html_content)['is_legal']:
+                        continue
+                    
+                    # Copy the original record for the Phase 1 audit WARC
+                    rewind_record(record, raw)
+                    writer.write_record(record)
+                    context.legal_docs_found += 1
+                    legal_metric.inc()
+                    
+                    # Blocks while Phase 2 is behind (backpressure)
+                    emit((context, url, html_content, record.rec_type == 'conversion'))
+            writer.write_index()
+            
+            if self.sample:
+                self._observe_sampled_warc(context.warc_path, context.records_processed, sampled_ids,
+                                           context.legal_docs_found)
+        
+        except Exception as e:
+            logger.error(f"Error streaming WARC file {warc_file}: {e}")
+            ERRORS.labels(stage='phase1').inc()
+        
+        # Phase 2 and 3 finish this file once everything queued before the marker is done
+        emit(WarcEnd(context))
+    
+    def _streaming_phase2(self, item, emit):
+        """Phase 2 stage: extraction and sophisticated filtering"""
+        if isinstance(item, WarcEnd):
+            emit(item)
+            return
+        
+        context, url, html_content, is_text = item
+        # Records arrive one at a time here, so the quota admits them first come, first served
+        quota = self.domain_quotas.get(2)
+        link_target = context.link_graph.target(url) if context.link_graph else None
+        if quota and not quota.admit(phase2_candidate(url, self.detector, link_target)):
+            return
+        
+        clean_text = html_content if is_text else self.extractor.extract_clean_text(html_content)
+        doc_metadata = self._phase2_document_metadata(url, html_content, clean_text, context.phase1_warc_file.name,
+                                                      context.link_graph)
+        if not doc_metadata:
+            return
+        
+        context.filtered_documents.append(doc_metadata)
+        if len(clean_text) >= 200:
+            emit((context, url, clean_text, doc_metadata))
+    
+    def _streaming_phase3(self, item, emit):
+        """Phase 3 stage: pre-classifier gate and GPT analysis"""
+        if isinstance(item, WarcEnd):
+            self._finalize_streaming_warc(item.context)
+            return
+        
+        context, url, clean_text, doc_metadata = item
+        if url in context.done_urls:
+            return
+        
+        quota = self.domain_quotas.get(3)
+        if quota and not quota.admit(phase3_candidate(doc_metadata)):
+            return
+        
+        preclassifier_score = doc_metadata.get('preclassifier_score')
+        if preclassifier_score is not None and preclassifier_score < self.preclassifier_threshold:
+            if self.preclassifier_mode == 'defer':
+                context.deferred_documents.append((url, clean_text, doc_metadata))
+            else:
+                context.skipped_documents.append({
+                    'url': url,
+                    'preclassifier_score': preclassifier_score,
+                    'estimated_tokens_saved': estimate_analysis_tokens(clean_text)
+                })
+            return
+        
+        self._streaming_analyze(context, url, clean_text, doc_metadata)
+    
+    def _streaming_analyze(self, context: StreamingWarcContext, url: str, clean_text: str, doc_metadata: Dict):
+        stem = context.phase1_warc_file.stem
+        tokens_used = self._analyze_phase3_document(
+            url, clean_text, self.phase3_dir / context.phase1_warc_file.name, context.extracted_passages,
+            self.phase3_dir / f"{stem}_gpt_analysis.parquet", self.phase3_dir / f"{stem}_gpt_analysis.json",
+            doc_metadata.get('preclassifier_score'), json.loads(doc_metadata['phase2_analysis'])
+        )
+        with self._results_lock:
+            context.tokens_used += tokens_used
+        if self.pipeline_stats.get('time_to_first_result_seconds') is None:
+            self.pipeline_stats['time_to_first_result_seconds'] = time.time() - self._streaming_start_time
+    
+    def _finalize_streaming_warc(self, context: StreamingWarcContext):
+        """Write the per-phase artifacts for one input WARC and record its progress"""
+        for url, clean_text, doc_metadata in context.deferred_documents:
+            logger.info(f"Phase 3: Processing deferred document - {url}")
+            self._streaming_analyze(context, url, clean_text, doc_metadata)
+        
+        phase1_warc_file = context.phase1_warc_file
+        if context.filtered_documents:
+            # The phased pipeline moves the WARC through Phase 2 into Phase 3 alongside its metadata
+            if self.input_format == 'wet':
+                self._write_survivor_warc(phase1_warc_file, self.phase3_dir / phase1_warc_file.name,
+                                          {doc['url'] for doc in context.filtered_documents})
+                remove_warc(phase1_warc_file)
+            else:
+                move_warc(phase1_warc_file, self.phase3_dir / phase1_warc_file.name)
+            self._write_phase2_metadata(self.phase3_dir, phase1_warc_file.stem, context.filtered_documents)
+        elif phase1_warc_file.exists():
+            remove_warc(phase1_warc_file)
+        
+        if context.skipped_documents:
+            self._write_preclassifier_skipped(phase1_warc_file.stem, context.skipped_documents)
+        
+        warc_name = phase1_warc_file.stem.replace('_legal_docs', '')
+        tokens_saved = sum(doc['estimated_tokens_saved'] for doc in context.skipped_documents)
+        with self._results_lock:
+            self.progress_tracker.update_phase_1(context.file_index, context.warc_path,
+                                                 context.legal_docs_found, context.records_processed)
+            self.progress_tracker.update_phase_2(context.file_index, warc_name, len(context.filtered_documents))
+            self.progress_tracker.update_phase_3(context.file_index, warc_name, len(context.extracted_passages),
+                                                 context.tokens_used, len(context.skipped_documents), tokens_saved)
+        if context.filtered_documents:
+            self._segment_finished_warc(self.phase3_dir / phase1_warc_file.name)
+        
+        logger.info(f"Streaming completed for {phase1_warc_file.name}: {context.legal_docs_found} Phase 1 hits, "
+                    f"{len(context.filtered_documents)} passed Phase 2, {len(context.extracted_passages)} GPT analyses")
+    
+    @staticmethod
+    def _list_outputs(directory: Path) -> Dict[str, List[str]]:
+        """WARC, metadata Parquet and GPT analysis Parquet files of a phase directory, from a single listing"""
+        outputs = {'warc': [], 'metadata_parquet': [], 'gpt_parquet': []}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith('.warc.gz'):
+                    outputs['warc'].append(entry.path)
+                elif entry.name.endswith('_metadata.parquet'):
+                    outputs['metadata_parquet'].append(entry.path)
+                elif entry.name.endswith('_gpt_analysis.parquet'):
+                    outputs['gpt_parquet'].append(entry.path)
+        return outputs
     
     def _generate_final_report(self, total_time: float) -> Dict:
         """Generate comprehensive 3-phase analysis report"""
         try:
-            progress = self.progress_tracker.progress_data
+            progress = dict(self.progress_tracker.progress_data)
+            progress['overall_stats'] = self.progress_tracker.get_overall_stats()
+            
+            # One listing per phase directory (a full crawl leaves hundreds of thousands of files)
+            phase1_outputs = self._list_outputs(self.phase1_dir)
+            phase2_outputs = self._list_outputs(self.phase2_dir)
+            phase3_outputs = self._list_outputs(self.phase3_dir)
             
             final_report = {
                 'crawl_info': {
@@ -616,33 +1962,49 @@ class ThreePhaseLegalAnalyzer:
                     'legal_documents_found': progress['overall_stats']['legal_documents_found_phase1'],
                     'detection_rate': (progress['overall_stats']['legal_documents_found_phase1'] / 
                                      max(progress['overall_stats']['total_records_processed'], 1)) * 100,
-                    'warc_files_created': len(list(self.phase1_dir.glob("*.warc.gz")))
+                    'warc_files_created': len(phase1_outputs['warc'])
                 },
                 'phase_2_sophisticated_filtering': {
                     'input_documents': progress['overall_stats']['legal_documents_found_phase1'],
                     'filtered_documents': progress['overall_stats']['legal_documents_filtered_phase2'],
                     'filter_rate': (progress['overall_stats']['legal_documents_filtered_phase2'] / 
                                   max(progress['overall_stats']['legal_documents_found_phase1'], 1)) * 100,
-                    'warc_files_kept': len(list(self.phase2_dir.glob("*.warc.gz"))),
-                    'metadata_parquet_files': len(list(self.phase2_dir.glob("*_metadata.parquet")))
+                    'warc_files_kept': len(phase2_outputs['warc']),
+                    'metadata_parquet_files': len(phase2_outputs['metadata_parquet'])
                 },
                 'phase_3_passage_extraction': {
                     'input_documents': progress['overall_stats']['legal_documents_filtered_phase2'],
                     'extracted_passages': progress['overall_stats']['passages_extracted_phase3'],
                     'openai_tokens_used': progress['overall_stats']['total_openai_tokens_used'],
-                    'estimated_cost_usd': progress['overall_stats']['total_openai_tokens_used'] * 0.00003,  # GPT-4o pricing
-                    'final_warc_files': len(list(self.phase3_dir.glob("*.warc.gz"))),
-                    'final_metadata_files': len(list(self.phase3_dir.glob("*_metadata.parquet"))),
-                    'gpt_analysis_files': len(list(self.phase3_dir.glob("*_gpt_analysis.parquet")))
+                    'estimated_cost_usd': progress['overall_stats']['total_openai_tokens_used'] * GPT_COST_PER_TOKEN_USD,
+                    'preclassifier_skipped_documents': progress['overall_stats'].get('preclassifier_skipped_phase3', 0),
+                    'preclassifier_tokens_saved_estimate': progress['overall_stats'].get('preclassifier_tokens_saved_estimate', 0),
+                    'gpt_response_stats': self.gpt_analyzer.get_parse_stats() if getattr(self, 'gpt_analyzer', None) else {},
+                    'model_tier_stats': self.model_router.get_stats() if self.model_router else [],
+                    'budget': self.phase3_scheduler.budget.get_stats() if self.phase3_scheduler else {},
+                    'pipeline': self.pipeline_stats,
+                    'gpt_concurrency': {
+                        'final_limit': self.gpt_concurrency.limit,
+                        'decisions': self.gpt_concurrency.decisions
+                    } if self.gpt_concurrency else {},
+                    'final_warc_files': len(phase3_outputs['warc']),
+                    'final_metadata_files': len(phase3_outputs['metadata_parquet']),
+                    'gpt_analysis_files': len(phase3_outputs['gpt_parquet'])
                 },
                 'output_files': {
-                    'phase1_warc_files': [str(f) for f in self.phase1_dir.glob("*.warc.gz")],
-                    'phase2_warc_files': [str(f) for f in self.phase2_dir.glob("*.warc.gz")],
-                    'phase2_metadata_files': [str(f) for f in self.phase2_dir.glob("*_metadata.parquet")],
-                    'phase3_warc_files': [str(f) for f in self.phase3_dir.glob("*.warc.gz")],
-                    'phase3_metadata_files': [str(f) for f in self.phase3_dir.glob("*_metadata.parquet")],
-                    'phase3_gpt_files': [str(f) for f in self.phase3_dir.glob("*_gpt_analysis.parquet")]
+                    'phase1_warc_files': phase1_outputs['warc'],
+                    'phase2_warc_files': phase2_outputs['warc'],
+                    'phase2_metadata_files': phase2_outputs['metadata_parquet'],
+                    'phase3_warc_files': phase3_outputs['warc'],
+                    'phase3_metadata_files': phase3_outputs['metadata_parquet'],
+                    'phase3_gpt_files': phase3_outputs['gpt_parquet']
                 },
+                'output_segments': self.segment_roller.stats() if self.segment_roller else {},
+                'profiles': self.profiler.get_summary() if self.profiler else {},
+                'pattern_profile': self._write_pattern_profile(),
+                'domain_quotas': self._domain_quota_stats(),
+                'link_discovery': self._link_discovery_stats(),
+                'sample_estimates': self._sample_estimates(),
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -696,9 +2058,106 @@ class ThreePhaseLegalAnalyzer:
                 f.write(f"- **Extracted Passages:** {p3['extracted_passages']:,}\n")
                 f.write(f"- **OpenAI Tokens Used:** {p3['openai_tokens_used']:,}\n")
                 f.write(f"- **Estimated Cost:** ${p3['estimated_cost_usd']:.2f}\n")
+                if p3.get('preclassifier_skipped_documents'):
+                    f.write(f"- **Pre-classifier Skipped Documents:** {p3['preclassifier_skipped_documents']:,}\n")
+                    f.write(f"- **Pre-classifier Tokens Saved (est.):** {p3['preclassifier_tokens_saved_estimate']:,}\n")
                 f.write(f"- **Final WARC Files:** {p3['final_warc_files']}\n")
                 f.write(f"- **Final Metadata Files:** {p3['final_metadata_files']}\n")
-                f.write(f"- **GPT Analysis Files:** {p3['gpt_analysis_files']}\n\n")
+                f.write(f"- **GPT Analysis Files:** {p3['gpt_analysis_files']}\n")
+                segments = report_data.get('output_segments') or {}
+                if segments:
+                    f.write(f"- **Output Segments:** {segments['sources_rolled']:,} WARCs rolled into "
+                            f"{segments['warc_segments']} WARC segments ({segments['warc_segment_bytes'] / 1e9:.2f} GB), "
+                            + ", ".join(f"{count} {table}" for table, count in segments['table_segments'].items())
+                            + f" Parquet segments (manifest: `{segments['manifest']}`)\n")
+                budget = p3.get('budget') or {}
+                if budget.get('max_tokens') is not None:
+                    f.write(f"- **Token Budget:** {budget['tokens_spent']:,} / {budget['max_tokens']:,} tokens spent\n")
+                for tier_stats in p3.get('model_tier_stats') or []:
+                    f.write(f"- **Model Tier `{tier_stats['tier']}` ({tier_stats['model']}):** "
+                            f"{tier_stats['documents_routed']:,} documents, {tier_stats['total_tokens_used']:,} tokens, "
+                            f"{tier_stats['avg_latency_seconds']:.2f}s avg latency\n")
+                pipeline = p3.get('pipeline') or {}
+                if pipeline.get('time_to_first_result_seconds') is not None:
+                    f.write(f"- **Streaming Time to First Result:** {pipeline['time_to_first_result_seconds']:.2f} seconds\n")
+                gpt_concurrency = p3.get('gpt_concurrency') or {}
+                if gpt_concurrency:
+                    f.write(f"- **GPT Concurrency:** {gpt_concurrency['final_limit']} in flight at the end, "
+                            f"{len(gpt_concurrency['decisions'])} adjustments\n")
+                response_stats = p3.get('gpt_response_stats') or {}
+                if response_stats:
+                    f.write(f"- **GPT Parse Failures:** {response_stats['parse_failures']:,}\n")
+                    f.write(f"- **GPT Salvaged Responses:** {response_stats['salvaged_responses']:,}\n")
+                    f.write(f"- **GPT Retries (truncated: {response_stats['truncated_responses']:,}):** {response_stats['retries']:,}\n")
+                f.write("\n")
+                
+                for phase, profile in (report_data.get('profiles') or {}).items():
+                    f.write(f"## Profile: {phase}\n")
+                    f.write(f"{profile['mode'].capitalize()} profile over {profile['wall_seconds']:.1f}s "
+                            f"({profile['samples']:,} stack samples): `{profile['pstats_file']}`, "
+                            f"`{profile['collapsed_file']}`\n\n")
+                    f.write("| Function | Calls | Self (s) | Cumulative (s) |\n")
+                    f.write("|----------|------:|---------:|---------------:|\n")
+                    for row in profile['top_functions'][:10]:
+                        f.write(f"| `{row['function']}` | {row['calls']:,} | {row['self_seconds']:.3f} | "
+                                f"{row['cumulative_seconds']:.3f} |\n")
+                    f.write("\n")
+                
+                pattern_profile = report_data.get('pattern_profile') or {}
+                if pattern_profile:
+                    f.write("## Detector Pattern Profile\n")
+                    f.write(f"{pattern_profile['documents']['phase1']:,} Phase 1 and {pattern_profile['documents']['phase2']:,} "
+                            f"Phase 2 documents, {pattern_profile['total_seconds']:.2f}s in pattern checks "
+                            f"(full ranking: `{pattern_profile['file']}`)\n\n")
+                    f.write("| Pattern | Time (s) | Mean (µs) | Hit Rate | Decisive |\n")
+                    f.write("|---------|---------:|----------:|---------:|---------:|\n")
+                    for row in pattern_profile['top_patterns']:
+                        f.write(f"| {row['detector']}.{row['group']}: `{row['pattern']}` | {row['total_seconds']:.3f} | "
+                                f"{row['mean_microseconds']:.1f} | {row['hit_rate']:.2%} | {row['decisive']:,} |\n")
+                    f.write(f"\n- **Never Matched:** {len(pattern_profile['dead_patterns'])} patterns\n")
+                    f.write(f"- **Matched but Never Decisive:** {len(pattern_profile['never_decisive'])} patterns\n\n")
+                
+                for phase, quota_stats in (report_data.get('domain_quotas') or {}).items():
+                    f.write(f"## Domain Quota: {phase}\n")
+                    f.write(f"At most {quota_stats['max_per_domain_type']:,} documents per registered domain and type: "
+                            f"{quota_stats['kept']:,} kept, {quota_stats['dropped']:,} dropped "
+                            f"({quota_stats['keys_capped']:,} domain/type pairs capped)\n\n")
+                    if quota_stats['top_dropped']:
+                        f.write("| Registered Domain | Type | Kept | Dropped |\n")
+                        f.write("|-------------------|------|-----:|--------:|\n")
+                        for row in quota_stats['top_dropped']:
+                            f.write(f"| {row['registered_domain']} | {row['doc_type']} | {row['kept']:,} | {row['dropped']:,} |\n")
+                        f.write("\n")
+                
+                sample_estimates = report_data.get('sample_estimates') or {}
+                if sample_estimates:
+                    f.write("## Sample Estimates\n")
+                    f.write(f"{sample_estimates['files_sampled']:,} of {sample_estimates['files_in_crawl']:,} WARC files "
+                            f"({sample_estimates['strata']:,} strata), {sample_estimates['record_fraction']:.1%} of their "
+                            f"records ({sample_estimates['records_sampled']:,} records, about "
+                            f"{sample_estimates.get('records_in_crawl_estimate', 0):,} in the crawl); "
+                            f"{sample_estimates['confidence']:.0%} intervals, {sample_estimates['variance']} variance. "
+                            f"Plan: `{sample_estimates['plan_file']}`\n\n")
+                    f.write("| Metric | In Sample | Crawl Estimate | Interval | Share of Records | Share Interval |\n")
+                    f.write("|--------|----------:|---------------:|---------:|-----------------:|---------------:|\n")
+                    for metric, row in sample_estimates['estimates'].items():
+                        interval = f"{row['ci_low']:,}–{row['ci_high']:,}" if row['ci_low'] is not None else "n/a"
+                        f.write(f"| {metric} | {row['sample_count']:,} | {row['estimate']:,} | {interval} | "
+                                f"{row['prevalence']:.3%} | {row['prevalence_ci_low']:.3%}–{row['prevalence_ci_high']:.3%} |\n")
+                    f.write("\n")
+                
+                link_stats = report_data.get('link_discovery') or {}
+                if link_stats:
+                    f.write("## Link Discovery\n")
+                    f.write(f"- **Mode:** {link_stats['mode']} (links from {link_stats['source']})\n")
+                    f.write(f"- **Pages Scanned for Links:** {link_stats.get('pages_scanned', 0):,}\n")
+                    f.write(f"- **Legal Links:** {link_stats.get('legal_links', 0):,} to {link_stats.get('targets', 0):,} "
+                            f"targets on {link_stats.get('hosts_with_targets', 0):,} hosts\n")
+                    f.write(f"- **Targets Sent to Phase 2:** {link_stats.get('targets_in_warcs', 0):,}\n")
+                    if link_stats['mode'] == 'restrict':
+                        f.write(f"- **Keyword Candidates Dropped:** {link_stats.get('keyword_candidates_dropped', 0):,}\n")
+                        f.write(f"- **Pages Never Scanned:** {link_stats.get('detection_skipped', 0):,}\n")
+                    f.write("\n")
                 
                 f.write("## Output Files Structure\n")
                 f.write("```\n")
@@ -706,6 +2165,10 @@ class ThreePhaseLegalAnalyzer:
                 f.write("├── phase1_fast_detection/          # WARC files with potential legal docs\n")
                 f.write("├── phase2_sophisticated_filtering/  # Filtered WARC files + metadata parquet\n")
                 f.write("├── phase3_passages_and_warc/       # Final WARC files + metadata + GPT analysis parquet\n")
+                if report_data.get('profiles'):
+                    f.write("├── profiles/                       # Per-phase .pstats and .collapsed (flamegraph) files\n")
+                if pattern_profile:
+                    f.write("├── pattern_profile.json            # Per-pattern cost, hit rate and decisive counts\n")
                 f.write("├── final_3phase_report.json\n")
                 f.write("└── final_3phase_report.md\n")
                 f.write("```\n")
@@ -0,0 +1,292 @@
+"""
+Benchmark suite for the pipeline stages
+Runs each stage over a synthetic (or given) WARC corpus and records throughput and
+peak memory as JSON, so performance changes can be compared across commits:
+
+    legal-crawl-benchmark --output benchmark_results/after.json --compare benchmark_results/before.json
+"""
+
+import argparse
+import gc
+import gzip
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from warcio.archiveiterator import ArchiveIterator
+
+from .detector import LightningFastDetector, SophisticatedLegalDetector
+from .extractor import HTMLContentExtractor
+from .synthetic import add_spec_arguments, generate_corpus, spec_from_args
+
+logger = logging.getLogger(__name__)
+
+# Bump when the result layout changes, so --compare can refuse mismatched files
+RESULT_FORMAT_VERSION = 1
+
+BENCHMARKS = ('lightning_detector', 'extractor', 'sophisticated_detector', 'phase1_io', 'phase3_sinks')
+
+# A representative GPT analysis row for the Phase 3 sink benchmark
+SAMPLE_GPT_ANALYSIS = {
+    'copyright_clauses': [{'text': "All rights reserved. No part of this website may be reproduced.",
+                           'category': 'COPYRIGHT_RETAINED_SITE', 'confidence': 0.9,
+                           'context': "Copyright © 2024 Example Media Ltd."}],
+    'access_level': {'level': 'L0_OPEN_ACCESS', 'indicators': ['no paywall'], 'confidence': 0.7},
+    'technical_protection_measures': [],
+    'liability_clauses': ["To the maximum extent permitted by law, our limitation of liability applies."],
+    'jurisdiction_clauses': ["These terms are governed by the laws of the State of Delaware."],
+    'data_licensing': []
+}
+
+def load_documents(warc_paths: List[Path]) -> List[Tuple[str, str]]:
+    """(url, html) for every response record, decoded the way Phase 1 decodes them"""
+    documents = []
+    for warc_path in warc_paths:
+        with gzip.open(warc_path, 'rb') as f:
+            for record in ArchiveIterator(f):
+                if record.rec_type != 'response':
+                    continue
+                url = record.rec_headers.get_header('WARC-Target-URI')
+                content = record.content_stream().read()
+                if url and content:
+                    documents.append((url, content.decode('utf-8', errors='ignore')))
+    return documents
+
+def measure(run: Callable[[], Tuple[int, int]], repeats: int) -> Dict:
+    """
+    Time `run` (which returns items and bytes processed) `repeats` times, then run it
+    once more under tracemalloc for peak Python memory (kept out of the timed runs)
+    """
+    timings = []
+    items = size = 0
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        items, size = run()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        'items': items,
+        'bytes': size,
+        'repeats': repeats,
+        'best_seconds': best,
+        'median_seconds': statistics.median(timings),
+        'items_per_second': items / best if best else 0.0,
+        'mb_per_second': size / best / 1e6 if best else 0.0,
+        'peak_python_mb': peak / 1e6
+    }
+
+class StageBenchmarks:
+    """Benchmarks over one corpus; each bench_* method returns a zero-argument run function"""
+
+    def __init__(self, warc_paths: List[Path], work_dir: Path, sink_rows: int = 200):
+        self.warc_paths = warc_paths
+        self.work_dir = work_dir
+        self.sink_rows = sink_rows
+
+        self.documents = load_documents(warc_paths)
+        self.lightning = LightningFastDetector()
+        self.sophisticated = SophisticatedLegalDetector()
+        self.extractor = HTMLContentExtractor()
+
+        # Later stages only see what earlier stages pass on, as in the pipeline
+        self.phase1_documents = [(url, html) for url, html in self.documents
+                                 if self.lightning.is_legal_document(url, html)['is_legal']]
+        self.phase2_documents = [(url, html, self.extractor.extract_clean_text(html))
+                                 for url, html in self.phase1_documents]
+        self.phase2_documents = [doc for doc in self.phase2_documents if doc[2]]
+
+    def bench_lightning_detector(self) -> Callable[[], Tuple[int, int]]:
+        documents = self.documents
+
+        def run():
+            for url, html in documents:
+                self.lightning.is_legal_document(url, html)
+            return len(documents), sum(len(html) for _, html in documents)
+        return run
+
+    def bench_extractor(self) -> Callable[[], Tuple[int, int]]:
+        documents = self.phase1_documents
+
+        def run():
+            for _, html in documents:
+                self.extractor.extract_clean_text(html)
+            return len(documents), sum(len(html) for _, html in documents)
+        return run
+
+    def bench_sophisticated_detector(self) -> Callable[[], Tuple[int, int]]:
+        documents = self.phase2_documents
+
+        def run():
+            for url, html, clean_text in documents:
+                self.sophisticated.analyze_legal_content(url, html, clean_text)
+            return len(documents), sum(len(html) for _, html, _ in documents)
+        return run
+
+    def _analyzer(self, name: str):
+        from .analyzer import ThreePhaseLegalAnalyzer
+        run_dir = Path(tempfile.mkdtemp(prefix=f"{name}-", dir=self.work_dir))
+        analyzer = ThreePhaseLegalAnalyzer(output_dir=str(run_dir), max_files=None,
+                                           progress_file=str(run_dir / "progress.db"), preclassifier_path=None)
+        analyzer._setup_crawl_directories("BENCHMARK")
+        return analyzer
+
+    def bench_phase1_io(self) -> Callable[[], Tuple[int, int]]:
+        """Full Phase 1 per WARC: decompress, parse, detect and copy the legal records"""
+        def run():
+            analyzer = self._analyzer("phase1")
+            records = 0
+            for warc_path in self.warc_paths:
+                _, processed = analyzer._process_warc_phase_1(warc_path, str(warc_path))
+                records += processed
+            return records, sum(path.stat().st_size for path in self.warc_paths)
+        return run
+
+    def bench_phase3_sinks(self) -> Callable[[], Tuple[int, int]]:
+        """Phase 3 result persistence: append a row, rewrite parquet/JSON, mark the record done"""
+        analysis = json.dumps(SAMPLE_GPT_ANALYSIS)
+
+        def run():
+            analyzer = self._analyzer("phase3")
+            gpt_parquet = analyzer.phase3_dir / "BENCH_gpt_analysis.parquet"
+            gpt_json = analyzer.phase3_dir / "BENCH_gpt_analysis.json"
+            rows: List[Dict] = []
+            for i in range(self.sink_rows):
+                url = f"https://site{i}.example.com/terms"
+                rows.append({'url': url, 'domain': f"site{i}", 'warc_file': "BENCH.warc.gz", 'gpt_analysis': analysis,
+                             'clean_text_length': 12000, 'copyright_clauses_count': 1, 'access_level': 'L0_OPEN_ACCESS',
+                             'technical_protection_measures_count': 0, 'liability_clauses_count': 1,
+                             'jurisdiction_clauses_count': 1, 'data_licensing_count': 0,
+                             'extraction_timestamp': datetime.now().isoformat(), 'tokens_used': 1500})
+                analyzer._save_incremental_gpt_results(rows, gpt_parquet, gpt_json)
+                analyzer.progress_tracker.mark_record_done(3, "BENCH", url, 1500)
+            written = sum(path.stat().st_size for path in (gpt_parquet, gpt_json) if path.exists())
+            return len(rows), written
+        return run
+
+    def run(self, names: List[str], repeats: int) -> Dict[str, Dict]:
+        results = {}
+        for name in names:
+            logger.info(f"Benchmark {name}...")
+            results[name] = measure(getattr(self, f"bench_{name}")(), repeats)
+            logger.info(f"  {results[name]['items_per_second']:.1f} items/s, {results[name]['mb_per_second']:.2f} MB/s, "
+                        f"peak {results[name]['peak_python_mb']:.1f} MB")
+        return results
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(warc_paths: List[Path], work_dir: Path, names: List[str] = list(BENCHMARKS),
+                   repeats: int = 3, sink_rows: int = 200, corpus: Optional[Dict] = None) -> Dict:
+    """Run the selected benchmarks and return the JSON-ready result document"""
+    suite = StageBenchmarks(warc_paths, work_dir, sink_rows)
+    return {
+        'format_version': RESULT_FORMAT_VERSION,
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'corpus': corpus or {'warc_files': [str(path) for path in warc_paths]},
+        'settings': {'repeats': repeats, 'sink_rows': sink_rows},
+        'documents': {'records': len(suite.documents), 'phase1_kept': len(suite.phase1_documents),
+                      'phase2_input': len(suite.phase2_documents)},
+        'benchmarks': suite.run(names, repeats),
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+def compare_results(current: Dict, baseline: Dict) -> List[str]:
+    """Throughput and memory change per benchmark against a baseline result file"""
+    if baseline.get('format_version') != current.get('format_version'):
+        return [f"Baseline format {baseline.get('format_version')} differs from {current.get('format_version')}; not comparable"]
+    if (baseline.get('corpus', {}).get('spec') != current.get('corpus', {}).get('spec')
+            or baseline.get('settings', {}).get('sink_rows') != current.get('settings', {}).get('sink_rows')):
+        lines = ["Warning: corpus or benchmark settings differ, throughput is not directly comparable"]
+    else:
+        lines = []
+
+    lines.append(f"{'benchmark':<24} {'baseline/s':>12} {'current/s':>12} {'change':>8} {'peak MB':>16}")
+    for name, result in current['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if not base:
+            lines.append(f"{name:<24} {'-':>12} {result['items_per_second']:>12.1f}")
+            continue
+        change = (result['items_per_second'] / base['items_per_second'] - 1) if base['items_per_second'] else 0.0
+        memory = f"{base['peak_python_mb']:.1f} -> {result['peak_python_mb']:.1f}"
+        lines.append(f"{name:<24} {base['items_per_second']:>12.1f} {result['items_per_second']:>12.1f} "
+                     f"{change:>+8.1%} {memory:>16}")
+    return lines
+
+def main():
+    """Generate (or reuse) a corpus, benchmark each stage and write the JSON result"""
+    parser = argparse.ArgumentParser(description="Benchmark the detection, extraction, I/O and sink stages")
+    parser.add_argument("--warc", nargs='+', help="Benchmark these WARC files instead of a synthetic corpus")
+    parser.add_argument("--files", type=int, default=1, help="Synthetic WARC files to generate. Default: 1")
+    parser.add_argument("--benchmarks", nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS),
+                        help="Benchmarks to run. Default: all")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per benchmark (best is reported). Default: 3")
+    parser.add_argument("--sink-rows", type=int, default=200, help="Rows written by the Phase 3 sink benchmark. Default: 200")
+    parser.add_argument("--output", help="Result JSON. Default: benchmark_results/<timestamp>_<commit>.json")
+    parser.add_argument("--compare", help="Earlier result JSON to compare against")
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # The stages log per document; keep the benchmark output readable
+    for name in ('legal_crawl_analysis.analyzer', 'legal_crawl_analysis.progress_store'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix="legal-crawl-bench-") as work_dir:
+        work_dir = Path(work_dir)
+        if args.warc:
+            warc_paths = [Path(path) for path in args.warc]
+            corpus = {'warc_files': [str(path) for path in warc_paths]}
+        else:
+            spec = spec_from_args(args)
+            generated = generate_corpus(work_dir / "corpus", spec, args.files)
+            warc_paths = [path for path, _ in generated]
+            corpus = {'spec': asdict(spec), 'files': args.files, 'stats': [stats for _, stats in generated]}
+
+        result = run_benchmarks(warc_paths, work_dir, args.benchmarks, args.repeats, args.sink_rows, corpus)
+
+    output = Path(args.output or f"benchmark_results/{datetime.now():%Y%m%d_%H%M%S}_{result['git_commit'] or 'nogit'}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    for name, bench in result['benchmarks'].items():
+        print(f"{name:<24} {bench['items']:>7} items  {bench['items_per_second']:>10.1f} items/s  "
+              f"{bench['mb_per_second']:>8.2f} MB/s  peak {bench['peak_python_mb']:.1f} MB")
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare_results(result, json.load(f))))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Adaptive concurrency control
+- AIMDController: in-flight GPT calls, +1 after a window of successes, halved on a 429
+- QueueDrivenController: worker counts for download/CPU stages, grown while the
+  stage has a backlog and its consumer is starved (and, for CPU stages, cores are idle)
+- AdaptiveLimiter: a semaphore whose size follows a controller
+- ConcurrencyMonitor: samples queue depths, throughput and CPU and applies decisions
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .metrics import STAGE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease limit, driven by request outcomes"""
+
+    def __init__(self, name: str, min_limit: int = 1, max_limit: int = 16, initial_limit: Optional[int] = None,
+                 decrease_factor: float = 0.5, decrease_cooldown_seconds: float = 1.0):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = initial_limit or min_limit
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown_seconds = decrease_cooldown_seconds
+
+        self._lock = threading.Lock()
+        self._successes = 0
+        self._last_decrease = 0.0
+        self.decisions: List[Dict] = []
+
+    def on_success(self):
+        """A full window of successes (one per slot) earns one more slot"""
+        with self._lock:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self._set_limit(self.limit + 1, f"{self._successes} successful calls")
+                self._successes = 0
+
+    def on_rate_limit(self):
+        """Cut the limit on a 429; a burst of 429s from the same window counts once"""
+        with self._lock:
+            self._successes = 0
+            now = time.monotonic()
+            if now - self._last_decrease < self.decrease_cooldown_seconds:
+                return
+            self._last_decrease = now
+            new_limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+            if new_limit != self.limit:
+                self._set_limit(new_limit, "rate limited (429)")
+
+    def _set_limit(self, new_limit: int, reason: str):
+        logger.info(f"Concurrency {self.name}: {self.limit} -> {new_limit} ({reason})")
+        self.decisions.append({'time': time.time(), 'from': self.limit, 'to': new_limit, 'reason': reason})
+        self.limit = new_limit
+        STAGE_WORKERS.labels(stage=self.name).set(new_limit)
+
+class QueueDrivenController:
+    """
+    Worker count for a pipeline stage. Grows while the stage's own queue backs up and the
+    next stage is starved; shrinks when the next stage is saturated. CPU-bound stages only
+    grow while the process uses fewer cores than target_utilization of the machine.
+    """
+
+    def __init__(self, name: str, min_limit: int = 1, max_limit: Optional[int] = None, initial_limit: Optional[int] = None,
+                 cpu_bound: bool = True, target_utilization: float = 0.85,
+                 high_water: float = 0.5, low_water: float = 0.1):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit or os.cpu_count() or 1
+        self.limit = initial_limit or min_limit
+        self.cpu_bound = cpu_bound
+        self.target_utilization = target_utilization
+        self.high_water = high_water
+        self.low_water = low_water
+        self.decisions: List[Dict] = []
+
+    def adjust(self, backlog_fill: float, downstream_fill: Optional[float], cores_used: float) -> int:
+        """Apply one control step from the latest sample; returns the new limit"""
+        cpu_headroom = cores_used < self.target_utilization * (os.cpu_count() or 1)
+        downstream_starved = downstream_fill is None or downstream_fill < self.low_water
+
+        if downstream_fill is not None and downstream_fill > self.high_water and self.limit > self.min_limit:
+            self._set_limit(self.limit - 1, f"downstream queue {downstream_fill:.0%} full")
+        elif (backlog_fill > self.high_water and downstream_starved and self.limit < self.max_limit
+              and (cpu_headroom or not self.cpu_bound)):
+            self._set_limit(self.limit + 1, f"backlog {backlog_fill:.0%} full, {cores_used:.1f} cores busy")
+        elif self.cpu_bound and not cpu_headroom and self.limit > self.min_limit:
+            self._set_limit(self.limit - 1, f"CPU saturated ({cores_used:.1f} cores busy)")
+        return self.limit
+
+    def _set_limit(self, new_limit: int, reason: str):
+        logger.info(f"Concurrency {self.name}: {self.limit} -> {new_limit} workers ({reason})")
+        self.decisions.append({'time': time.time(), 'from': self.limit, 'to': new_limit, 'reason': reason})
+        self.limit = new_limit
+        STAGE_WORKERS.labels(stage=self.name).set(new_limit)
+
+class AdaptiveLimiter:
+    """Counting semaphore whose capacity is read from a controller on every acquire"""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= self.controller.limit:
+                # Timed wait so a raised limit is noticed without an explicit notify
+                self._condition.wait(0.5)
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class ConcurrencyMonitor:
+    """Periodically samples pipeline stages and lets their controllers react"""
+
+    def __init__(self, stages: List, interval_seconds: float = 5.0):
+        self.stages = stages
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="concurrency-monitor", daemon=True)
+        self._last_cpu = self._cpu_seconds()
+        self._last_wall = time.monotonic()
+        self.samples: List[Dict] = []
+
+    @staticmethod
+    def _cpu_seconds() -> float:
+        times = os.times()
+        return times.user + times.system
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.sample()
+
+    def sample(self) -> Dict:
+        """Take one sample of CPU use, queue fill and throughput, and adjust queue-driven stages"""
+        cpu, wall = self._cpu_seconds(), time.monotonic()
+        cores_used = (cpu - self._last_cpu) / max(wall - self._last_wall, 1e-6)
+        self._last_cpu, self._last_wall = cpu, wall
+
+        sample = {'time': time.time(), 'cores_used': cores_used, 'stages': {}}
+        for stage in self.stages:
+            backlog_fill = stage.queue.qsize() / max(stage.queue.maxsize, 1)
+            downstream_fill = (stage.output.queue.qsize() / max(stage.output.queue.maxsize, 1)
+                               if stage.output is not None else None)
+            controller = stage.limiter.controller if stage.limiter else None
+            if isinstance(controller, QueueDrivenController):
+                controller.adjust(backlog_fill, downstream_fill, cores_used)
+            sample['stages'][stage.name] = {
+                'queue_fill': backlog_fill,
+                'concurrency': controller.limit if controller else 1,
+                'items_processed': stage.items_processed
+            }
+
+        logger.debug(f"Concurrency sample: {sample}")
+        self.samples.append(sample)
+        return sample
@@ -22,6 +22,7 @@ MAX_RECORDS_PER_WARC = 10000  # Limit records per WARC for testing
 GPT_MODEL = "gpt-4o"
 MAX_TOKENS_PER_ANALYSIS = 2000
 GPT_TEMPERATURE = 0.1
+GPT_PROMPT_TEXT_CHARS = 4000  # Document text sent per analysis; longer documents are truncated
 
 # Legal Document Detection Configuration
 MIN_CONFIDENCE_THRESHOLD = 0.4
@@ -34,4 +35,128 @@ SAVE_HTML_CONTENT = False  # Set to True if you need to save HTML for debugging
 
 # Rate Limiting
 REQUESTS_PER_SECOND = 2  # For CommonCrawl downloads
-GPT_REQUESTS_PER_MINUTE = 10  # For OpenAI API calls 
\ No newline at end of file
+GPT_REQUESTS_PER_MINUTE = 10  # For OpenAI API calls 
+
+# Pre-classifier Configuration (skips GPT on confident negatives in Phase 3)
+PRECLASSIFIER_MODEL_PATH = os.getenv('LEGAL_CRAWL_PRECLASSIFIER')  # Trained artifact, None disables it
+PRECLASSIFIER_SKIP_THRESHOLD = 0.05  # Documents scoring below this are confident negatives
+PRECLASSIFIER_MODE = "skip"  # "skip" drops confident negatives, "defer" analyzes them last
+
+# Structured Output Configuration
+GPT_RESPONSE_FORMAT = "json_schema"  # "json_schema" (strict), "json_object" or "none"
+GPT_COMPACT_SCHEMA = True  # Short-key wire schema without context fields, expanded after parsing
+GPT_TRUNCATION_RETRY_MAX_TOKENS = 3000  # Token limit for the single retry after a truncated response
+
+# LLM Backend Configuration
+LLM_BACKEND = "openai"  # "openai", "openai-compatible" or "simulated"
+LLM_BASE_URL = os.getenv('LEGAL_CRAWL_LLM_BASE_URL')  # Server URL for the openai-compatible backend
+GPT_RATE_LIMIT_RETRIES = 3  # Retries after a 429 before giving up on a document
+GPT_RATE_LIMIT_BACKOFF_SECONDS = 2.0  # Initial backoff when the server sends no Retry-After
+
+# Simulated Backend Configuration (offline load testing)
+SIMULATED_LATENCY_SECONDS = 0.5
+SIMULATED_LATENCY_JITTER_SECONDS = 0.1
+SIMULATED_ERROR_RATE = 0.0
+SIMULATED_RATE_LIMIT_RATE = 0.0
+SIMULATED_RATE_LIMIT_RPM = None  # Requests per minute before simulated 429s, None for unlimited
+SIMULATED_SEED = 0
+
+# Model-tier Routing Configuration (Phase 3)
+MODEL_ROUTING_ENABLED = False  # Route simple documents to a cheaper model tier
+FAST_GPT_MODEL = "gpt-4o-mini"  # Cheap tier for simple documents
+FAST_MAX_TOKENS_PER_ANALYSIS = 1000
+ROUTER_LONG_DOCUMENT_TOKENS = 800  # Documents whose prompt text (GPT_PROMPT_TEXT_CHARS, ~1000 tokens at most) exceeds this use GPT_MODEL
+
+# Phase 3 Budget Scheduling
+GPT_COST_PER_TOKEN_USD = 0.00003  # Blended GPT-4o price used for cost estimates and dollar budgets
+PHASE3_PRIORITY = "confidence"  # "confidence", "copyright", "preclassifier" or "links"
+DOMAIN_NOVELTY_DECAY = 1.0  # <1.0 lowers the priority of each further document from the same domain
+PHASE3_DEFERRED_FILE = "phase3_deferred.json"  # Documents left over when the budget runs out
+
+# Pipeline Mode
+PIPELINE_MODE = "phased"  # "phased" runs each phase over all files, "streaming" fuses them per record
+INPUT_FORMAT = "warc"  # "warc" parses HTML from full WARCs, "wet" uses CommonCrawl's extracted text (WET files)
+STREAMING_QUEUE_SIZE = 64  # Records buffered between streaming stages before upstream stages block
+
+# Distributed Work Queue
+WORK_QUEUE_PATH = os.getenv('LEGAL_CRAWL_WORK_QUEUE')  # SQLite file on shared storage, None for single-node runs
+WORK_QUEUE_LEASE_SECONDS = 900  # Leases not renewed by a heartbeat within this time are re-issued
+WORK_QUEUE_MAX_ATTEMPTS = 3  # Claims per WARC before it is marked failed
+
+# Standalone Phase Hand-off (watch mode)
+WATCH_POLL_SECONDS = 30  # How often a watching Phase 2/3 consumer looks for new outputs
+HANDOFF_CLAIM_TIMEOUT_SECONDS = 1800  # Claims not refreshed within this time are released to other consumers
+HANDOFF_MAX_ATTEMPTS = 3  # Claims per file before a file that keeps failing is moved to .failed/
+
+# Adaptive Concurrency
+ADAPTIVE_CONCURRENCY = False  # Let controllers size stage worker pools and the GPT in-flight limit
+GPT_MIN_CONCURRENCY = 1  # In-flight GPT calls never drop below this, even after repeated 429s
+GPT_MAX_CONCURRENCY = 8  # Upper bound for the AIMD in-flight GPT limit
+DOWNLOAD_MAX_WORKERS = 4  # Parallel WARC downloads in streaming mode
+CPU_STAGE_MAX_WORKERS = os.cpu_count() or 1  # Upper bound for Phase 1/2 workers in streaming mode
+CPU_TARGET_UTILIZATION = 0.85  # CPU stages only grow while the process uses less than this share of the cores
+CONCURRENCY_SAMPLE_SECONDS = 5.0  # How often queue depths, throughput and CPU are sampled
+
+# Metrics Export
+METRICS_FILE = os.getenv('LEGAL_CRAWL_METRICS_FILE')  # Prometheus text file rewritten during the run, None to disable
+METRICS_PORT = int(os.getenv('LEGAL_CRAWL_METRICS_PORT', '0')) or None  # Port for a live /metrics endpoint
+METRICS_EXPORT_SECONDS = 15  # How often the metrics file is rewritten
+
+# Profiling
+PROFILE_MODE = "sampling"  # "sampling" (all threads, low overhead) or "deterministic" (adds cProfile call counts)
+PROFILE_SAMPLE_INTERVAL_SECONDS = 0.005  # Stack sampling interval
+PROFILE_TOP_FUNCTIONS = 15  # Functions listed per phase in the final report
+PATTERN_PROFILE_TOP_PATTERNS = 15  # Costliest detector patterns listed in the final report (--pattern-profile)
+
+# Detector Equivalence (acceptance checks for alternative Phase 1/2 detectors)
+EQUIVALENCE_MAX_DISAGREEMENT_RATE = 0.001  # Share of records whose decision, types or confidence may differ
+EQUIVALENCE_MAX_RECALL_LOSS = 0.0  # Share of the reference's positives the candidate may drop
+EQUIVALENCE_CONFIDENCE_TOLERANCE = 1e-6  # Confidence differences up to this are treated as equal
+
+# Startup Budget (legal-crawl-startup-check; seconds above bare interpreter startup)
+STARTUP_BUDGET_HELP_SECONDS = 0.15  # `legal-crawl-analyzer --help`
+STARTUP_BUDGET_WORKER_SECONDS = 0.35  # A fresh worker importing and constructing the analyzer
+
+# Domain Extraction (offline; the public suffix list is never fetched over the network)
+PUBLIC_SUFFIX_LIST_FILE = os.getenv('LEGAL_CRAWL_PUBLIC_SUFFIX_LIST')  # Snapshot of public_suffix_list.dat, None for tldextract's bundled copy
+DOMAIN_CACHE_SIZE = 65536  # Hosts whose domain parts are kept in the per-process LRU cache
+
+# Domain Quotas (at most N documents per registered domain and document type; None disables)
+DOMAIN_QUOTA_PHASE2 = None  # Phase 1 survivors entering Phase 2 extraction, typed by their URL
+DOMAIN_QUOTA_PHASE3 = None  # Phase 2 survivors sent to GPT, typed by their Phase 2 primary type
+DOMAIN_QUOTA_REPORT_TOP = 10  # Most-capped (domain, type) pairs listed in the final report
+
+# URL Index Fetch (Phase 1 reads only records whose URL matches a Phase 1 URL pattern)
+URL_INDEX_PATH = os.getenv('LEGAL_CRAWL_URL_INDEX')  # Local CDX/CDXJ file or cc-index Parquet file/directory, None to download whole WARCs
+INDEX_FETCH_BASE_URL = "https://data.commoncrawl.org"  # Index file names are fetched from here with HTTP Range
+INDEX_RANGE_MAX_GAP_BYTES = 64 * 1024  # Records at most this far apart share one request (the gap is discarded)
+INDEX_RANGE_MAX_BYTES = 8 * 1024 * 1024  # Upper bound on one coalesced request
+CDX_SERVER_URL = os.getenv('LEGAL_CRAWL_CDX_SERVER', "https://index.commoncrawl.org") or None  # WET mode looks up survivors' full records here; empty keeps them text-only
+
+# Link Discovery (legal pages found through the anchor text of links pointing to them)
+LINK_DISCOVERY = None  # "prioritize" (link targets first under quotas and --priority links), "restrict" (only targets on hosts that have any), None to disable
+LINK_SOURCE = "html"  # "html" (nav and footer of each page) or "wat" (CommonCrawl WAT link metadata, read before Phase 1)
+LINK_SCAN_BYTES = 16 * 1024  # Characters scanned for links at the head and at the tail of each page
+LINK_MAX_ANCHOR_CHARS = 60  # Longer anchor texts are prose, not navigation
+LINK_MAX_ANCHORS_PER_TARGET = 5  # Distinct anchor texts kept per link target
+
+# Sampling (--sample: crawl-wide estimates from a stratified sample of WARCs and records)
+SAMPLE_RECORD_FRACTION = 0.1  # Share of each sampled WARC's records the phases see
+SAMPLE_SEED = 20250801  # Seed of the file draw and of the per-record hash
+SAMPLE_CONFIDENCE = 0.95  # Confidence level of the reported intervals
+SAMPLE_PLAN_FILE = "sample_plan.json"  # Sampled WARCs and record IDs, written to the crawl directory
+
+# Record Store (random access to the records of pipeline WARCs)
+RECORD_INDEX_SUFFIX = ".cdxj"  # Sidecar of every WARC the pipeline writes: URL, record ID, payload digest -> offset, length
+
+# Output Segments (--segment-outputs: final per-WARC outputs rolled into large files)
+SEGMENT_OUTPUTS = False  # Roll Phase 3 outputs into segments as WARCs finish, instead of keeping ~5 files per input WARC
+SEGMENT_WARC_BYTES = 1024 ** 3  # Target size of a WARC segment
+SEGMENT_PARQUET_BYTES = 128 * 1024 ** 2  # Target size of a metadata / GPT analysis Parquet segment
+SEGMENT_DIR_NAME = "segments"  # Subdirectory of the Phase 3 directory
+SEGMENT_MANIFEST_FILE = "segments_manifest.jsonl"  # Source WARC -> segment, byte offset and row ranges
+
+# Analytical Dataset (`legal-crawl-analyzer consolidate` / `query`)
+DATASET_DIR_NAME = "dataset"  # Under the output directory; one crawl=<name> tree per consolidated crawl
+DATASET_PARTITIONS = ["crawl", "primary_type", "access_level"]  # Hive partition keys, outermost first
+DATASET_ROWS_PER_GROUP = 64 * 1024  # Parquet row group size; the unit of statistics-based row group skipping
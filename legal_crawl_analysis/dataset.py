@@ -0,0 +1,403 @@
+"""
+Partitioned analytical dataset
+Phase 3 results are spread over per-WARC tables (or rolled segments) whose interesting
+fields are JSON strings. Consolidation flattens them into one typed row per analyzed
+document. Each copyright clause category gets a count and a best-confidence column.
+The rows are written as a hive-partitioned Parquet dataset
+(`crawl=/primary_type=/access_level=`). Queries scan it with pyarrow datasets: filters
+on partition keys skip whole directories, other filters are checked against row group
+statistics, and only the referenced columns are read.
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import math
+import re
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .domains import domain_info
+from .segments import TABLES, SegmentRoller, source_rows
+from .structured_output import CATEGORY_CODES
+from .config import DATASET_DIR_NAME, DATASET_PARTITIONS, DATASET_ROWS_PER_GROUP
+
+logger = logging.getLogger(__name__)
+
+PHASE3_DIR_NAME = "phase3_passages_and_warc"
+
+# Copyright clause categories with their own count and confidence columns; others go to other_clauses
+CLAUSE_CATEGORIES = list(CATEGORY_CODES.values())
+
+COUNT_COLUMNS = ['copyright_clauses_count', 'technical_protection_measures_count', 'liability_clauses_count',
+                 'jurisdiction_clauses_count', 'data_licensing_count']
+
+# Filter operators of --where, longest first so '>=' is not read as '>'
+FILTER_RE = re.compile(r'^\s*(\w+)\s*(!=|>=|<=|=|>|<)\s*(.*?)\s*$')
+
+def clause_column(category: str) -> str:
+    """Column counting the clauses of a category, e.g. copyright_retained_user"""
+    return category.lower()
+
+def dataset_schema():
+    """Arrow schema of the document rows (partition keys first)"""
+    import pyarrow as pa
+
+    fields = [(name, pa.string()) for name in DATASET_PARTITIONS]
+    fields += [
+        ('url', pa.string()),
+        ('domain', pa.string()),
+        ('registered_domain', pa.string()),
+        ('public_suffix', pa.string()),
+        ('tld', pa.string()),
+        ('warc_file', pa.string()),
+        ('detection_method', pa.string()),
+        ('phase1_confidence', pa.float64()),
+        ('document_types', pa.list_(pa.string())),
+        ('primary_type_confidence', pa.float64()),
+        ('access_level_confidence', pa.float64()),
+        ('html_content_length', pa.int64()),
+        ('clean_text_length', pa.int64()),
+        ('tokens_used', pa.int64()),
+        ('model_tier', pa.string()),
+        ('preclassifier_score', pa.float64()),
+        ('extraction_timestamp', pa.timestamp('us')),
+    ]
+    fields += [(name, pa.int32()) for name in COUNT_COLUMNS]
+    for category in CLAUSE_CATEGORIES:
+        fields += [(clause_column(category), pa.int16()), (f"{clause_column(category)}_confidence", pa.float32())]
+    fields += [('other_clauses', pa.int16()), ('technical_protection_measures', pa.list_(pa.string()))]
+    return pa.schema(fields)
+
+def _value(value):
+    """None for missing values (NaN where a Parquet segment lacked an optional column)"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+def _json_field(row: Optional[Dict], key: str, default):
+    value = _value(row.get(key)) if row else None
+    if value is None:
+        return default
+    return json.loads(value) if isinstance(value, str) else value
+
+def _timestamp(value) -> Optional[datetime]:
+    value = _value(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value
+
+def flatten_document(crawl: str, gpt_row: Dict, metadata_row: Optional[Dict]) -> Dict:
+    """One dataset row from a GPT analysis row and the Phase 2 metadata row of the same document"""
+    analysis = _json_field(gpt_row, 'gpt_analysis', {})
+    phase2 = _json_field(metadata_row, 'phase2_analysis', {})
+    primary_type = phase2.get('primary_type') or 'unknown'
+    access_level = analysis.get('access_level') or {}
+    suffix = domain_info(gpt_row['url']).suffix
+
+    row = {
+        'crawl': crawl,
+        'primary_type': primary_type,
+        'access_level': access_level.get('level') or 'unknown',
+        'url': gpt_row['url'],
+        'domain': _value(gpt_row.get('domain')),
+        'registered_domain': _value(gpt_row.get('registered_domain')),
+        'public_suffix': suffix,
+        'tld': suffix.rsplit('.', 1)[-1] if suffix else '',
+        'warc_file': _value(gpt_row.get('warc_file')),
+        'detection_method': _value(metadata_row.get('detection_method')) if metadata_row else None,
+        'phase1_confidence': _value(metadata_row.get('confidence_score')) if metadata_row else None,
+        'document_types': _json_field(metadata_row, 'document_types', phase2.get('document_types')),
+        'primary_type_confidence': (phase2.get('confidence_scores') or {}).get(primary_type),
+        'access_level_confidence': access_level.get('confidence'),
+        'html_content_length': _value(metadata_row.get('html_content_length')) if metadata_row else None,
+        'clean_text_length': _value(gpt_row.get('clean_text_length')),
+        'tokens_used': _value(gpt_row.get('tokens_used')),
+        'model_tier': _value(gpt_row.get('model_tier')),
+        'preclassifier_score': _value(gpt_row.get('preclassifier_score')),
+        'extraction_timestamp': _timestamp(gpt_row.get('extraction_timestamp')),
+        'technical_protection_measures': [str(m) for m in analysis.get('technical_protection_measures', [])],
+    }
+    for column in COUNT_COLUMNS:
+        row[column] = _value(gpt_row.get(column))
+
+    counts = {category: 0 for category in CLAUSE_CATEGORIES}
+    confidences: Dict[str, float] = {}
+    other = 0
+    for clause in analysis.get('copyright_clauses', []):
+        category = clause.get('category') if isinstance(clause, dict) else None
+        if category not in counts:
+            other += 1
+            continue
+        counts[category] += 1
+        confidence = clause.get('confidence')
+        if isinstance(confidence, (int, float)):
+            confidences[category] = max(confidences.get(category, 0.0), float(confidence))
+    for category in CLAUSE_CATEGORIES:
+        row[clause_column(category)] = counts[category]
+        row[f"{clause_column(category)}_confidence"] = confidences.get(category)
+    row['other_clauses'] = other
+    return row
+
+def _phase3_sources(phase3_dir: Path) -> Iterator[Tuple[str, List[Dict], List[Dict]]]:
+    """(WARC name, GPT analysis rows, metadata rows) of every Phase 3 WARC, per-WARC files and segments alike"""
+    gpt_roller = SegmentRoller(phase3_dir)
+    # Its own roller, so metadata lookups do not evict the GPT analysis segment cached by the other
+    metadata_roller = SegmentRoller(phase3_dir)
+    rolled = gpt_roller.manifest()
+
+    suffix = TABLES['gpt_analysis'][0].format(stem='')
+    for path in sorted(phase3_dir.glob(f"*{suffix}")):
+        warc_name = path.name[:-len(suffix)] + ".gz"
+        # A source left behind by a roll interrupted before removal is already in a segment
+        if warc_name in rolled:
+            continue
+        yield (warc_name, source_rows(phase3_dir, warc_name, 'gpt_analysis'),
+               source_rows(phase3_dir, warc_name, 'metadata'))
+    for warc_name, gpt_rows in gpt_roller.iter_table_rows('gpt_analysis'):
+        yield warc_name, gpt_rows, metadata_roller.table_rows(warc_name, 'metadata') or []
+
+def crawl_directories(output_dir: Path) -> List[Path]:
+    """Crawl directories of an output directory that have Phase 3 results"""
+    return sorted(path for path in Path(output_dir).iterdir() if (path / PHASE3_DIR_NAME).is_dir())
+
+def build_dataset(crawl_dir: Path, dataset_dir: Path) -> Dict:
+    """(Re)write the crawl=<name> partition tree of a crawl directory's Phase 3 results; returns stats"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    start_time = time.time()
+    crawl_dir = Path(crawl_dir)
+    dataset_dir = Path(dataset_dir)
+    crawl = crawl_dir.name
+    schema = dataset_schema()
+    stats = {'crawl': crawl, 'warc_files': 0, 'documents': 0}
+
+    def batches():
+        for warc_name, gpt_rows, metadata_rows in _phase3_sources(crawl_dir / PHASE3_DIR_NAME):
+            metadata_by_url = {row['url']: row for row in metadata_rows}
+            rows = [flatten_document(crawl, row, metadata_by_url.get(row['url'])) for row in gpt_rows]
+            stats['warc_files'] += 1
+            stats['documents'] += len(rows)
+            if rows:
+                yield pa.RecordBatch.from_pylist(rows, schema=schema)
+
+    # Built beside the live tree under a hidden name (dataset discovery skips it), then swapped in
+    dataset_dir.mkdir(parents=True, exist_ok=True)
+    build_dir = dataset_dir / f".build-{crawl}"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    ds.write_dataset(
+        batches(), build_dir, schema=schema, format='parquet',
+        partitioning=ds.partitioning(pa.schema([schema.field(name) for name in DATASET_PARTITIONS]), flavor='hive'),
+        file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+        basename_template="part-{i}.parquet",
+        max_rows_per_group=DATASET_ROWS_PER_GROUP,
+        existing_data_behavior='overwrite_or_ignore'
+    )
+
+    built = [path for path in build_dir.iterdir() if path.is_dir()] if build_dir.exists() else []
+    target = dataset_dir / (built[0].name if built else f"crawl={crawl}")
+    old = dataset_dir / f".old-{crawl}"
+    shutil.rmtree(old, ignore_errors=True)
+    if target.exists():
+        target.rename(old)
+    if built:
+        built[0].rename(target)
+    shutil.rmtree(old, ignore_errors=True)
+    shutil.rmtree(build_dir, ignore_errors=True)
+
+    files = list(target.rglob("*.parquet")) if target.exists() else []
+    stats.update({
+        'partitions': len({path.parent for path in files}),
+        'files': len(files),
+        'bytes': sum(path.stat().st_size for path in files),
+        'path': str(target),
+        'seconds': time.time() - start_time
+    })
+    logger.info(f"Dataset {target}: {stats['documents']:,} documents from {stats['warc_files']} WARCs "
+                f"in {stats['partitions']} partitions ({stats['seconds']:.1f}s)")
+    return stats
+
+def open_dataset(dataset_dir: Path):
+    """The hive-partitioned dataset (partition keys typed as strings)"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([(name, pa.string()) for name in DATASET_PARTITIONS]), flavor='hive')
+    return ds.dataset(str(dataset_dir), format='parquet', partitioning=partitioning)
+
+def _typed(value: str, field_type):
+    import pyarrow as pa
+
+    if pa.types.is_integer(field_type):
+        return int(value)
+    if pa.types.is_floating(field_type):
+        return float(value)
+    if pa.types.is_boolean(field_type):
+        return value.lower() in ('1', 'true', 'yes')
+    return value
+
+def parse_filter(expression: str, schema):
+    """Dataset filter of a `column<op>value` string; `column=a,b` matches any of the values"""
+    import pyarrow.dataset as ds
+
+    match = FILTER_RE.match(expression)
+    if not match:
+        raise ValueError(f"Cannot parse filter {expression!r}; expected column=value (or !=, >, >=, <, <=)")
+    name, op, raw = match.groups()
+    if schema.get_field_index(name) < 0:
+        raise ValueError(f"Unknown column {name!r} in filter {expression!r}")
+    field_type = schema.field(name).type
+    field = ds.field(name)
+    if op == '=' and ',' in raw:
+        return field.isin([_typed(value.strip(), field_type) for value in raw.split(',')])
+    value = _typed(raw, field_type)
+    return {'=': field == value, '!=': field != value, '>': field > value,
+            '>=': field >= value, '<': field < value, '<=': field <= value}[op]
+
+def query_dataset(dataset_dir: Path, group_by: List[str] = (), where: List[str] = (), clauses: List[str] = (),
+                  sums: List[str] = (), means: List[str] = (), distinct: List[str] = (),
+                  limit: Optional[int] = None):
+    """Document count (and sums, means, distinct counts) per group of the documents matching all filters"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    dataset = open_dataset(dataset_dir)
+    schema = dataset.schema
+    filters = [parse_filter(expression, schema) for expression in where]
+    for clause in clauses:
+        if clause.upper() not in CLAUSE_CATEGORIES:
+            raise ValueError(f"Unknown clause category {clause!r}; one of {', '.join(CLAUSE_CATEGORIES)}")
+        filters.append(parse_filter(f"{clause_column(clause.upper())}>0", schema))
+    for name in [*group_by, *sums, *means, *distinct]:
+        if schema.get_field_index(name) < 0:
+            raise ValueError(f"Unknown column {name!r}")
+    expression = None
+    for condition in filters:
+        expression = condition if expression is None else expression & condition
+
+    columns = list(dict.fromkeys([*group_by, *sums, *means, *distinct]))
+    if not columns:
+        # Counting alone is answered from Parquet metadata where the filter allows
+        return pa.table({'documents': [dataset.count_rows(filter=expression)]})
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    aggregations = ([(name, 'sum') for name in sums] + [(name, 'mean') for name in means]
+                    + [(name, 'count_distinct') for name in distinct])
+    if not group_by:
+        result = {'documents': [table.num_rows]}
+        for name, function in aggregations:
+            result[f"{name}_{function}"] = [getattr(pc, function)(table[name]).as_py()]
+        return pa.table(result)
+
+    result = table.group_by(list(group_by)).aggregate([([], 'count_all')] + aggregations)
+    result = result.rename_columns(['documents' if name == 'count_all' else name for name in result.column_names])
+    result = result.select([*group_by, 'documents', *[f"{name}_{function}" for name, function in aggregations]])
+    result = result.sort_by([('documents', 'descending')] + [(name, 'ascending') for name in group_by])
+    return result.slice(0, limit) if limit else result
+
+def format_table(table, output_format: str = 'text') -> str:
+    """A result table as aligned text, CSV or JSON"""
+    rows = table.to_pylist()
+    if output_format == 'json':
+        return json.dumps(rows, indent=2, default=str)
+    columns = table.column_names
+    if output_format == 'csv':
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=columns, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+        return out.getvalue().rstrip('\n')
+
+    def cell(value):
+        if isinstance(value, float):
+            return f"{value:.4f}"
+        return '' if value is None else str(value)
+
+    cells = [[cell(row[name]) for name in columns] for row in rows]
+    widths = [max([len(name)] + [len(row[i]) for row in cells]) for i, name in enumerate(columns)]
+    lines = ['  '.join(name.ljust(width) for name, width in zip(columns, widths)).rstrip(),
+             '  '.join('-' * width for width in widths)]
+    lines += ['  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in cells]
+    return '\n'.join(lines)
+
+def _split(values: Optional[List[str]]) -> List[str]:
+    """Repeated and comma-separated option values, flattened"""
+    return [value.strip() for item in values or [] for value in item.split(',') if value.strip()]
+
+def dataset_main(command: str, argv: List[str]):
+    """`legal-crawl-analyzer consolidate|query ...`"""
+    if command == 'consolidate':
+        parser = argparse.ArgumentParser(
+            prog="legal-crawl-analyzer consolidate",
+            description="Write the Phase 3 results of crawl directories as a hive-partitioned Parquet dataset "
+                        f"({'/'.join(f'{name}=' for name in DATASET_PARTITIONS)})"
+        )
+        parser.add_argument("--output-dir", default="analysis_output", help="Output directory of the analysis runs")
+        parser.add_argument("--crawl", action="append", default=None,
+                            help="Crawl to consolidate (repeatable). Default: every crawl with Phase 3 results")
+        parser.add_argument("--dataset", default=None,
+                            help=f"Dataset directory. Default: <output-dir>/{DATASET_DIR_NAME}")
+        args = parser.parse_args(argv)
+
+        output_dir = Path(args.output_dir)
+        dataset_dir = Path(args.dataset) if args.dataset else output_dir / DATASET_DIR_NAME
+        crawl_dirs = [output_dir / crawl for crawl in args.crawl] if args.crawl else crawl_directories(output_dir)
+        missing = [str(path) for path in crawl_dirs if not (path / PHASE3_DIR_NAME).is_dir()]
+        if missing or not crawl_dirs:
+            parser.error(f"No Phase 3 results in {', '.join(missing) or output_dir}")
+        for crawl_dir in crawl_dirs:
+            build_dataset(crawl_dir, dataset_dir)
+        return
+
+    clause_help = ', '.join(CLAUSE_CATEGORIES)
+    parser = argparse.ArgumentParser(
+        prog="legal-crawl-analyzer query",
+        description="Filtered aggregations over the consolidated dataset (see `legal-crawl-analyzer consolidate`)",
+        epilog="Example: legal-crawl-analyzer query --clause COPYRIGHT_RETAINED_USER --group-by tld"
+    )
+    parser.add_argument("--output-dir", default="analysis_output", help="Output directory of the analysis runs")
+    parser.add_argument("--dataset", default=None, help=f"Dataset directory. Default: <output-dir>/{DATASET_DIR_NAME}")
+    parser.add_argument("--crawl", default=None, help="Only this crawl (comma-separated for several)")
+    parser.add_argument("--clause", action="append", help=f"Only documents with a clause of this category: {clause_help}")
+    parser.add_argument("--where", action="append", metavar="FILTER",
+                        help="Filter such as access_level=L6_PAYWALL, tld=de,fr or tokens_used>=1000 (repeatable, ANDed)")
+    parser.add_argument("--group-by", action="append", metavar="COLUMN", help="Group by these columns")
+    parser.add_argument("--sum", action="append", metavar="COLUMN", help="Sum these columns per group")
+    parser.add_argument("--mean", action="append", metavar="COLUMN", help="Average these columns per group")
+    parser.add_argument("--distinct", action="append", metavar="COLUMN", help="Count distinct values per group")
+    parser.add_argument("--limit", type=int, default=50, help="Largest groups shown (0 for all). Default: 50")
+    parser.add_argument("--format", choices=['text', 'csv', 'json'], default='text', help="Output format")
+    parser.add_argument("--columns", action="store_true", help="List the dataset's columns and exit")
+    args = parser.parse_args(argv)
+
+    dataset_dir = Path(args.dataset) if args.dataset else Path(args.output_dir) / DATASET_DIR_NAME
+    if not dataset_dir.is_dir():
+        parser.error(f"No dataset at {dataset_dir}; build it with `legal-crawl-analyzer consolidate`")
+    if args.columns:
+        for field in open_dataset(dataset_dir).schema:
+            print(f"{field.name}\t{field.type}")
+        return
+
+    where = list(args.where or [])
+    if args.crawl:
+        where.append(f"crawl={args.crawl}")
+    start_time = time.time()
+    try:
+        result = query_dataset(dataset_dir, group_by=_split(args.group_by), where=where,
+                               clauses=_split(args.clause), sums=_split(args.sum), means=_split(args.mean),
+                               distinct=_split(args.distinct), limit=args.limit)
+    except ValueError as e:
+        parser.error(str(e))
+    print(format_table(result, args.format))
+    # Timing on stderr keeps CSV and JSON output pipeable
+    print(f"{result.num_rows} rows in {time.time() - start_time:.2f}s", file=sys.stderr)
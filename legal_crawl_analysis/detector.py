@@ -6,9 +6,11 @@ Phase 2: Sophisticated legal content detection (high precision)
 
 import re
 import logging
+import time
 from typing import Dict, List, Set, Optional
 from urllib.parse import urlparse
-import tldextract
+
+from .metrics import STAGE_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -256,14 +258,22 @@ class LegalDocumentDetector:
     def __init__(self):
         self.lightning_detector = LightningFastDetector()
         self.sophisticated_detector = SophisticatedLegalDetector()
+        self._phase_one_seconds = STAGE_SECONDS.labels(stage='phase1_detection')
+        self._phase_two_seconds = STAGE_SECONDS.labels(stage='phase2_detection')
     
     def phase_one_detection(self, url: str, html_content: str) -> Dict:
         """Phase 1: Lightning fast detection"""
-        return self.lightning_detector.is_legal_document(url, html_content)
+        start_time = time.perf_counter()
+        result = self.lightning_detector.is_legal_document(url, html_content)
+        self._phase_one_seconds.observe(time.perf_counter() - start_time)
+        return result
     
     def phase_two_detection(self, url: str, html_content: str, clean_text: str = None) -> Dict:
         """Phase 2: Sophisticated legal content analysis"""
-        return self.sophisticated_detector.analyze_legal_content(url, html_content, clean_text)
+        start_time = time.perf_counter()
+        result = self.sophisticated_detector.analyze_legal_content(url, html_content, clean_text)
+        self._phase_two_seconds.observe(time.perf_counter() - start_time)
+        return result
     
     # Legacy method for backward compatibility
     def is_legal_document(self, url: str, html_content: str) -> Dict:
@@ -0,0 +1,107 @@
+"""
+Per-registered-domain sampling caps
+Keeps at most N documents per (registered domain, document type) in a phase, so one
+large site cannot fill Phase 2 CPU or Phase 3 tokens with the same boilerplate footer.
+Where a batch of candidates is known up front, URL-pattern matches (/privacy, /terms)
+are admitted ahead of content-only matches. Dropped documents are counted per key.
+"""
+
+import json
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .domains import registered_domain
+from .metrics import DOCUMENTS
+from .config import DOMAIN_QUOTA_REPORT_TOP
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class QuotaCandidate:
+    """A document competing for a slot of its (registered domain, document type)"""
+    url: str
+    registered_domain: str
+    doc_type: str
+    url_match: bool
+
+def url_document_type(url: str, detector) -> Optional[str]:
+    """First Phase 2 document type whose URL patterns match (a LegalDocumentDetector's sophisticated detector)"""
+    for doc_type, patterns in detector.sophisticated_detector.legal_patterns.items():
+        if any(pattern.search(url) for pattern in patterns['compiled_url']):
+            return doc_type
+    return None
+
+def phase2_candidate(url: str, detector, link_target=None) -> QuotaCandidate:
+    """
+    Quota key of a Phase 1 survivor; Phase 2 has not run yet, so the type comes from the URL,
+    or from the anchor text of a link-graph target (link_graph.LinkTarget), which ranks like a URL match
+    """
+    doc_type = url_document_type(url, detector) or (link_target.doc_type if link_target else None)
+    url_match = doc_type is not None or any(pattern.search(url) for pattern in detector.lightning_detector.url_patterns)
+    if doc_type is None:
+        # Phase 1 vocabulary: matched a URL pattern, or only its content keywords
+        doc_type = 'url_match' if url_match else 'content_match'
+    return QuotaCandidate(url, registered_domain(url), doc_type, url_match)
+
+def phase3_candidate(metadata: Dict) -> QuotaCandidate:
+    """
+    Quota key of a Phase 2 survivor: its primary type, a URL match if Phase 2 matched that
+    type's URL patterns or the link graph found pages linking to it
+    """
+    analysis = metadata.get('phase2_analysis') or {}
+    if isinstance(analysis, str):
+        analysis = json.loads(analysis)
+    doc_type = analysis.get('primary_type') or 'unknown'
+    url_match = (bool((analysis.get('detection_details') or {}).get(doc_type, {}).get('url_matches'))
+                 or bool(metadata.get('link_target')))
+    domain = metadata.get('registered_domain') or registered_domain(metadata['url'])
+    return QuotaCandidate(metadata['url'], domain, doc_type, url_match)
+
+class DomainQuota:
+    """Thread-safe cap of documents per (registered domain, document type) for one phase"""
+
+    def __init__(self, phase: int, max_per_domain_type: int):
+        if max_per_domain_type < 1:
+            raise ValueError(f"Domain quota must be at least 1, got {max_per_domain_type}")
+        self.phase = phase
+        self.max_per_domain_type = max_per_domain_type
+        self._lock = threading.Lock()
+        self._kept: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._dropped: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._dropped_metric = DOCUMENTS.labels(phase=str(phase), outcome='domain_quota')
+
+    def admit(self, candidate: QuotaCandidate) -> bool:
+        """Take a slot for the candidate if its key has one left, otherwise count it as dropped"""
+        key = (candidate.registered_domain, candidate.doc_type)
+        with self._lock:
+            if self._kept[key] < self.max_per_domain_type:
+                self._kept[key] += 1
+                return True
+            self._dropped[key] += 1
+        self._dropped_metric.inc()
+        return False
+
+    def select(self, candidates: List[QuotaCandidate]) -> List[QuotaCandidate]:
+        """Admit a batch, URL-pattern matches first; returns the dropped candidates"""
+        ordered = sorted(candidates, key=lambda candidate: not candidate.url_match)
+        dropped = [candidate for candidate in ordered if not self.admit(candidate)]
+        if dropped:
+            logger.info(f"Phase {self.phase} domain quota: dropped {len(dropped)} of {len(candidates)} documents")
+        return dropped
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            kept, dropped = dict(self._kept), dict(self._dropped)
+        top = sorted(dropped.items(), key=lambda entry: entry[1], reverse=True)[:DOMAIN_QUOTA_REPORT_TOP]
+        return {
+            'max_per_domain_type': self.max_per_domain_type,
+            'kept': sum(kept.values()),
+            'dropped': sum(dropped.values()),
+            'keys_capped': len(dropped),
+            'top_dropped': [{'registered_domain': domain, 'doc_type': doc_type,
+                             'kept': kept.get((domain, doc_type), 0), 'dropped': count}
+                            for (domain, doc_type), count in top]
+        }
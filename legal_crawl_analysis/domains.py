@@ -0,0 +1,66 @@
+"""
+Offline registered-domain extraction
+One public suffix list per process, loaded from tldextract's bundled snapshot (or a
+snapshot file named by LEGAL_CRAWL_PUBLIC_SUFFIX_LIST) and never fetched over the
+network, with a bounded LRU cache of results per host. Shared by all phases and workers.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from .config import PUBLIC_SUFFIX_LIST_FILE, DOMAIN_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class DomainInfo:
+    """Domain parts of a host; registered_domain tells example.com from example.co.uk"""
+    domain: str  # 'example' (the bare host for IPs and single-label hosts)
+    suffix: str  # 'co.uk'
+    registered_domain: str  # 'example.co.uk'
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+def _get_extractor():
+    """The process-wide TLDExtract, built on first use without any network access"""
+    global _extractor
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                import tldextract
+                # No cache_dir: nothing is read from or written to ~/.cache
+                suffix_list_urls = ()
+                if PUBLIC_SUFFIX_LIST_FILE:
+                    suffix_list_urls = (Path(PUBLIC_SUFFIX_LIST_FILE).resolve().as_uri(),)
+                    logger.info(f"Using public suffix list snapshot {PUBLIC_SUFFIX_LIST_FILE}")
+                _extractor = tldextract.TLDExtract(cache_dir=None, suffix_list_urls=suffix_list_urls,
+                                                   fallback_to_snapshot=True)
+    return _extractor
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def host_domain_info(host: str) -> DomainInfo:
+    """Domain parts of a lower-cased host name (cached)"""
+    parts = _get_extractor().extract_str(host)
+    registered = f"{parts.domain}.{parts.suffix}" if parts.domain and parts.suffix else parts.domain
+    return DomainInfo(domain=parts.domain, suffix=parts.suffix, registered_domain=registered)
+
+def domain_info(url: str) -> DomainInfo:
+    """Domain parts of a URL"""
+    try:
+        host = urlsplit(url if '://' in url else '//' + url).hostname or ''
+    except ValueError:
+        host = ''
+    return host_domain_info(host.rstrip('.'))
+
+def registered_domain(url: str) -> str:
+    """Registered domain of a URL, e.g. 'example.co.uk' for https://www.example.co.uk/terms"""
+    return domain_info(url).registered_domain
+
+def domain_cache_info():
+    """Hit/miss counters of the per-host cache (functools cache_info)"""
+    return host_domain_info.cache_info()
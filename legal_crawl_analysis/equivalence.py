@@ -0,0 +1,224 @@
+"""
+Detector equivalence and recall-regression checks
+Runs the reference Phase 1 or Phase 2 detector and an alternative implementation
+over the same corpus, diffs their decisions, confidences and detected types per
+record, measures the speedup, and fails when the candidate disagrees too often or
+drops documents the reference keeps (Phase 1 exists to guarantee recall).
+
+    detector-equivalence --phase 1 --candidate mypackage.fast:FastDetector --warc sample.warc.gz
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .benchmark import load_documents
+from .detector import LightningFastDetector, SophisticatedLegalDetector
+from .extractor import HTMLContentExtractor
+from .synthetic import add_spec_arguments, generate_corpus, labels_path_for, load_labels, spec_from_args
+from .config import (
+    EQUIVALENCE_MAX_DISAGREEMENT_RATE,
+    EQUIVALENCE_MAX_RECALL_LOSS,
+    EQUIVALENCE_CONFIDENCE_TOLERANCE
+)
+
+logger = logging.getLogger(__name__)
+
+# Differing records included in the report for inspection
+MAX_EXAMPLES = 20
+
+class PhaseAdapter:
+    """How to call a detector of one phase and read its decision, confidence and types"""
+
+    def __init__(self, phase: int):
+        if phase not in (1, 2):
+            raise ValueError(f"Unknown detector phase: {phase}")
+        self.phase = phase
+
+    def reference(self):
+        return LightningFastDetector() if self.phase == 1 else SophisticatedLegalDetector()
+
+    def call(self, detector, document: Tuple) -> Dict:
+        if self.phase == 1:
+            url, html = document[:2]
+            return detector.is_legal_document(url, html)
+        url, html, clean_text = document
+        return detector.analyze_legal_content(url, html, clean_text)
+
+    def summarize(self, result: Dict) -> Dict:
+        """The fields that must agree between implementations"""
+        if self.phase == 1:
+            return {'is_legal': bool(result['is_legal']), 'confidence': float(result['confidence']),
+                    'types': [result['type']]}
+        return {'is_legal': bool(result['is_legal']), 'confidence': float(result['total_confidence']),
+                'types': sorted(result['document_types'])}
+
+def load_candidate(spec: str):
+    """Instantiate a detector from 'package.module:ClassName'"""
+    module_name, _, class_name = spec.partition(':')
+    if not class_name:
+        raise ValueError(f"Candidate must be given as module:ClassName, got {spec}")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+def _timed_run(adapter: PhaseAdapter, detector, documents: List[Tuple], repeats: int) -> Tuple[List[Dict], float]:
+    """Summaries from the first run and the best wall time over `repeats` runs"""
+    summaries, best = [], float('inf')
+    for attempt in range(repeats):
+        start = time.perf_counter()
+        results = [adapter.call(detector, document) for document in documents]
+        best = min(best, time.perf_counter() - start)
+        if attempt == 0:
+            summaries = [adapter.summarize(result) for result in results]
+    return summaries, best
+
+def _recall(summaries: List[Dict], documents: List[Tuple], truth: Dict[str, bool]) -> Optional[float]:
+    positives = [i for i, document in enumerate(documents) if truth.get(document[0])]
+    if not positives:
+        return None
+    return sum(1 for i in positives if summaries[i]['is_legal']) / len(positives)
+
+def compare_detectors(phase: int, candidate, documents: List[Tuple], reference=None, repeats: int = 3,
+                      truth: Optional[Dict[str, bool]] = None,
+                      max_disagreement_rate: float = EQUIVALENCE_MAX_DISAGREEMENT_RATE,
+                      max_recall_loss: float = EQUIVALENCE_MAX_RECALL_LOSS,
+                      confidence_tolerance: float = EQUIVALENCE_CONFIDENCE_TOLERANCE) -> Dict:
+    """
+    Diff candidate against reference over the documents (Phase 1: (url, html);
+    Phase 2: (url, html, clean_text)) and return a report with a pass/fail verdict
+    """
+    adapter = PhaseAdapter(phase)
+    reference = reference or adapter.reference()
+    reference_summaries, reference_seconds = _timed_run(adapter, reference, documents, repeats)
+    candidate_summaries, candidate_seconds = _timed_run(adapter, candidate, documents, repeats)
+
+    counts = {'decision': 0, 'lost': 0, 'gained': 0, 'confidence': 0, 'types': 0}
+    differing, examples = 0, []
+    for document, ref, cand in zip(documents, reference_summaries, candidate_summaries):
+        diffs = []
+        if ref['is_legal'] != cand['is_legal']:
+            diffs.append('decision')
+            counts['lost' if ref['is_legal'] else 'gained'] += 1
+        if abs(ref['confidence'] - cand['confidence']) > confidence_tolerance:
+            diffs.append('confidence')
+        if ref['types'] != cand['types']:
+            diffs.append('types')
+        for diff in diffs:
+            counts[diff] += 1
+        if diffs:
+            differing += 1
+            if len(examples) < MAX_EXAMPLES:
+                examples.append({'url': document[0], 'differences': diffs, 'reference': ref, 'candidate': cand})
+
+    records = len(documents)
+    reference_positives = sum(1 for ref in reference_summaries if ref['is_legal'])
+    disagreement_rate = differing / records if records else 0.0
+    recall_loss = counts['lost'] / reference_positives if reference_positives else 0.0
+
+    failures = []
+    if disagreement_rate > max_disagreement_rate:
+        failures.append(f"disagreement rate {disagreement_rate:.4%} exceeds {max_disagreement_rate:.4%}")
+    if recall_loss > max_recall_loss:
+        failures.append(f"candidate drops {counts['lost']} of {reference_positives} reference positives "
+                        f"({recall_loss:.4%} > {max_recall_loss:.4%})")
+
+    report = {
+        'phase': phase,
+        'reference': type(reference).__name__,
+        'candidate': f"{type(candidate).__module__}.{type(candidate).__name__}",
+        'records': records,
+        'reference_positives': reference_positives,
+        'candidate_positives': sum(1 for cand in candidate_summaries if cand['is_legal']),
+        'differing_records': differing,
+        'disagreement_rate': disagreement_rate,
+        'recall_loss': recall_loss,
+        'mismatches': counts,
+        'reference_seconds': reference_seconds,
+        'candidate_seconds': candidate_seconds,
+        'speedup': reference_seconds / candidate_seconds if candidate_seconds else None,
+        'thresholds': {'max_disagreement_rate': max_disagreement_rate, 'max_recall_loss': max_recall_loss,
+                       'confidence_tolerance': confidence_tolerance},
+        'passed': not failures,
+        'failures': failures,
+        'examples': examples
+    }
+    if truth:
+        # Against ground truth (synthetic corpora), not just against the reference
+        report['reference_recall'] = _recall(reference_summaries, documents, truth)
+        report['candidate_recall'] = _recall(candidate_summaries, documents, truth)
+    return report
+
+def phase_documents(phase: int, warc_paths: List[Path]) -> List[Tuple]:
+    """Inputs as the pipeline feeds them: all records for Phase 1, reference Phase 1 survivors with clean text for Phase 2"""
+    documents = load_documents(warc_paths)
+    if phase == 1:
+        return documents
+    lightning, extractor = LightningFastDetector(), HTMLContentExtractor()
+    phase2_documents = []
+    for url, html in documents:
+        if lightning.is_legal_document(url, html)['is_legal']:
+            clean_text = extractor.extract_clean_text(html)
+            if clean_text and len(clean_text) >= 30:
+                phase2_documents.append((url, html, clean_text))
+    return phase2_documents
+
+def load_truth(warc_paths: List[Path]) -> Dict[str, bool]:
+    """URL -> is_legal from synthetic label sidecars, where present"""
+    truth = {}
+    for warc_path in warc_paths:
+        if labels_path_for(warc_path).exists():
+            truth.update({row['url']: row['is_legal'] for row in load_labels(warc_path)})
+    return truth
+
+def main():
+    """Compare a candidate detector with the reference and exit non-zero on regression"""
+    parser = argparse.ArgumentParser(description="Check an alternative Phase 1/2 detector against the reference implementation")
+    parser.add_argument("--phase", type=int, choices=(1, 2), required=True, help="Detector phase to compare")
+    parser.add_argument("--candidate", required=True, help="Alternative detector as module:ClassName")
+    parser.add_argument("--warc", nargs='+', help="WARC files to compare on (default: a synthetic corpus)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per detector. Default: 3")
+    parser.add_argument("--max-disagreement-rate", type=float, default=EQUIVALENCE_MAX_DISAGREEMENT_RATE,
+                        help=f"Fail above this share of differing records. Default: {EQUIVALENCE_MAX_DISAGREEMENT_RATE}")
+    parser.add_argument("--max-recall-loss", type=float, default=EQUIVALENCE_MAX_RECALL_LOSS,
+                        help=f"Fail above this share of dropped reference positives. Default: {EQUIVALENCE_MAX_RECALL_LOSS}")
+    parser.add_argument("--output", help="Write the full report as JSON")
+    parser.add_argument("--corpus-dir", help="Keep the synthetic corpus here (default: a temporary directory)")
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    with tempfile.TemporaryDirectory(prefix="legal-crawl-equivalence-") as work_dir:
+        if args.warc:
+            warc_paths = [Path(path) for path in args.warc]
+        else:
+            warc_paths = [path for path, _ in generate_corpus(Path(args.corpus_dir or work_dir), spec_from_args(args))]
+
+        report = compare_detectors(args.phase, load_candidate(args.candidate), phase_documents(args.phase, warc_paths),
+                                   repeats=args.repeats, truth=load_truth(warc_paths),
+                                   max_disagreement_rate=args.max_disagreement_rate,
+                                   max_recall_loss=args.max_recall_loss)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    print(f"Phase {report['phase']}: {report['candidate']} vs {report['reference']} on {report['records']} records")
+    print(f"  differing records: {report['differing_records']} ({report['disagreement_rate']:.4%}), "
+          f"mismatches: {report['mismatches']}")
+    print(f"  speedup: {report['speedup']:.2f}x ({report['reference_seconds']:.3f}s -> {report['candidate_seconds']:.3f}s)")
+    if report.get('reference_recall') is not None:
+        print(f"  recall vs labels: reference {report['reference_recall']:.2%}, candidate {report['candidate_recall']:.2%}")
+    for example in report['examples'][:5]:
+        print(f"  differs: {example['url']} {example['differences']}")
+    print("PASSED" if report['passed'] else "FAILED: " + "; ".join(report['failures']))
+    sys.exit(0 if report['passed'] else 1)
+
+
+if __name__ == "__main__":
+    main()
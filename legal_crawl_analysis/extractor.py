@@ -3,27 +3,39 @@ HTML content extractor with text cleaning capabilities
 """
 
 import re
+import importlib.util
 import logging
+import time
 import warnings
 from typing import Optional
-from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
 
-# Try to import readability, fall back gracefully if not available
-try:
-    from readability import Document
-    HAS_READABILITY = True
-    # Suppress the readability library's verbose logging
-    readability_logger = logging.getLogger('readability.readability')
-    readability_logger.setLevel(logging.WARNING)
-except ImportError:
-    HAS_READABILITY = False
-    logging.warning("readability-lxml not available. Install with: pip install readability-lxml")
+from .metrics import STAGE_SECONDS
 
-# Ignore XML parsing warnings
-warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+# bs4 and readability are imported on the first extraction, so processes that never
+# extract text (Phase 1 workers, CLI startup) don't load them
+HAS_READABILITY = importlib.util.find_spec('readability') is not None
+if not HAS_READABILITY:
+    logging.warning("readability-lxml not available. Install with: pip install readability-lxml")
 
 logger = logging.getLogger(__name__)
 
+_parsers = None
+
+def _load_parsers():
+    """(BeautifulSoup, readability Document or None), imported once"""
+    global _parsers
+    if _parsers is None:
+        from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+        # Ignore XML parsing warnings
+        warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+        Document = None
+        if HAS_READABILITY:
+            from readability import Document
+            # Suppress the readability library's verbose logging
+            logging.getLogger('readability.readability').setLevel(logging.WARNING)
+        _parsers = (BeautifulSoup, Document)
+    return _parsers
+
 class HTMLContentExtractor:
     """Extracts and cleans HTML content from web pages"""
     
@@ -31,17 +43,26 @@ class HTMLContentExtractor:
         self.has_readability = HAS_READABILITY
         if not self.has_readability:
             logger.warning("readability-lxml not available. Using fallback text extraction.")
+        self._extraction_seconds = STAGE_SECONDS.labels(stage='extraction')
         
     def extract_clean_text(self, html_content: str) -> Optional[str]:
         """
         Extract clean text from HTML content using multiple methods
         Returns the cleanest extracted text with fallback methods
         """
+        start_time = time.perf_counter()
+        try:
+            return self._extract_clean_text(html_content)
+        finally:
+            self._extraction_seconds.observe(time.perf_counter() - start_time)
+    
+    def _extract_clean_text(self, html_content: str) -> Optional[str]:
         if not html_content or len(html_content.strip()) < 50:
             return None
             
         # Try multiple extraction methods, return the best result
         extraction_methods = []
+        BeautifulSoup, Document = _load_parsers()
         
         # Method 1: Use readability to extract main content (if available)
         if self.has_readability:
@@ -100,6 +121,7 @@ class HTMLContentExtractor:
     def _clean_html_text(self, html_content: str) -> str:
         """Clean HTML content to plain text"""
         try:
+            BeautifulSoup, _ = _load_parsers()
             soup = BeautifulSoup(html_content, 'lxml')
             
             # Remove unwanted elements
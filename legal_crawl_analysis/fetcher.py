@@ -1,16 +1,44 @@
 """
 CommonCrawl WARC file fetcher
+Fetches WARC files, or in WET input mode the much smaller WET files (plain-text
+conversion records) published alongside each WARC, the WAT files whose link metadata
+feeds link discovery, and copies the full WARC records of selected documents from a
+local WARC, or range-fetches just those records when there is no local copy.
 """
 
 import re
 import gzip
 import logging
-import requests
+import time
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from .metrics import BYTES, CACHE_REQUESTS, ERRORS, STAGE_SECONDS
+
 logger = logging.getLogger(__name__)
 
+# Record types carrying a document: HTML in WARC responses, extracted text in WET conversions
+CONTENT_RECORD_TYPES = ('response', 'conversion')
+
+def wet_path_for(warc_path: str) -> str:
+    """CommonCrawl WET path of a WARC path (`.../warc/X.warc.gz` -> `.../wet/X.warc.wet.gz`)"""
+    wet_path = warc_path.replace('/warc/', '/wet/')
+    if wet_path.endswith('.warc.gz'):
+        wet_path = wet_path[:-len('.warc.gz')] + '.warc.wet.gz'
+    return wet_path
+
+def wat_path_for(warc_path: str) -> str:
+    """CommonCrawl WAT (link metadata) path of a WARC path (`.../warc/X.warc.gz` -> `.../wat/X.warc.wat.gz`)"""
+    wat_path = warc_path.replace('/warc/', '/wat/')
+    if wat_path.endswith('.warc.gz'):
+        wat_path = wat_path[:-len('.warc.gz')] + '.warc.wat.gz'
+    return wat_path
+
+def warc_stem(input_file: Path) -> str:
+    """Stem of the WARC an input file belongs to (`X.warc.gz` and `X.warc.wet.gz` -> `X.warc`)"""
+    stem = Path(input_file).stem
+    return stem[:-len('.wet')] if stem.endswith('.wet') else stem
+
 class CommonCrawlFetcher:
     """Handles fetching CommonCrawl WARC files"""
     
@@ -24,6 +52,7 @@ class CommonCrawlFetcher:
         """Get information about the latest CommonCrawl dump"""
         try:
             # Use the latest crawl info endpoint
+            import requests
             latest_url = f"{self.BASE_URL}/crawl-data/CC-MAIN-2025-08/warc.paths.gz"
             response = requests.get(latest_url, stream=True)
             response.raise_for_status()
@@ -55,6 +84,92 @@ class CommonCrawlFetcher:
                 ]
             }
     
+    def download_input_file(self, warc_path: str, input_format: str = 'warc') -> Optional[Path]:
+        """Download the WARC, or with input_format 'wet' only its WET file"""
+        if input_format == 'wet':
+            return self.download_warc_file(wet_path_for(warc_path))
+        return self.download_warc_file(warc_path)
+    
+    def download_wat_file(self, warc_path: str) -> Optional[Path]:
+        """Download the WAT file of a WARC (page metadata including every link and its anchor text)"""
+        return self.download_warc_file(wat_path_for(warc_path))
+    
+    def copy_full_records(self, warc_name: str, documents: Dict[str, Optional[str]], writer,
+                          record_index=None, range_fetcher=None) -> int:
+        """
+        Copy the response records of the given documents (URL -> WARC-Record-ID the WET
+        conversion refers to, or None) from the local copy of a WARC or, without one, from
+        just those records located through record_index (index_fetch.CdxServerIndex) and
+        fetched with range_fetcher; returns records copied
+        """
+        local_path = self.output_dir / warc_name
+        if local_path.exists():
+            return self._copy_records(local_path, documents, writer)
+        if record_index is None or range_fetcher is None:
+            logger.warning(f"No local copy of {warc_name}; keeping WET text records only")
+            return 0
+        
+        entries = record_index.entries_for_urls(warc_name, documents)
+        if not entries:
+            logger.warning(f"No full WARC records of {warc_name} located; keeping WET text records only")
+            return 0
+        fetched_path = self.output_dir / "full_records" / warc_name
+        fetched_path.parent.mkdir(exist_ok=True)
+        try:
+            range_fetcher.fetch_to_file(entries, fetched_path)
+            return self._copy_records(fetched_path, documents, writer)
+        finally:
+            fetched_path.unlink(missing_ok=True)
+    
+    def _copy_records(self, local_path: Path, documents: Dict[str, Optional[str]], writer) -> int:
+        """Copy the wanted response records of a local WARC to writer"""
+        from warcio.archiveiterator import ArchiveIterator
+        
+        wanted_ids = {record_id for record_id in documents.values() if record_id}
+        wanted_urls = {url for url, record_id in documents.items() if not record_id}
+        copied = 0
+        with gzip.open(local_path, 'rb') as f:
+            for record in ArchiveIterator(f):
+                if record.rec_type != 'response':
+                    continue
+                record_id = record.rec_headers.get_header('WARC-Record-ID')
+                url = record.rec_headers.get_header('WARC-Target-URI')
+                if record_id in wanted_ids or url in wanted_urls:
+                    writer.write_record(record)
+                    wanted_ids.discard(record_id)
+                    wanted_urls.discard(url)
+                    copied += 1
+                    if not wanted_ids and not wanted_urls:
+                        break
+        logger.info(f"Copied {copied} of {len(documents)} full WARC records from {local_path}")
+        return copied
+    
+    def download_candidate_records(self, warc_path: str, url_index, range_fetcher) -> Optional[Path]:
+        """
+        Fetch only the records of a WARC that its URL index lists as Phase 1 candidates
+        (index_fetch.UrlIndex / RangeFetcher); returns a WARC of just those records
+        """
+        local_path = self.output_dir / "candidates" / Path(warc_path).name
+        if local_path.exists():
+            CACHE_REQUESTS.labels(cache='warc_download', result='hit').inc()
+            logger.info(f"Candidate records already fetched: {local_path}")
+            return local_path
+        CACHE_REQUESTS.labels(cache='warc_download', result='miss').inc()
+        local_path.parent.mkdir(exist_ok=True)
+        
+        try:
+            stats = range_fetcher.fetch_to_file(url_index.entries_for(warc_path), local_path)
+        except Exception as e:
+            logger.error(f"Error fetching candidate records of {warc_path}: {e}")
+            ERRORS.labels(stage='download').inc()
+            return None
+        if stats['failed_requests']:
+            # Retried on the next run instead of silently missing records
+            local_path.unlink()
+            logger.error(f"{stats['failed_requests']} range requests failed for {warc_path}")
+            return None
+        return local_path
+    
     def download_warc_file(self, warc_path: str) -> Optional[Path]:
         """
         Download a WARC file if it doesn't already exist
@@ -66,11 +181,15 @@ class CommonCrawlFetcher:
         
         # Check if file already exists
         if local_path.exists():
+            CACHE_REQUESTS.labels(cache='warc_download', result='hit').inc()
             file_size_mb = local_path.stat().st_size / (1024 * 1024)
             logger.info(f"WARC file already exists: {local_path} ({file_size_mb:.2f} MB)")
             return local_path
+        CACHE_REQUESTS.labels(cache='warc_download', result='miss').inc()
         
+        start_time = time.perf_counter()
         try:
+            import requests
             url = f"{self.BASE_URL}/{warc_path}"
             logger.info(f"Downloading WARC file: {url}")
             
@@ -84,13 +203,16 @@ class CommonCrawlFetcher:
                     if chunk:
                         f.write(chunk)
                         total_size += len(chunk)
+                        BYTES.labels(stage='download').inc(len(chunk))
             
+            STAGE_SECONDS.labels(stage='download').observe(time.perf_counter() - start_time)
             file_size_mb = total_size / (1024 * 1024)
             logger.info(f"Downloaded and preserved: {local_path} ({file_size_mb:.2f} MB)")
             return local_path
             
         except Exception as e:
             logger.error(f"Error downloading WARC file {warc_path}: {e}")
+            ERRORS.labels(stage='download').inc()
             # Clean up partial download
             if local_path.exists():
                 local_path.unlink()
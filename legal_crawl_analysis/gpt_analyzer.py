@@ -2,74 +2,201 @@
 GPT-4o analyzer for legal documents
 """
 
-import json
 import logging
-from typing import Dict
-import openai
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .config import (
+    GPT_MODEL,
+    MAX_TOKENS_PER_ANALYSIS,
+    GPT_TEMPERATURE,
+    GPT_PROMPT_TEXT_CHARS,
+    GPT_RESPONSE_FORMAT,
+    GPT_COMPACT_SCHEMA,
+    GPT_TRUNCATION_RETRY_MAX_TOKENS,
+    GPT_RATE_LIMIT_RETRIES,
+    GPT_RATE_LIMIT_BACKOFF_SECONDS
+)
+from .llm_backends import LLMBackend, OpenAIBackend, RateLimitError
+from .metrics import ERRORS, GPT_REQUESTS, STAGE_SECONDS, TOKENS
+from .structured_output import (
+    get_response_format,
+    normalize_analysis,
+    salvage_json,
+    empty_analysis
+)
 
 logger = logging.getLogger(__name__)
 
 class GPTLegalAnalyzer:
-    """Uses GPT-4o to analyze legal documents for specific clauses"""
+    """Uses GPT-4o (or any LLMBackend) to analyze legal documents for specific clauses"""
     
-    def __init__(self, api_key: str):
-        self.client = openai.OpenAI(api_key=api_key)
+    def __init__(self, api_key: Optional[str] = None, backend: Optional[LLMBackend] = None,
+                 model: str = GPT_MODEL, max_tokens: int = MAX_TOKENS_PER_ANALYSIS,
+                 temperature: float = GPT_TEMPERATURE, response_format: str = GPT_RESPONSE_FORMAT,
+                 compact_schema: bool = GPT_COMPACT_SCHEMA, concurrency_controller=None):
+        # Any LLMBackend works; the hosted OpenAI API is the default
+        self.backend = backend or OpenAIBackend(api_key=api_key)
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
         self.total_tokens_used = 0
+        self.prompt_tokens_used = 0
+        self.completion_tokens_used = 0
         self.api_calls = 0
+        self.rate_limited_calls = 0
+        
+        # Calls may run on several threads: shared counters are updated under a lock and
+        # per-document token usage is tracked per thread (see last_call_tokens)
+        self._counter_lock = threading.Lock()
+        self._local = threading.local()
+        
+        # Optional AIMDController that learns the in-flight limit from 429s
+        self.concurrency_controller = concurrency_controller
+        
+        # Structured output settings: 'json_schema', 'json_object' or 'none'
+        self.response_format = response_format
+        self.compact_schema = compact_schema
+        
+        # Parse accounting - every discarded response is wasted spend
+        self.parse_failures = 0
+        self.salvaged_responses = 0
+        self.truncated_responses = 0
+        self.retries = 0
         
-    def analyze_document(self, clean_text: str, url: str) -> Dict:
+    def analyze_document(self, clean_text: str, url: str, model: Optional[str] = None,
+                         max_tokens: Optional[int] = None) -> Dict:
         """
         Analyze legal document using GPT-4o
         Returns detailed analysis of copyright clauses, access levels, etc.
+        (the empty analysis when the request or parsing fails, see last_call_failed)
+        model/max_tokens override the analyzer defaults for this call (used by model-tier routing)
         """
+        model = model or self.model
+        self._local.tokens = 0
+        self._local.failed = False
         try:
-            self.api_calls += 1
+            messages = [
+                {"role": "system", "content": self._get_system_prompt()},
+                {"role": "user", "content": self._get_user_prompt(clean_text, url)}
+            ]
             
-            system_prompt = self._get_system_prompt()
-            user_prompt = self._get_user_prompt(clean_text, url)
+            response_content, truncated = self._request_completion(messages, model, max_tokens or self.max_tokens)
+            analysis, repaired = self._parse_response(response_content)
             
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.1,
-                max_tokens=2000
-            )
-            
-            self.total_tokens_used += response.usage.total_tokens
-            
-            # Get response content
-            response_content = response.choices[0].message.content.strip()
-            
-            # Check if response is empty
-            if not response_content:
-                logger.warning(f"Empty response from GPT for URL: {url}")
-                return self._get_empty_analysis()
-            
-            # Try to parse JSON, handle malformed responses
-            try:
-                # Remove any markdown code blocks if present
-                if response_content.startswith("```json"):
-                    response_content = response_content.replace("```json", "").replace("```", "").strip()
-                elif response_content.startswith("```"):
-                    response_content = response_content.replace("```", "").strip()
+            # Single targeted retry when the response was cut off or unparseable
+            if truncated or analysis is None:
+                with self._counter_lock:
+                    if truncated:
+                        self.truncated_responses += 1
+                    self.retries += 1
+                logger.warning(f"{'Truncated' if truncated else 'Unparseable'} GPT response for URL {url}, retrying once")
                 
-                analysis = json.loads(response_content)
-                return analysis
+                retry_messages = messages + [{"role": "user", "content": self._get_retry_prompt()}]
+                retry_content, retry_truncated = self._request_completion(
+                    retry_messages, model, GPT_TRUNCATION_RETRY_MAX_TOKENS
+                )
+                retry_analysis, retry_repaired = self._parse_response(retry_content)
                 
-            except json.JSONDecodeError as json_err:
-                logger.error(f"JSON parsing error for URL {url}: {json_err}")
-                logger.error(f"Raw response: {response_content[:200]}...")
+                # Prefer a complete retry, then a salvaged first attempt, then a salvaged retry
+                if retry_analysis is not None and not (retry_truncated or retry_repaired):
+                    analysis, repaired = retry_analysis, False
+                elif analysis is None:
+                    analysis, repaired = retry_analysis, retry_repaired
+            
+            if analysis is None:
+                with self._counter_lock:
+                    self.parse_failures += 1
+                ERRORS.labels(stage='gpt_parse').inc()
+                logger.error(f"Could not parse GPT response for URL {url}: {response_content[:200]}...")
+                self._local.failed = True
                 return self._get_empty_analysis()
             
+            if repaired:
+                with self._counter_lock:
+                    self.salvaged_responses += 1
+            
+            return normalize_analysis(analysis)
+            
         except Exception as e:
             logger.error(f"Error in GPT analysis for URL {url}: {e}")
+            ERRORS.labels(stage='gpt_analysis').inc()
+            self._local.failed = True
             return self._get_empty_analysis()
     
+    def _request_completion(self, messages: list, model: str, max_tokens: int) -> Tuple[str, bool]:
+        """Send one chat completion request, return (content, truncated); 429s are retried with backoff"""
+        response_format = get_response_format(self.response_format, self.compact_schema)
+        
+        for attempt in range(GPT_RATE_LIMIT_RETRIES + 1):
+            with self._counter_lock:
+                self.api_calls += 1
+            start_time = time.perf_counter()
+            try:
+                result = self.backend.complete(
+                    messages, model=model, max_tokens=max_tokens,
+                    temperature=self.temperature, response_format=response_format
+                )
+                STAGE_SECONDS.labels(stage='gpt_request').observe(time.perf_counter() - start_time)
+                GPT_REQUESTS.labels(outcome='ok').inc()
+                break
+            except RateLimitError as e:
+                GPT_REQUESTS.labels(outcome='rate_limited').inc()
+                with self._counter_lock:
+                    self.rate_limited_calls += 1
+                if self.concurrency_controller is not None:
+                    self.concurrency_controller.on_rate_limit()
+                if attempt == GPT_RATE_LIMIT_RETRIES:
+                    raise
+                delay = e.retry_after or GPT_RATE_LIMIT_BACKOFF_SECONDS * (2 ** attempt)
+                logger.warning(f"Rate limited by {self.backend.name} backend, retrying in {delay:.1f}s")
+                time.sleep(delay)
+        
+        if self.concurrency_controller is not None:
+            self.concurrency_controller.on_success()
+        
+        with self._counter_lock:
+            self.total_tokens_used += result.total_tokens
+            self.prompt_tokens_used += result.prompt_tokens
+            self.completion_tokens_used += result.completion_tokens
+        self._local.tokens = getattr(self._local, 'tokens', 0) + result.total_tokens
+        TOKENS.labels(kind='prompt').inc(result.prompt_tokens)
+        TOKENS.labels(kind='completion').inc(result.completion_tokens)
+        
+        return result.content.strip(), result.finish_reason == "length"
+    
+    @property
+    def last_call_tokens(self) -> int:
+        """Tokens used by the most recent analyze_document() call on the calling thread"""
+        return getattr(self._local, 'tokens', 0)
+    
+    @property
+    def last_call_failed(self) -> bool:
+        """Whether the most recent analyze_document() call on the calling thread returned the empty analysis of a failure"""
+        return getattr(self._local, 'failed', False)
+    
+    def _parse_response(self, response_content: str) -> Tuple[Optional[Dict], bool]:
+        """Parse a response, salvaging truncated or wrapped JSON; returns (analysis, repaired)"""
+        if not response_content:
+            return None, False
+        return salvage_json(response_content)
+    
+    def get_parse_stats(self) -> Dict:
+        """Counts of parse failures, salvaged and truncated responses and retries"""
+        return {
+            'api_calls': self.api_calls,
+            'rate_limited_calls': self.rate_limited_calls,
+            'parse_failures': self.parse_failures,
+            'salvaged_responses': self.salvaged_responses,
+            'truncated_responses': self.truncated_responses,
+            'retries': self.retries
+        }
+    
     def _get_system_prompt(self) -> str:
         """Get the system prompt for GPT analysis"""
+        if self.compact_schema:
+            return self._get_compact_system_prompt()
         return """You are a legal AI assistant specialized in analyzing web legal documents (privacy policies, terms of service, etc.) for specific copyright and access control clauses.
 
 Your task is to identify and classify specific types of legal clauses in the provided text. 
@@ -120,11 +247,31 @@ ACCESS LEVELS:
 
 Return only the JSON object, no other text."""
 
+    def _get_compact_system_prompt(self) -> str:
+        """System prompt for the compact wire schema (short keys and codes, no context)"""
+        return """You are a legal AI assistant specialized in analyzing web legal documents (privacy policies, terms of service, etc.) for specific copyright and access control clauses.
+
+Return ONLY a JSON object in this compact format:
+{"c":[{"t":"short exact quote, max 200 chars","k":"RS","p":0.8}],"a":{"l":"L0","i":["indicator"],"p":0.8},"tpm":[],"lia":[],"jur":[],"dl":[]}
+
+Keys: c=copyright clauses (t=quote, k=category code, p=confidence), a=access level (l=level code, i=indicators, p=confidence), tpm=technical protection measures, lia=liability/indemnification clauses, jur=jurisdiction/governing law clauses, dl=data licensing terms. Keep list entries short.
+
+CATEGORY CODES (k):
+RS=website/service retains copyright; RU=user retains copyright over submitted content; LS=user grants specific license to site; W=copyright waived (public domain); ND=DMCA/infringement procedures; NT=third-party content/links copyright; NL=user grants license (not full retention); NI=clearly not about copyright; A=unclear copyright clause
+
+ACCESS LEVEL CODES (l):
+L0=standard HTML, simple GET; L1=robots.txt restrictions; L2=requires JavaScript rendering; L3=login required, no anti-bot; L4=CAPTCHA protected; L5=advanced anti-bot (Cloudflare, etc.); L6=paywall; L7=geo-blocked or unavailable"""
+
+    def _get_retry_prompt(self) -> str:
+        """Follow-up instruction for the single retry after a truncated or invalid response"""
+        return ("Your previous answer was cut off or was not valid JSON. Answer again with the complete JSON object only. "
+                "Be brief: at most 10 clauses, quotes under 150 characters, short list entries.")
+
     def _get_user_prompt(self, text: str, url: str) -> str:
         """Get the user prompt with document text"""
-        # Truncate text if too long (keep first 4000 chars for context)
-        if len(text) > 4000:
-            text = text[:4000] + "... [truncated]"
+        # Truncate text if too long (keep the first GPT_PROMPT_TEXT_CHARS chars for context)
+        if len(text) > GPT_PROMPT_TEXT_CHARS:
+            text = text[:GPT_PROMPT_TEXT_CHARS] + "... [truncated]"
         
         return f"""Analyze this legal document from URL: {url}
 
@@ -135,15 +282,4 @@ Return only valid JSON following the specified format."""
 
     def _get_empty_analysis(self) -> Dict:
         """Return empty analysis structure"""
-        return {
-            "copyright_clauses": [],
-            "access_level": {
-                "level": "L0_OPEN_ACCESS",
-                "indicators": [],
-                "confidence": 0.0
-            },
-            "technical_protection_measures": [],
-            "liability_clauses": [],
-            "jurisdiction_clauses": [],
-            "data_licensing": []
-        } 
\ No newline at end of file
+        return empty_analysis() 
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""
+On-disk hand-off between standalone phase processes
+A phase publishes an output by renaming it into place once it is complete, and
+the next phase claims it by renaming it into a `.claimed` subdirectory. Renames
+within a directory tree are atomic, so exactly one consumer wins each file even
+when consumers run on different machines against shared storage.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+CLAIM_DIR_NAME = ".claimed"
+FAILED_DIR_NAME = ".failed"
+ATTEMPTS_SUFFIX = ".attempts"
+PARTIAL_SUFFIX = ".partial"
+
+def partial_path(path: Path) -> Path:
+    """Where an output is written before it is published"""
+    return path.with_name(path.name + PARTIAL_SUFFIX)
+
+def publish(partial: Path, final: Path):
+    """Atomically make a fully written output visible to the next phase"""
+    os.replace(partial, final)
+
+def completion_marker(directory: Path, phase: int) -> Path:
+    return directory / f"_PHASE{phase}_COMPLETE"
+
+def mark_phase_complete(directory: Path, phase: int):
+    """Tell downstream consumers that no more outputs of this phase will appear"""
+    completion_marker(directory, phase).touch()
+
+def is_phase_complete(directory: Path, phase: int) -> bool:
+    return completion_marker(directory, phase).exists()
+
+class RenameClaimer:
+    """Claims published files from a directory by renaming them into its .claimed subdirectory
+
+    Each claim counts as an attempt (in a `<name>.attempts` file next to the claim, shared by
+    all consumers); a file that fails or crashes its consumer max_attempts times is parked in
+    .failed instead of being claimed again.
+    """
+
+    def __init__(self, directory: Path, pattern: str, claim_timeout_seconds: float = 1800.0,
+                 max_attempts: int = 3):
+        self.directory = directory
+        self.pattern = pattern
+        self.claim_timeout_seconds = claim_timeout_seconds
+        self.max_attempts = max_attempts
+        self.claim_dir = directory / CLAIM_DIR_NAME
+        self.claim_dir.mkdir(exist_ok=True)
+        self.failed_dir = directory / FAILED_DIR_NAME
+
+    def claim_next(self) -> Optional[Path]:
+        """Claim the oldest-named available file, or return None when there is none"""
+        for candidate in sorted(self.directory.glob(self.pattern)):
+            target = self.claim_dir / candidate.name
+            try:
+                # Fresh mtime first, so other consumers never see the claim as stale
+                os.utime(candidate)
+                os.rename(candidate, target)
+            except FileNotFoundError:
+                # Another consumer won this file
+                continue
+            os.utime(target)
+            if self._count_attempt(target) > self.max_attempts:
+                # Crashed its consumers too often (a failure would have parked it already)
+                self.park(target)
+                continue
+            return target
+        return None
+
+    def _attempts_path(self, claimed: Path) -> Path:
+        return self.claim_dir / (claimed.name + ATTEMPTS_SUFFIX)
+
+    def _count_attempt(self, claimed: Path) -> int:
+        """Record one more claim of a file and return its number (only the claim holder writes the count)"""
+        attempts_path = self._attempts_path(claimed)
+        try:
+            attempts = int(attempts_path.read_text()) + 1
+        except (FileNotFoundError, ValueError):
+            attempts = 1
+        attempts_path.write_text(str(attempts))
+        return attempts
+
+    def attempts(self, claimed: Path) -> int:
+        try:
+            return int(self._attempts_path(claimed).read_text())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def finish(self, claimed: Path):
+        """Forget the attempts of a claim that was consumed"""
+        self._attempts_path(claimed).unlink(missing_ok=True)
+
+    def park(self, claimed: Path):
+        """Move a claimed file that keeps failing to the .failed subdirectory, out of the hand-off"""
+        self.failed_dir.mkdir(exist_ok=True)
+        try:
+            os.rename(claimed, self.failed_dir / claimed.name)
+        except FileNotFoundError:
+            return
+        logger.error(f"Giving up on {claimed.name} after {self.max_attempts} attempts; moved to {self.failed_dir}")
+        self.finish(claimed)
+
+    def release_failed(self, claimed: Path):
+        """After a failed attempt: hand the file back for another one, or park it once its attempts are used up"""
+        if self.attempts(claimed) >= self.max_attempts:
+            self.park(claimed)
+        else:
+            logger.warning(f"Releasing {claimed.name} after failed attempt {self.attempts(claimed)}/{self.max_attempts}")
+            self.release(claimed)
+
+    def release(self, claimed: Path):
+        """Hand a claimed file back, e.g. after a recoverable failure"""
+        try:
+            os.rename(claimed, self.directory / claimed.name)
+        except FileNotFoundError:
+            pass
+
+    def release_stale(self) -> int:
+        """Return claims whose heartbeat stopped (crashed consumers) to the directory"""
+        released = 0
+        now = time.time()
+        for claimed in self.claim_dir.glob(self.pattern):
+            try:
+                if now - claimed.stat().st_mtime < self.claim_timeout_seconds:
+                    continue
+                os.rename(claimed, self.directory / claimed.name)
+            except FileNotFoundError:
+                continue
+            logger.warning(f"Released stale claim on {claimed.name}")
+            released += 1
+        return released
+
+    def in_flight(self) -> int:
+        """Files currently claimed by any consumer"""
+        return sum(1 for _ in self.claim_dir.glob(self.pattern))
+
+    @contextmanager
+    def heartbeat(self, claimed: Path):
+        """Keep a claim fresh while it is processed (the file may be moved away meanwhile)"""
+        stop = threading.Event()
+
+        def touch():
+            while not stop.wait(self.claim_timeout_seconds / 3):
+                try:
+                    os.utime(claimed)
+                except FileNotFoundError:
+                    return
+
+        thread = threading.Thread(target=touch, name="claim-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
@@ -0,0 +1,230 @@
+"""
+Index-driven targeted fetch
+Looks up the records of a WARC in a local URL index (CommonCrawl CDX/CDXJ files or
+cc-index Parquet) whose URL matches a Phase 1 URL pattern, and fetches only those
+records with HTTP Range requests, coalescing nearby ranges. The fetched records are
+written as a small candidate WARC that Phase 1 reads like any other, so Phase 1 never
+touches non-candidate bytes. Pages recognizable only by their content are not fetched.
+WET input uses the same fetch for the full records of its Phase 2 survivors, located
+one URL at a time through a CDX server.
+"""
+
+import gzip
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .metrics import BYTES, ERRORS, STAGE_SECONDS
+from .config import INDEX_RANGE_MAX_GAP_BYTES, INDEX_RANGE_MAX_BYTES, REQUESTS_PER_SECOND
+
+logger = logging.getLogger(__name__)
+
+# cc-index table columns (https://commoncrawl.org/columnar-index)
+PARQUET_COLUMNS = ['url', 'warc_filename', 'warc_record_offset', 'warc_record_length', 'fetch_status']
+
+@dataclass
+class IndexEntry:
+    """Location of one capture: its gzip member in a WARC file"""
+    url: str
+    filename: str
+    offset: int
+    length: int
+
+@dataclass
+class RangeRequest:
+    """One HTTP Range request covering one or more neighbouring records"""
+    filename: str
+    start: int
+    end: int  # inclusive, as in the Range header
+    entries: List[IndexEntry] = field(default_factory=list)
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+def combined_url_regex(url_patterns: List[re.Pattern]) -> str:
+    """One case-insensitive alternation of compiled Phase 1 URL patterns"""
+    return "|".join(f"(?:{pattern.pattern})" for pattern in url_patterns)
+
+def coalesce_ranges(entries: List[IndexEntry], max_gap: int = INDEX_RANGE_MAX_GAP_BYTES,
+                    max_bytes: int = INDEX_RANGE_MAX_BYTES) -> List[RangeRequest]:
+    """Merge records of the same file that are at most max_gap bytes apart, up to max_bytes per request"""
+    requests = []
+    unique = {(entry.filename, entry.offset): entry for entry in entries}
+    for entry in sorted(unique.values(), key=lambda entry: (entry.filename, entry.offset)):
+        end = entry.offset + entry.length - 1
+        last = requests[-1] if requests else None
+        if (last and last.filename == entry.filename and entry.offset - last.end - 1 <= max_gap
+                and end - last.start + 1 <= max_bytes):
+            last.end = max(last.end, end)
+            last.entries.append(entry)
+        else:
+            requests.append(RangeRequest(entry.filename, entry.offset, end, [entry]))
+    return requests
+
+class UrlIndex:
+    """Phase 1 URL-pattern matches of a local CDX(J) or cc-index Parquet index, by WARC file name"""
+
+    def __init__(self, index_path: str, url_patterns: List[re.Pattern]):
+        self.index_path = Path(index_path)
+        self.url_regex = combined_url_regex(url_patterns)
+        self._cdx_entries: Optional[Dict[str, List[IndexEntry]]] = None
+
+    @property
+    def is_parquet(self) -> bool:
+        return self.index_path.is_dir() or self.index_path.suffix == '.parquet'
+
+    def entries_for(self, warc_path: str) -> List[IndexEntry]:
+        """Candidate records of one WARC (matched on file name, so local and crawl-relative paths both work)"""
+        if self.is_parquet:
+            return self._parquet_entries(Path(warc_path).name)
+        if self._cdx_entries is None:
+            self._cdx_entries = self._load_cdx()
+        return self._cdx_entries.get(Path(warc_path).name, [])
+
+    def _load_cdx(self) -> Dict[str, List[IndexEntry]]:
+        """
+        One pass over CDX/CDXJ lines (`<surt> <timestamp> {json}`, optionally gzipped);
+        CDX is sorted by URL, not by file, so all matches are kept grouped by file name
+        """
+        pattern = re.compile(self.url_regex, re.IGNORECASE)
+        paths = sorted(self.index_path.glob("*.cdx*")) if self.index_path.is_dir() else [self.index_path]
+        entries: Dict[str, List[IndexEntry]] = {}
+        for path in paths:
+            opener = gzip.open if path.suffix == '.gz' else open
+            with opener(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split(' ', 2)
+                    if len(parts) < 3:
+                        continue
+                    fields = json.loads(parts[2])
+                    if fields.get('status', '200') != '200' or not pattern.search(fields['url']):
+                        continue
+                    entry = IndexEntry(fields['url'], fields['filename'], int(fields['offset']), int(fields['length']))
+                    entries.setdefault(Path(entry.filename).name, []).append(entry)
+        logger.info(f"URL index {self.index_path}: {sum(len(v) for v in entries.values()):,} candidate records "
+                    f"in {len(entries):,} WARC files")
+        return entries
+
+    def _parquet_entries(self, warc_name: str) -> List[IndexEntry]:
+        """Filtered scan of the cc-index table: one WARC file, HTTP 200, URL matching a Phase 1 pattern"""
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        filename = ds.field('warc_filename')
+        dataset = ds.dataset(str(self.index_path), format='parquet')
+        table = dataset.to_table(
+            columns=PARQUET_COLUMNS,
+            filter=((filename == warc_name) | pc.ends_with(filename, f"/{warc_name}")) & (ds.field('fetch_status') == 200)
+        )
+        table = table.filter(pc.match_substring_regex(table['url'], self.url_regex, ignore_case=True))
+        return [IndexEntry(row['url'], row['warc_filename'], row['warc_record_offset'], row['warc_record_length'])
+                for row in table.to_pylist()]
+
+class CdxServerIndex:
+    """
+    Per-URL lookups in a CDX server (CommonCrawl's index.commoncrawl.org or a local pywb)
+    for the captures of a few documents, such as the Phase 2 survivors of a WET file
+    """
+
+    def __init__(self, base_url: str, crawl_name: str, timeout: float = 60.0,
+                 requests_per_second: float = REQUESTS_PER_SECOND):
+        self.endpoint = f"{base_url.rstrip('/')}/{crawl_name}-index"
+        self.timeout = timeout
+        self.min_interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._session = None
+        self._last_request = 0.0
+        self._lock = threading.Lock()
+
+    def entries_for_urls(self, warc_name: str, urls: Iterable[str]) -> List[IndexEntry]:
+        """Response records of the given URLs in one WARC (matched on file name); stops at the first server error"""
+        import requests
+        if self._session is None:
+            self._session = requests.Session()
+
+        start_time = time.perf_counter()
+        entries = []
+        for url in urls:
+            # The public index is shared and rate limited
+            with self._lock:
+                wait = self._last_request + self.min_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                self._last_request = time.monotonic()
+            try:
+                response = self._session.get(self.endpoint, params={'url': url, 'output': 'json'},
+                                             timeout=self.timeout)
+                if response.status_code == 404:
+                    # No captures of this URL
+                    continue
+                response.raise_for_status()
+            except requests.RequestException as e:
+                logger.error(f"CDX lookup of {url} at {self.endpoint} failed: {e}")
+                ERRORS.labels(stage='index_fetch').inc()
+                break
+            for line in response.text.splitlines():
+                fields = json.loads(line)
+                if Path(fields['filename']).name == warc_name and fields.get('status', '200') == '200':
+                    entries.append(IndexEntry(fields['url'], fields['filename'], int(fields['offset']),
+                                              int(fields['length'])))
+        STAGE_SECONDS.labels(stage='index_lookup').observe(time.perf_counter() - start_time)
+        return entries
+
+class RangeFetcher:
+    """Fetches index entries from `<base_url>/<filename>` with coalesced HTTP Range requests"""
+
+    def __init__(self, base_url: str, max_gap: int = INDEX_RANGE_MAX_GAP_BYTES,
+                 max_bytes: int = INDEX_RANGE_MAX_BYTES, timeout: float = 60.0):
+        self.base_url = base_url.rstrip('/')
+        self.max_gap = max_gap
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._session = None
+
+    def _get(self, request: RangeRequest) -> bytes:
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        response = self._session.get(f"{self.base_url}/{request.filename}", timeout=self.timeout,
+                                     headers={'Range': f"bytes={request.start}-{request.end}"})
+        response.raise_for_status()
+        if response.status_code == 206:
+            return response.content
+        # A server without Range support sends the whole file
+        logger.warning(f"{request.filename}: server ignored the Range header")
+        return response.content[request.start:request.end + 1]
+
+    def fetch_to_file(self, entries: List[IndexEntry], output_path: Path) -> Dict:
+        """Write the records, in file order, as one WARC (each record is its own gzip member)"""
+        start_time = time.perf_counter()
+        range_requests = coalesce_ranges(entries, self.max_gap, self.max_bytes)
+        stats = {'records': 0, 'requests': len(range_requests), 'bytes_fetched': 0, 'failed_requests': 0}
+
+        partial = output_path.with_name(output_path.name + ".partial")
+        with open(partial, 'wb') as f:
+            for request in range_requests:
+                try:
+                    data = self._get(request)
+                except Exception as e:
+                    logger.error(f"Range request {request.filename} {request.start}-{request.end} failed: {e}")
+                    ERRORS.labels(stage='index_fetch').inc()
+                    stats['failed_requests'] += 1
+                    continue
+                stats['bytes_fetched'] += len(data)
+                BYTES.labels(stage='index_fetch').inc(len(data))
+                # Keep the records, drop the gap bytes between them
+                for entry in request.entries:
+                    begin = entry.offset - request.start
+                    f.write(data[begin:begin + entry.length])
+                    stats['records'] += 1
+        partial.replace(output_path)
+
+        STAGE_SECONDS.labels(stage='index_fetch').observe(time.perf_counter() - start_time)
+        logger.info(f"Fetched {stats['records']} candidate records in {stats['requests']} range requests "
+                    f"({stats['bytes_fetched'] / 1e6:.2f} MB) to {output_path}")
+        return stats
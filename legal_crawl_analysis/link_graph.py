@@ -0,0 +1,246 @@
+"""
+Link-graph discovery of legal pages
+Pages link to their site's legal pages with anchor text like "Privacy", "Impressum" or
+"Conditions générales", which names a legal page more reliably than keywords in its
+body. Links are read from CommonCrawl WAT metadata or from the head and tail (nav and
+footer) of each page's HTML, and collected as a per-host set of legal target URLs with
+the anchor type, linking page count and anchor texts of each target.
+"""
+
+import gzip
+import html
+import json
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from .domains import registered_domain
+from .config import LINK_SCAN_BYTES, LINK_MAX_ANCHOR_CHARS, LINK_MAX_ANCHORS_PER_TARGET
+
+logger = logging.getLogger(__name__)
+
+# Anchor texts of legal links by Phase 2 document type, most specific types first
+LEGAL_ANCHOR_PATTERNS = {
+    'cookies': [
+        r'\bcookies?\b'
+    ],
+    'privacy': [
+        r'\bprivacy\b', r'datenschutz', r'confidentialit[ée]', r'protection des donn[ée]es',
+        r'privacidad', r'privacidade', r'riservatezza', r'privacybeleid', r'integritetspolicy'
+    ],
+    'legal': [
+        r'impressum', r'\bimprint\b', r'legal notice', r'mentions l[ée]gales', r'aviso legal',
+        r'note legali', r'\bdisclaimer\b', r'haftungsausschluss', r'colofon'
+    ],
+    'terms': [
+        r'\bterms\b', r'conditions', r'\bcg[uv]\b', r'\bagb\b', r'nutzungsbedingungen',
+        r't[ée]rminos', r'condiciones', r'termini', r'user agreement', r'\btos\b'
+    ],
+    'copyright': [
+        r'copyright', r'\bdmca\b', r'intellectual property', r'urheberrecht', r"droits d'auteur"
+    ],
+}
+COMPILED_ANCHOR_PATTERNS = {
+    doc_type: re.compile("|".join(patterns), re.IGNORECASE)
+    for doc_type, patterns in LEGAL_ANCHOR_PATTERNS.items()
+}
+
+ANCHOR_RE = re.compile(
+    r'<a\b[^>]*?\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))[^>]*>(.*?)</a\s*>',
+    re.IGNORECASE | re.DOTALL
+)
+TAG_RE = re.compile(r'<[^>]+>')
+WHITESPACE_RE = re.compile(r'\s+')
+
+@dataclass
+class LegalLink:
+    """A link whose anchor text names a legal page"""
+    source_url: str
+    target_url: str
+    anchor: str
+    doc_type: str
+
+@dataclass
+class LinkTarget:
+    """A legal page as seen from the pages of its site that link to it"""
+    doc_type: str
+    sources: int = 0
+    anchors: Counter = field(default_factory=Counter)
+
+def normalize_url(url: str) -> str:
+    """Comparison key of a URL: lower-case scheme and host, no fragment, no trailing slash"""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+def url_host(url: str) -> str:
+    try:
+        return (urlsplit(url).hostname or '').rstrip('.')
+    except ValueError:
+        return ''
+
+def anchor_document_type(anchor: str) -> Optional[str]:
+    """Document type named by a short anchor text; long anchors are prose, not navigation"""
+    if not anchor or len(anchor) > LINK_MAX_ANCHOR_CHARS:
+        return None
+    for doc_type, pattern in COMPILED_ANCHOR_PATTERNS.items():
+        if pattern.search(anchor):
+            return doc_type
+    return None
+
+def clean_anchor(anchor_html: str) -> str:
+    return WHITESPACE_RE.sub(' ', html.unescape(TAG_RE.sub(' ', anchor_html))).strip()
+
+def html_links(html_content: str) -> Iterator[Tuple[str, str]]:
+    """(href, anchor text) of every <a href> in an HTML fragment"""
+    for match in ANCHOR_RE.finditer(html_content):
+        href = html.unescape(match.group(1) or match.group(2) or match.group(3) or '').strip()
+        yield href, clean_anchor(match.group(4))
+
+def legal_link(source_url: str, href: str, anchor: str) -> Optional[LegalLink]:
+    """The link as a LegalLink if its anchor names a legal page on the source's own site"""
+    doc_type = anchor_document_type(anchor)
+    if doc_type is None or not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:')):
+        return None
+    target_url = urljoin(source_url, href)
+    # Third-party policies (a provider's privacy page linked from a consent banner) are not the site's own
+    if registered_domain(target_url) != registered_domain(source_url):
+        return None
+    return LegalLink(source_url, target_url, anchor, doc_type)
+
+def extract_legal_links(page_url: str, html_content: str, scan_chars: int = LINK_SCAN_BYTES) -> List[LegalLink]:
+    """Legal links in the head and tail of a page, where sites put navigation and footers"""
+    if len(html_content) > 2 * scan_chars:
+        chunks = (html_content[:scan_chars], html_content[-scan_chars:])
+    else:
+        chunks = (html_content,)
+    links = []
+    for chunk in chunks:
+        for href, anchor in html_links(chunk):
+            link = legal_link(page_url, href, anchor)
+            if link:
+                links.append(link)
+    return links
+
+def iter_wat_legal_links(wat_file: Path) -> Iterator[Tuple[str, List[LegalLink]]]:
+    """(page URL, legal links) of each response in a CommonCrawl WAT file"""
+    from warcio.archiveiterator import ArchiveIterator
+
+    with gzip.open(wat_file, 'rb') as f:
+        for record in ArchiveIterator(f):
+            if record.rec_type != 'metadata':
+                continue
+            try:
+                envelope = json.loads(record.content_stream().read())['Envelope']
+            except (ValueError, KeyError):
+                continue
+            if envelope.get('WARC-Header-Metadata', {}).get('WARC-Type') != 'response':
+                continue
+            page_url = envelope['WARC-Header-Metadata'].get('WARC-Target-URI')
+            html_metadata = (envelope.get('Payload-Metadata', {}).get('HTTP-Response-Metadata', {})
+                             .get('HTML-Metadata', {}))
+            if not page_url:
+                continue
+            links = []
+            for entry in html_metadata.get('Links', []):
+                if entry.get('path') != 'A@/href':
+                    continue
+                link = legal_link(page_url, entry.get('url', ''), WHITESPACE_RE.sub(' ', entry.get('text', '')).strip())
+                if link:
+                    links.append(link)
+            yield page_url, links
+
+class LinkGraph:
+    """Legal link targets of one WARC, per host"""
+
+    def __init__(self):
+        self.targets: Dict[str, Dict[str, LinkTarget]] = {}
+        self.pages_scanned = 0
+        self.legal_links = 0
+
+    def add_links(self, links: List[LegalLink]):
+        """Add the legal links of one page; a page counts once per target however often it links"""
+        self.pages_scanned += 1
+        seen = set()
+        for link in links:
+            self.legal_links += 1
+            key = normalize_url(link.target_url)
+            host_targets = self.targets.setdefault(url_host(key), {})
+            target = host_targets.setdefault(key, LinkTarget(link.doc_type))
+            if key not in seen:
+                target.sources += 1
+                seen.add(key)
+            if link.anchor in target.anchors or len(target.anchors) < LINK_MAX_ANCHORS_PER_TARGET:
+                target.anchors[link.anchor] += 1
+
+    def add_page(self, page_url: str, html_content: str):
+        self.add_links(extract_legal_links(page_url, html_content))
+
+    @classmethod
+    def from_wat(cls, wat_file: Path) -> 'LinkGraph':
+        graph = cls()
+        for _, links in iter_wat_legal_links(wat_file):
+            graph.add_links(links)
+        logger.info(f"Link graph from {wat_file.name}: {graph.target_count():,} legal targets on "
+                    f"{len(graph.targets):,} hosts from {graph.pages_scanned:,} pages")
+        return graph
+
+    def target(self, url: str) -> Optional[LinkTarget]:
+        key = normalize_url(url)
+        return self.targets.get(url_host(key), {}).get(key)
+
+    def classify(self, url: str) -> Optional[bool]:
+        """True for a link target, False for another page of a host with targets, None for hosts without any"""
+        key = normalize_url(url)
+        host_targets = self.targets.get(url_host(key))
+        if not host_targets:
+            return None
+        return key in host_targets
+
+    def target_count(self) -> int:
+        return sum(len(host_targets) for host_targets in self.targets.values())
+
+    def document_fields(self, url: str) -> Dict:
+        """Link-graph columns of a Phase 2 metadata row"""
+        target = self.target(url)
+        return {
+            'link_target': target is not None,
+            'link_doc_type': target.doc_type if target else None,
+            'link_sources': target.sources if target else 0,
+            'link_anchors': json.dumps([anchor for anchor, _ in target.anchors.most_common()] if target else [],
+                                       ensure_ascii=False)
+        }
+
+    def save(self, path: Path):
+        data = {
+            'pages_scanned': self.pages_scanned,
+            'legal_links': self.legal_links,
+            'hosts': {
+                host: {url: {'doc_type': target.doc_type, 'sources': target.sources, 'anchors': dict(target.anchors)}
+                       for url, target in host_targets.items()}
+                for host, host_targets in self.targets.items()
+            }
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: Path) -> 'LinkGraph':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        graph = cls()
+        graph.pages_scanned = data.get('pages_scanned', 0)
+        graph.legal_links = data.get('legal_links', 0)
+        graph.targets = {
+            host: {url: LinkTarget(target['doc_type'], target['sources'], Counter(target['anchors']))
+                   for url, target in host_targets.items()}
+            for host, host_targets in data.get('hosts', {}).items()
+        }
+        return graph
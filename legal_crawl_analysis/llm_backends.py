@@ -0,0 +1,317 @@
+"""
+Pluggable LLM backends for Phase 3 analysis
+- OpenAIBackend: the hosted OpenAI API
+- OpenAICompatibleBackend: any server speaking the OpenAI chat API (vLLM, llama.cpp, Ollama, ...)
+- SimulatedBackend: deterministic offline stand-in with configurable latency,
+  errors, 429s and token accounting for load testing without network access
+"""
+
+import json
+import logging
+import random
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Protocol
+
+logger = logging.getLogger(__name__)
+
+class BackendError(Exception):
+    """A backend request failed"""
+
+class RateLimitError(BackendError):
+    """The backend rejected the request with HTTP 429"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+@dataclass
+class CompletionResult:
+    """Backend-neutral result of a single chat completion"""
+    content: str
+    finish_reason: str
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    latency_seconds: float
+    model: str = ''
+
+class LLMBackend(Protocol):
+    """Interface every Phase 3 backend implements"""
+    name: str
+
+    def complete(self, messages: List[Dict], model: str, max_tokens: int, temperature: float,
+                 response_format: Optional[Dict] = None) -> CompletionResult:
+        ...
+
+_encodings: Dict[str, object] = {}
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Count tokens with tiktoken when available, otherwise estimate ~4 chars per token"""
+    try:
+        import tiktoken
+    except ImportError:
+        return max(1, len(text) // 4)
+
+    encoding = _encodings.get(model)
+    if encoding is None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # Encoding files may not be available offline
+            return max(1, len(text) // 4)
+        _encodings[model] = encoding
+    return len(encoding.encode(text, disallowed_special=()))
+
+class OpenAIBackend:
+    """Hosted OpenAI chat completions"""
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: Optional[float] = None, supports_response_format: bool = True):
+        import openai
+        self._openai = openai
+        kwargs = {'api_key': api_key, 'base_url': base_url}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        self.client = openai.OpenAI(**kwargs)
+        self.supports_response_format = supports_response_format
+
+    def complete(self, messages: List[Dict], model: str, max_tokens: int, temperature: float,
+                 response_format: Optional[Dict] = None) -> CompletionResult:
+        request = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if response_format and self.supports_response_format:
+            request["response_format"] = response_format
+
+        start = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(**request)
+        except self._openai.RateLimitError as e:
+            retry_after = None
+            headers = getattr(getattr(e, 'response', None), 'headers', None) or {}
+            if headers.get('retry-after'):
+                try:
+                    retry_after = float(headers['retry-after'])
+                except ValueError:
+                    pass
+            raise RateLimitError(str(e), retry_after) from e
+        except self._openai.OpenAIError as e:
+            raise BackendError(str(e)) from e
+
+        choice = response.choices[0]
+        usage = response.usage
+        return CompletionResult(
+            content=choice.message.content or "",
+            finish_reason=choice.finish_reason or "stop",
+            prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+            completion_tokens=getattr(usage, 'completion_tokens', 0) or 0,
+            total_tokens=getattr(usage, 'total_tokens', 0) or 0,
+            latency_seconds=time.perf_counter() - start,
+            model=getattr(response, 'model', model) or model
+        )
+
+class OpenAICompatibleBackend(OpenAIBackend):
+    """Any local or self-hosted server exposing the OpenAI chat completions API"""
+    name = "openai-compatible"
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: Optional[float] = None,
+                 supports_response_format: bool = False):
+        # Local servers usually ignore the key but the client requires one
+        super().__init__(api_key=api_key or "not-needed", base_url=base_url, timeout=timeout,
+                         supports_response_format=supports_response_format)
+
+class SimulatedBackend:
+    """
+    Deterministic offline backend. Responses are derived from the document text,
+    so the same input and seed always produce the same analysis, tokens and failures.
+    """
+    name = "simulated"
+
+    # Prompts whose failed attempts are remembered (for fresh draws on retry); oldest forgotten first
+    MAX_TRACKED_PROMPTS = 10000
+
+    _COPYRIGHT_RE = re.compile(r'(copyright|©|\(c\)|all rights reserved)[^.\n]{0,120}', re.IGNORECASE)
+    _LICENSE_RE = re.compile(r'(you grant|grant us|license to use)[^.\n]{0,120}', re.IGNORECASE)
+    _DMCA_RE = re.compile(r'(dmca|infring)[^.\n]{0,120}', re.IGNORECASE)
+    _JURISDICTION_RE = re.compile(r'(governing law|jurisdiction)[^.\n]{0,120}', re.IGNORECASE)
+    _LIABILITY_RE = re.compile(r'(limitation of liability|indemnif)[^.\n]{0,120}', re.IGNORECASE)
+
+    def __init__(self, latency_seconds: float = 0.5, latency_jitter_seconds: float = 0.1,
+                 output_tokens_per_second: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, rate_limit_rpm: Optional[int] = None,
+                 rate_limit_retry_after: float = 1.0, truncation_rate: float = 0.0,
+                 seed: int = 0, sleep: bool = True):
+        self.latency_seconds = latency_seconds
+        self.latency_jitter_seconds = latency_jitter_seconds
+        self.output_tokens_per_second = output_tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rate_limit_rpm = rate_limit_rpm
+        self.rate_limit_retry_after = rate_limit_retry_after
+        self.truncation_rate = truncation_rate
+        self.seed = seed
+        self.sleep = sleep
+
+        self._lock = threading.Lock()
+        self._request_times: deque = deque()
+        self._attempts: Dict[int, int] = {}
+
+        # Token and failure accounting
+        self.calls = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def complete(self, messages: List[Dict], model: str, max_tokens: int, temperature: float,
+                 response_format: Optional[Dict] = None) -> CompletionResult:
+        prompt = "\n".join(m.get('content', '') for m in messages)
+        prompt_hash = zlib.crc32(prompt.encode('utf-8'))
+
+        with self._lock:
+            self.calls += 1
+            # RNG keyed on (prompt, attempt) keeps results independent of call order
+            # while letting retries of the same prompt see a fresh draw
+            attempt = self._attempts.pop(prompt_hash, 0)
+            self._attempts[prompt_hash] = attempt + 1
+            if len(self._attempts) > self.MAX_TRACKED_PROMPTS:
+                del self._attempts[next(iter(self._attempts))]
+            rng = random.Random(f"{self.seed}:{prompt_hash}:{attempt}")
+            self._check_rate_limit(rng)
+
+        latency = self.latency_seconds + rng.uniform(-1, 1) * self.latency_jitter_seconds
+
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            self._wait(latency)
+            raise BackendError("Simulated server error")
+
+        compact = self._wants_compact(messages, response_format)
+        # The document is the first user message; a retry appends its instruction after it
+        document = next((m.get('content', '') for m in messages if m.get('role') == 'user'), '')
+        content = json.dumps(self._build_analysis(document, compact))
+
+        prompt_tokens = count_tokens(prompt, model)
+        completion_tokens = count_tokens(content, model)
+        finish_reason = "stop"
+
+        if completion_tokens > max_tokens or rng.random() < self.truncation_rate:
+            keep = min(max_tokens, completion_tokens // 2)
+            content = content[:keep * 4]
+            completion_tokens = keep
+            finish_reason = "length"
+
+        if self.output_tokens_per_second > 0:
+            latency += completion_tokens / self.output_tokens_per_second
+        self._wait(latency)
+
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            # Answered: no retry of this prompt follows
+            self._attempts.pop(prompt_hash, None)
+
+        return CompletionResult(
+            content=content,
+            finish_reason=finish_reason,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            latency_seconds=max(latency, 0.0),
+            model=model
+        )
+
+    def _check_rate_limit(self, rng: random.Random):
+        """Raise RateLimitError for random 429s or when the requests-per-minute window is full"""
+        now = time.monotonic()
+        if self.rate_limit_rpm:
+            while self._request_times and now - self._request_times[0] > 60:
+                self._request_times.popleft()
+            if len(self._request_times) >= self.rate_limit_rpm:
+                self.rate_limited += 1
+                raise RateLimitError("Simulated 429: requests per minute exceeded",
+                                     retry_after=60 - (now - self._request_times[0]))
+            self._request_times.append(now)
+
+        if rng.random() < self.rate_limit_rate:
+            self.rate_limited += 1
+            raise RateLimitError("Simulated 429", retry_after=self.rate_limit_retry_after)
+
+    def _wait(self, seconds: float):
+        if self.sleep and seconds > 0:
+            time.sleep(seconds)
+
+    @staticmethod
+    def _wants_compact(messages: List[Dict], response_format: Optional[Dict]) -> bool:
+        if response_format and response_format.get('type') == 'json_schema':
+            return response_format['json_schema'].get('name', '').endswith('compact')
+        return bool(messages) and '{"c":' in messages[0].get('content', '')
+
+    def _build_analysis(self, text: str, compact: bool) -> Dict:
+        """Rule-based analysis so simulated output is plausible and reproducible"""
+        clauses = []
+        for pattern, code, category in [
+            (self._COPYRIGHT_RE, 'RS', 'COPYRIGHT_RETAINED_SITE'),
+            (self._LICENSE_RE, 'LS', 'COPYRIGHT_LICENSED_TO_SITE'),
+            (self._DMCA_RE, 'ND', 'HARD_NEGATIVE_DMCA'),
+        ]:
+            for match in pattern.finditer(text):
+                quote = match.group(0).strip()[:150]
+                clauses.append((quote, code, category))
+        clauses = clauses[:5]
+
+        jurisdiction = [m.group(0).strip()[:150] for m in self._JURISDICTION_RE.finditer(text)][:3]
+        liability = [m.group(0).strip()[:150] for m in self._LIABILITY_RE.finditer(text)][:3]
+
+        if compact:
+            return {
+                "c": [{"t": quote, "k": code, "p": 0.8} for quote, code, _ in clauses],
+                "a": {"l": "L0", "i": ["standard HTML"], "p": 0.8},
+                "tpm": [], "lia": liability, "jur": jurisdiction, "dl": []
+            }
+        return {
+            "copyright_clauses": [
+                {"text": quote, "category": category, "confidence": 0.8, "context": quote}
+                for quote, _, category in clauses
+            ],
+            "access_level": {"level": "L0_OPEN_ACCESS", "indicators": ["standard HTML"], "confidence": 0.8},
+            "technical_protection_measures": [],
+            "liability_clauses": liability,
+            "jurisdiction_clauses": jurisdiction,
+            "data_licensing": []
+        }
+
+    def get_stats(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'rate_limited': self.rate_limited,
+            'errors': self.errors,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.prompt_tokens + self.completion_tokens
+        }
+
+def create_backend(name: str, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                   **kwargs) -> LLMBackend:
+    """Build a backend by name: 'openai', 'openai-compatible' or 'simulated'"""
+    if name == "openai":
+        return OpenAIBackend(api_key=api_key, base_url=base_url)
+    if name == "openai-compatible":
+        if not base_url:
+            raise ValueError("The openai-compatible backend requires a base URL")
+        return OpenAICompatibleBackend(base_url=base_url, api_key=api_key, **kwargs)
+    if name == "simulated":
+        return SimulatedBackend(**kwargs)
+    raise ValueError(f"Unknown LLM backend: {name}")
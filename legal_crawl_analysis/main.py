@@ -3,12 +3,70 @@ Main entry point for 3-Phase Legal Crawl Analysis
 """
 
 import argparse
+import json
 import logging
 import sys
 from pathlib import Path
 
-from .analyzer import ThreePhaseLegalAnalyzer
-from .config import OPENAI_API_KEY
+from .fetcher import CommonCrawlFetcher
+from .work_queue import WorkQueue, default_worker_id
+from .metrics import MetricsTextfileExporter, MetricsHTTPServer
+from .profiling import PhaseProfiler
+from .pattern_profiler import PatternStats
+from .llm_backends import create_backend
+from .router import build_default_router
+from .scheduler import Phase3Scheduler, TokenBudget, PRIORITY_FUNCTIONS
+from .config import (
+    OPENAI_API_KEY,
+    GPT_MODEL,
+    LLM_BACKEND,
+    LLM_BASE_URL,
+    SIMULATED_LATENCY_SECONDS,
+    SIMULATED_LATENCY_JITTER_SECONDS,
+    SIMULATED_ERROR_RATE,
+    SIMULATED_RATE_LIMIT_RATE,
+    SIMULATED_RATE_LIMIT_RPM,
+    SIMULATED_SEED,
+    MAX_TOKENS_PER_ANALYSIS,
+    MODEL_ROUTING_ENABLED,
+    FAST_GPT_MODEL,
+    FAST_MAX_TOKENS_PER_ANALYSIS,
+    ROUTER_LONG_DOCUMENT_TOKENS,
+    GPT_COST_PER_TOKEN_USD,
+    PHASE3_PRIORITY,
+    DOMAIN_NOVELTY_DECAY,
+    PHASE3_DEFERRED_FILE,
+    PIPELINE_MODE,
+    INPUT_FORMAT,
+    URL_INDEX_PATH,
+    INDEX_FETCH_BASE_URL,
+    CDX_SERVER_URL,
+    LINK_DISCOVERY,
+    LINK_SOURCE,
+    SAMPLE_RECORD_FRACTION,
+    SAMPLE_SEED,
+    SEGMENT_OUTPUTS,
+    SEGMENT_WARC_BYTES,
+    SEGMENT_PARQUET_BYTES,
+    DOMAIN_QUOTA_PHASE2,
+    DOMAIN_QUOTA_PHASE3,
+    STREAMING_QUEUE_SIZE,
+    ADAPTIVE_CONCURRENCY,
+    GPT_MAX_CONCURRENCY,
+    METRICS_FILE,
+    METRICS_PORT,
+    METRICS_EXPORT_SECONDS,
+    PROFILE_MODE,
+    PROFILE_SAMPLE_INTERVAL_SECONDS,
+    PROFILE_TOP_FUNCTIONS,
+    WORK_QUEUE_PATH,
+    WORK_QUEUE_LEASE_SECONDS,
+    WORK_QUEUE_MAX_ATTEMPTS,
+    WATCH_POLL_SECONDS,
+    PRECLASSIFIER_MODEL_PATH,
+    PRECLASSIFIER_SKIP_THRESHOLD,
+    PRECLASSIFIER_MODE
+)
 
 # Configure logging
 logging.basicConfig(
@@ -23,25 +81,157 @@ logger = logging.getLogger(__name__)
 
 def main():
     """Main function to run the 3-phase legal document analysis"""
-    parser = argparse.ArgumentParser(description="3-Phase Legal Document Analysis for CommonCrawl Data")
+    # Dataset subcommands have their own arguments and need none of the pipeline
+    if len(sys.argv) > 1 and sys.argv[1] in ('consolidate', 'query'):
+        from .dataset import dataset_main
+        dataset_main(sys.argv[1], sys.argv[2:])
+        return
+    
+    parser = argparse.ArgumentParser(
+        description="3-Phase Legal Document Analysis for CommonCrawl Data",
+        epilog="Subcommands: `consolidate` writes Phase 3 results as a partitioned Parquet dataset, "
+               "`query` runs filtered aggregations over it (see `legal-crawl-analyzer query --help`)"
+    )
     parser.add_argument("--openai-api-key", help="OpenAI API key (can also be set via OPENAI_API_KEY env var)")
     parser.add_argument("--output-dir", default="analysis_output", help="Output directory")
     
     # Analysis control arguments
     parser.add_argument("--max-files", type=str, default="5", 
                        help="Number of WARC files to process ('all' for all files, or a number). Default: 5")
+    parser.add_argument("--sample", type=int, default=None, metavar="FILES",
+                       help="Run on a stratified random sample of this many WARC files (instead of --max-files) and "
+                            "report crawl-wide estimates with confidence intervals")
+    parser.add_argument("--sample-records", type=float, default=SAMPLE_RECORD_FRACTION, metavar="FRACTION",
+                       help=f"Share of each sampled WARC's records to analyze. Default: {SAMPLE_RECORD_FRACTION}")
+    parser.add_argument("--sample-seed", type=int, default=SAMPLE_SEED,
+                       help=f"Seed of the sample. Default: {SAMPLE_SEED}")
+    parser.add_argument("--sample-plan", default=None,
+                       help="Rerun the WARCs and record IDs of a saved sample_plan.json")
     parser.add_argument("--resume", action="store_true", 
                        help="Resume from where the last run left off")
     parser.add_argument("--reset-progress", action="store_true", 
                        help="Reset progress tracking and start from beginning")
-    parser.add_argument("--progress-file", default="analysis_progress.json", 
-                       help="File to track analysis progress. Default: analysis_progress.json")
+    parser.add_argument("--progress-file", default="analysis_progress.db", 
+                       help="SQLite progress store (a *.json path uses the legacy JSON tracker; a new store imports "
+                            "a JSON file of the same name). Default: analysis_progress.db")
     
     # Phase control arguments
     parser.add_argument("--phase", choices=['1', '2', '3', 'all'], default='all',
                        help="Which phase to run (1=fast detection, 2=sophisticated filtering, 3=passage extraction, all=complete pipeline)")
     parser.add_argument("--force-phase", action="store_true",
                        help="Force re-run of specified phase even if completed")
+    parser.add_argument("--watch", action="store_true",
+                       help="With --phase 2/3: keep claiming new outputs of the previous phase until it completes")
+    parser.add_argument("--poll-seconds", type=float, default=WATCH_POLL_SECONDS,
+                       help=f"Polling interval of --watch consumers. Default: {WATCH_POLL_SECONDS}")
+    parser.add_argument("--pipeline", choices=['phased', 'streaming'], default=PIPELINE_MODE,
+                       help="phased: each phase over all files in turn; streaming: all three phases in one pass per record")
+    parser.add_argument("--input-format", choices=['warc', 'wet'], default=INPUT_FORMAT,
+                       help="warc: parse HTML from full WARCs; wet: detect on CommonCrawl's WET text and pull "
+                            "full WARC records only for Phase 2 survivors")
+    parser.add_argument("--url-index", default=URL_INDEX_PATH,
+                       help="Local CDX/CDXJ or cc-index Parquet index: Phase 1 range-fetches only records whose URL "
+                            "matches a Phase 1 URL pattern instead of downloading whole WARCs")
+    parser.add_argument("--index-base-url", default=INDEX_FETCH_BASE_URL,
+                       help=f"Where index file names are range-fetched from. Default: {INDEX_FETCH_BASE_URL}")
+    parser.add_argument("--cdx-server-url", default=CDX_SERVER_URL,
+                       help="CDX server that locates the full WARC records of WET-mode Phase 2 survivors, which are "
+                            "then range-fetched from --index-base-url. An empty value keeps survivors text-only "
+                            f"unless the WARC is in the download directory. Default: {CDX_SERVER_URL}")
+    parser.add_argument("--link-discovery", choices=['prioritize', 'restrict'], default=LINK_DISCOVERY,
+                       help="Find legal pages by the anchor text of links to them (Privacy, Impressum, ...) and add "
+                            "them to Phase 1. prioritize: link targets go first under domain quotas and --priority "
+                            "links; restrict: on hosts with link targets only the targets reach Phase 2")
+    parser.add_argument("--link-source", choices=['html', 'wat'], default=LINK_SOURCE,
+                       help="Where links are read: nav and footer of each page's HTML, or CommonCrawl WAT metadata "
+                            f"(read before Phase 1, lets restrict mode skip scanning other pages). Default: {LINK_SOURCE}")
+    parser.add_argument("--segment-outputs", action="store_true", default=SEGMENT_OUTPUTS,
+                       help="Roll each finished WARC's Phase 3 outputs into large WARC and Parquet segments with a "
+                            "manifest, instead of keeping about five files per input WARC")
+    parser.add_argument("--segment-warc-mb", type=int, default=SEGMENT_WARC_BYTES // 1024 ** 2,
+                       help=f"Target size of a WARC segment in MB. Default: {SEGMENT_WARC_BYTES // 1024 ** 2}")
+    parser.add_argument("--segment-parquet-mb", type=int, default=SEGMENT_PARQUET_BYTES // 1024 ** 2,
+                       help=f"Target size of a Parquet segment in MB. Default: {SEGMENT_PARQUET_BYTES // 1024 ** 2}")
+    parser.add_argument("--streaming-queue-size", type=int, default=STREAMING_QUEUE_SIZE,
+                       help=f"Records buffered between streaming stages. Default: {STREAMING_QUEUE_SIZE}")
+    parser.add_argument("--adaptive-concurrency", action="store_true", default=ADAPTIVE_CONCURRENCY,
+                       help="Adjust in-flight GPT calls (AIMD on 429s) and streaming stage workers (queue depth, CPU) at runtime")
+    parser.add_argument("--max-gpt-concurrency", type=int, default=GPT_MAX_CONCURRENCY,
+                       help=f"Upper bound for in-flight GPT calls with --adaptive-concurrency. Default: {GPT_MAX_CONCURRENCY}")
+    
+    # Domain quota arguments
+    parser.add_argument("--domain-quota-phase2", type=int, default=DOMAIN_QUOTA_PHASE2,
+                       help="Keep at most N Phase 1 survivors per registered domain and URL-derived type for Phase 2 extraction")
+    parser.add_argument("--domain-quota-phase3", type=int, default=DOMAIN_QUOTA_PHASE3,
+                       help="Send at most N Phase 2 documents per registered domain and primary type to GPT")
+    
+    # Metrics arguments
+    parser.add_argument("--metrics-file", default=METRICS_FILE,
+                       help="Write live metrics in Prometheus text format to this file (e.g. for node_exporter)")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                       help="Serve live metrics at http://localhost:PORT/metrics")
+    
+    # Profiling arguments
+    parser.add_argument("--profile", action="store_true",
+                       help="Profile each phase; writes .pstats and flamegraph-ready .collapsed files to <crawl dir>/profiles")
+    parser.add_argument("--profile-mode", choices=['sampling', 'deterministic'], default=PROFILE_MODE,
+                       help="sampling: stack samples of all threads; deterministic: also cProfile with exact call counts")
+    parser.add_argument("--pattern-profile", action="store_true",
+                       help="Record per-pattern cost, hit rate and decisive counts of the Phase 1/2 detectors "
+                            "(<crawl dir>/pattern_profile.json; slower, every pattern is evaluated)")
+    
+    # Phase 3 pre-classifier arguments
+    parser.add_argument("--preclassifier", default=PRECLASSIFIER_MODEL_PATH,
+                       help="Pre-classifier artifact used to skip GPT on confident negatives (see train-preclassifier)")
+    parser.add_argument("--preclassifier-threshold", type=float, default=PRECLASSIFIER_SKIP_THRESHOLD,
+                       help=f"Documents scoring below this are confident negatives. Default: {PRECLASSIFIER_SKIP_THRESHOLD}")
+    parser.add_argument("--preclassifier-mode", choices=['skip', 'defer'], default=PRECLASSIFIER_MODE,
+                       help="Skip confident negatives entirely or analyze them after everything else")
+    
+    # Phase 3 LLM backend arguments
+    parser.add_argument("--llm-backend", choices=['openai', 'openai-compatible', 'simulated'], default=LLM_BACKEND,
+                       help="LLM backend for Phase 3 ('simulated' runs offline for load testing). Default: openai")
+    parser.add_argument("--llm-base-url", default=LLM_BASE_URL,
+                       help="Base URL of the server for --llm-backend openai-compatible")
+    parser.add_argument("--llm-model", default=GPT_MODEL, help=f"Model name sent to the backend. Default: {GPT_MODEL}")
+    parser.add_argument("--simulated-latency", type=float, default=SIMULATED_LATENCY_SECONDS,
+                       help="Mean latency in seconds per simulated call")
+    parser.add_argument("--simulated-error-rate", type=float, default=SIMULATED_ERROR_RATE,
+                       help="Fraction of simulated calls that fail with a server error")
+    parser.add_argument("--simulated-rate-limit-rate", type=float, default=SIMULATED_RATE_LIMIT_RATE,
+                       help="Fraction of simulated calls rejected with a 429")
+    parser.add_argument("--simulated-rate-limit-rpm", type=int, default=SIMULATED_RATE_LIMIT_RPM,
+                       help="Requests per minute after which simulated calls get 429s")
+    
+    # Model-tier routing arguments
+    parser.add_argument("--model-routing", action="store_true", default=MODEL_ROUTING_ENABLED,
+                       help="Send simple documents to a cheaper model tier, escalate long/ambiguous ones")
+    parser.add_argument("--fast-model", default=FAST_GPT_MODEL,
+                       help=f"Model for the cheap routing tier. Default: {FAST_GPT_MODEL}")
+    
+    # Phase 3 budget scheduling arguments
+    parser.add_argument("--budget-tokens", type=int, default=None,
+                       help="Phase 3 token budget; highest-priority documents are analyzed first, the rest deferred")
+    parser.add_argument("--budget-usd", type=float, default=None,
+                       help="Phase 3 dollar budget (converted with GPT_COST_PER_TOKEN_USD)")
+    parser.add_argument("--max-tokens-per-minute", type=int, default=None,
+                       help="Throttle Phase 3 spending to this many tokens per minute")
+    parser.add_argument("--priority", choices=sorted(PRIORITY_FUNCTIONS), default=None,
+                       help=f"Order Phase 3 documents across all WARCs by this priority. Default when scheduling: {PHASE3_PRIORITY}")
+    parser.add_argument("--domain-novelty-decay", type=float, default=DOMAIN_NOVELTY_DECAY,
+                       help="Multiply priority by this for each further document from the same domain (<1 favours new domains)")
+    
+    # Distributed work queue arguments
+    parser.add_argument("--work-queue", default=WORK_QUEUE_PATH,
+                       help="SQLite work queue on shared storage; run as a worker claiming WARCs from it")
+    parser.add_argument("--seed-queue", action="store_true",
+                       help="Add the crawl's WARC paths (limited by --max-files) to --work-queue and exit")
+    parser.add_argument("--queue-status", action="store_true",
+                       help="Print the status of --work-queue and exit")
+    parser.add_argument("--worker-id", default=None,
+                       help="Worker name recorded on leases. Default: hostname-pid")
+    parser.add_argument("--lease-seconds", type=float, default=WORK_QUEUE_LEASE_SECONDS,
+                       help=f"Lease length; heartbeats renew it every third of this. Default: {WORK_QUEUE_LEASE_SECONDS}")
     
     args = parser.parse_args()
     
@@ -58,17 +248,129 @@ def main():
             logger.error("--max-files must be a number or 'all'")
             sys.exit(1)
     
-    # Get API key from args or environment
+    # Work queue administration needs neither an API key nor an analyzer
+    if args.seed_queue or args.queue_status:
+        if not args.work_queue:
+            logger.error("--seed-queue and --queue-status require --work-queue")
+            sys.exit(1)
+        work_queue = WorkQueue(args.work_queue, lease_seconds=args.lease_seconds,
+                               max_attempts=WORK_QUEUE_MAX_ATTEMPTS)
+        if args.seed_queue:
+            crawl_info = CommonCrawlFetcher().get_latest_crawl_info()
+            warc_paths = crawl_info['warc_paths'] if max_files is None else crawl_info['warc_paths'][:max_files]
+            work_queue.seed(warc_paths, crawl_info['name'])
+        if args.queue_status:
+            print(json.dumps({**work_queue.get_summary(), 'failed_items': work_queue.get_failed()}, indent=2))
+        return
+    
+    sampling = args.sample is not None or args.sample_plan is not None
+    if sampling and (args.work_queue or args.phase != 'all'):
+        logger.error("--sample and --sample-plan run all phases in one process; drop --work-queue and --phase")
+        sys.exit(1)
+    
+    if args.work_queue and args.phase in ('2', '3'):
+        logger.error("--work-queue distributes crawl WARCs; run Phase 2/3 consumers without it (see --watch)")
+        sys.exit(1)
+    
+    # Get API key from args or environment (only Phase 3 on the hosted OpenAI backend needs one)
+    runs_phase_3 = args.phase in ('all', '3')
     api_key = args.openai_api_key or OPENAI_API_KEY
-    if not api_key:
+    if not api_key and args.llm_backend == 'openai' and runs_phase_3:
         logger.error("OpenAI API key is required. Set OPENAI_API_KEY environment variable or use --openai-api-key")
         sys.exit(1)
     
+    if not runs_phase_3:
+        llm_backend = None
+    elif args.llm_backend == 'simulated':
+        llm_backend = create_backend(
+            'simulated',
+            latency_seconds=args.simulated_latency,
+            latency_jitter_seconds=SIMULATED_LATENCY_JITTER_SECONDS,
+            error_rate=args.simulated_error_rate,
+            rate_limit_rate=args.simulated_rate_limit_rate,
+            rate_limit_rpm=args.simulated_rate_limit_rpm,
+            seed=SIMULATED_SEED
+        )
+    else:
+        try:
+            llm_backend = create_backend(args.llm_backend, api_key=api_key, base_url=args.llm_base_url)
+        except ValueError as e:
+            logger.error(f"{e} (see --llm-base-url)")
+            sys.exit(1)
+    
+    model_router = None
+    if args.model_routing:
+        model_router = build_default_router(
+            full_model=args.llm_model,
+            full_max_tokens=MAX_TOKENS_PER_ANALYSIS,
+            fast_model=args.fast_model,
+            fast_max_tokens=FAST_MAX_TOKENS_PER_ANALYSIS,
+            long_document_tokens=ROUTER_LONG_DOCUMENT_TOKENS
+        )
+    
+    phase3_scheduler = None
+    if (args.budget_tokens is not None or args.budget_usd is not None or args.priority
+            or args.max_tokens_per_minute or args.domain_novelty_decay < 1.0):
+        phase3_scheduler = Phase3Scheduler(
+            TokenBudget(
+                max_tokens=args.budget_tokens,
+                max_usd=args.budget_usd,
+                cost_per_token_usd=GPT_COST_PER_TOKEN_USD,
+                max_tokens_per_minute=args.max_tokens_per_minute
+            ),
+            priority=args.priority or PHASE3_PRIORITY,
+            domain_novelty_decay=args.domain_novelty_decay,
+            deferred_file=PHASE3_DEFERRED_FILE
+        )
+    
+    metrics_exporters = []
+    if args.metrics_file:
+        metrics_exporters.append(MetricsTextfileExporter(args.metrics_file, METRICS_EXPORT_SECONDS))
+    if args.metrics_port:
+        metrics_exporters.append(MetricsHTTPServer(args.metrics_port))
+    for exporter in metrics_exporters:
+        exporter.start()
+    
     try:
+        # Imported after argument parsing so `--help` and argument errors stay fast
+        from .analyzer import ThreePhaseLegalAnalyzer
+        sample = None
+        if args.sample_plan:
+            from .sampling import CrawlSample
+            sample = CrawlSample.load(Path(args.sample_plan))
+        elif args.sample is not None:
+            from .sampling import CrawlSample
+            sample = CrawlSample(args.sample, record_fraction=args.sample_records, seed=args.sample_seed)
         analyzer = ThreePhaseLegalAnalyzer(
             output_dir=args.output_dir,
             max_files=max_files,
-            progress_file=args.progress_file
+            progress_file=args.progress_file,
+            preclassifier_path=args.preclassifier,
+            preclassifier_threshold=args.preclassifier_threshold,
+            preclassifier_mode=args.preclassifier_mode,
+            llm_backend=llm_backend,
+            gpt_model=args.llm_model,
+            model_router=model_router,
+            phase3_scheduler=phase3_scheduler,
+            pipeline_mode=args.pipeline,
+            streaming_queue_size=args.streaming_queue_size,
+            adaptive_concurrency=args.adaptive_concurrency,
+            max_gpt_concurrency=args.max_gpt_concurrency,
+            profiler=PhaseProfiler(args.profile_mode, PROFILE_SAMPLE_INTERVAL_SECONDS,
+                                   PROFILE_TOP_FUNCTIONS) if args.profile else None,
+            pattern_stats=PatternStats() if args.pattern_profile else None,
+            domain_quota_phase2=args.domain_quota_phase2,
+            domain_quota_phase3=args.domain_quota_phase3,
+            input_format=args.input_format,
+            url_index=args.url_index,
+            index_base_url=args.index_base_url,
+            cdx_server_url=args.cdx_server_url or None,
+            link_discovery=args.link_discovery,
+            link_source=args.link_source,
+            sample=sample,
+            segment_outputs=args.segment_outputs,
+            segment_warc_bytes=args.segment_warc_mb * 1024 ** 2,
+            segment_parquet_bytes=args.segment_parquet_mb * 1024 ** 2
         )
         
         # Handle progress reset
@@ -83,6 +385,20 @@ def main():
             analyzer.progress_tracker.save_progress()
             logger.info(f"Phase {phase_num} marked as incomplete, will be re-run")
         
+        # Queue worker: claim WARCs until the shared queue is drained
+        if args.work_queue:
+            work_queue = WorkQueue(args.work_queue, lease_seconds=args.lease_seconds,
+                                   max_attempts=WORK_QUEUE_MAX_ATTEMPTS)
+            phases = (1, 2, 3) if args.phase == 'all' else (int(args.phase),)
+            worker_stats = analyzer.run_worker(work_queue, api_key, args.worker_id or default_worker_id(),
+                                               phases=phases)
+            summary = work_queue.get_summary()
+            logger.info(f"Worker {worker_stats['worker_id']}: {worker_stats['items_completed']} WARCs completed, "
+                        f"{worker_stats['items_failed']} failed")
+            logger.info(f"Queue: {summary['done']}/{summary['total']} done, {summary['pending']} pending, "
+                        f"{summary['leased']} leased, {summary['failed']} failed")
+            return
+        
         # Run analysis based on phase selection
         if args.phase == 'all':
             # Run complete 3-phase pipeline
@@ -119,6 +435,22 @@ def main():
                 logger.info(f"  Extracted passages: {phase3.get('extracted_passages', 0):,}")
                 logger.info(f"  OpenAI tokens used: {phase3.get('openai_tokens_used', 0):,}")
                 logger.info(f"  Estimated cost: ${phase3.get('estimated_cost_usd', 0):.2f}")
+                for tier_stats in phase3.get('model_tier_stats', []):
+                    logger.info(f"  Tier {tier_stats['tier']} ({tier_stats['model']}): {tier_stats['documents_routed']:,} docs, "
+                                f"{tier_stats['total_tokens_used']:,} tokens, {tier_stats['avg_latency_seconds']:.2f}s avg")
+                if phase3.get('preclassifier_skipped_documents'):
+                    logger.info(f"  Pre-classifier skipped: {phase3['preclassifier_skipped_documents']:,} "
+                                f"(~{phase3['preclassifier_tokens_saved_estimate']:,} tokens saved)")
+                
+                # Crawl-wide estimates of a sampled run
+                sample_estimates = final_stats.get('sample_estimates') or {}
+                if sample_estimates:
+                    logger.info(f"Sample estimates ({sample_estimates['files_sampled']} WARC files, "
+                                f"{sample_estimates['confidence']:.0%} intervals):")
+                    for metric, row in sample_estimates['estimates'].items():
+                        interval = (f"{row['ci_low']:,}-{row['ci_high']:,}" if row['ci_low'] is not None
+                                    else f"{row['prevalence_ci_low']:.3%}-{row['prevalence_ci_high']:.3%} of records")
+                        logger.info(f"  {metric}: ~{row['estimate']:,} ({interval})")
                 
                 # Output locations
                 locations = final_stats.get('output_locations', {})
@@ -126,28 +458,21 @@ def main():
                 logger.info("="*60)
         
         else:
-            # Run specific phase
+            # Run a single phase standalone; Phases 2 and 3 claim the previous phase's outputs
             phase_num = int(args.phase)
-            logger.info(f"Running Phase {phase_num} only")
+            logger.info(f"Running Phase {phase_num} only" + (" in watch mode" if args.watch else ""))
             
-            if phase_num == 1:
-                logger.info("Phase 1: Lightning Fast Detection")
-                if phase_num == 3 and not api_key:
-                    logger.error("Phase 3 requires OpenAI API key")
-                    sys.exit(1)
-                # Note: Individual phase running would need to be implemented
-                logger.warning("Individual phase running not yet implemented. Use --phase all for now.")
-            
-            elif phase_num == 2:
-                logger.info("Phase 2: Sophisticated Legal Filtering")
-                logger.warning("Individual phase running not yet implemented. Use --phase all for now.")
-            
-            elif phase_num == 3:
-                logger.info("Phase 3: Passage Extraction and Parquet Storage")
-                if not api_key:
-                    logger.error("Phase 3 requires OpenAI API key")
-                    sys.exit(1)
-                logger.warning("Individual phase running not yet implemented. Use --phase all for now.")
+            final_stats = analyzer.run_single_phase(phase_num, api_key, resume=args.resume,
+                                                    watch=args.watch, poll_seconds=args.poll_seconds)
+            if final_stats:
+                stats_key = {
+                    1: 'phase_1_lightning_detection',
+                    2: 'phase_2_sophisticated_filtering',
+                    3: 'phase_3_passage_extraction'
+                }[phase_num]
+                for key, value in final_stats.get(stats_key, {}).items():
+                    if isinstance(value, (int, float)):
+                        logger.info(f"  {key}: {value:,}")
         
         logger.info("Analysis completed successfully!")
         
@@ -158,6 +483,10 @@ def main():
     except Exception as e:
         logger.error(f"Analysis failed: {e}")
         sys.exit(1)
+    finally:
+        # The text file keeps the final values after the run
+        for exporter in metrics_exporters:
+            exporter.stop()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
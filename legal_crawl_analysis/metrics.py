@@ -0,0 +1,260 @@
+"""
+Run metrics in the Prometheus text exposition format
+A small dependency-free registry of counters, gauges and histograms that the
+fetcher, detector, extractor, GPT analyzer and pipeline stages update as they
+work. The registry is exported live as a text file (for node_exporter's textfile
+collector or plain `cat`) and/or over HTTP at /metrics.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans regex checks (sub-millisecond) up to GPT calls and downloads
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, **labelvalues):
+        """Child metric for one combination of label values"""
+        key = tuple(str(labelvalues[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+class Counter(_Metric):
+    """Monotonically increasing total; rates (records/sec, tokens/sec) come from rate() over it"""
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+                for key, child in sorted(self._children.items())]
+
+class Gauge(Counter):
+    """Value that can go up and down (queue depths, worker counts)"""
+    metric_type = "gauge"
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+class _HistogramValue:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations, e.g. per-item stage latency"""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+class MetricsRegistry:
+    """Holds every metric of the process and renders them in exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self.start_time = time.time()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        uptime = (f"# HELP legal_crawl_uptime_seconds Seconds since the run started\n"
+                  f"# TYPE legal_crawl_uptime_seconds gauge\n"
+                  f"legal_crawl_uptime_seconds {_format_value(time.time() - self.start_time)}")
+        return "\n".join([uptime] + [metric.render() for metric in self._metrics.values()]) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# Throughput
+RECORDS = REGISTRY.counter('legal_crawl_records_total', 'WARC response records read', ['phase'])
+BYTES = REGISTRY.counter('legal_crawl_bytes_total', 'Bytes downloaded or read from WARC payloads', ['stage'])
+DOCUMENTS = REGISTRY.counter('legal_crawl_documents_total', 'Documents by phase and outcome', ['phase', 'outcome'])
+TOKENS = REGISTRY.counter('legal_crawl_tokens_total', 'LLM tokens used', ['kind'])
+
+# Latency, queues and caches
+STAGE_SECONDS = REGISTRY.histogram('legal_crawl_stage_seconds', 'Per-item latency of a processing stage', ['stage'])
+QUEUE_DEPTH = REGISTRY.gauge('legal_crawl_queue_depth', 'Items waiting in a streaming stage queue', ['stage'])
+STAGE_WORKERS = REGISTRY.gauge('legal_crawl_stage_workers', 'Current concurrency of a stage', ['stage'])
+CACHE_REQUESTS = REGISTRY.counter('legal_crawl_cache_requests_total', 'Cache lookups by result', ['cache', 'result'])
+
+# Failures
+ERRORS = REGISTRY.counter('legal_crawl_errors_total', 'Errors by stage', ['stage'])
+GPT_REQUESTS = REGISTRY.counter('legal_crawl_gpt_requests_total', 'LLM requests by outcome', ['outcome'])
+
+class MetricsTextfileExporter:
+    """Rewrites a .prom file every interval (atomically, so readers never see half a file)"""
+
+    def __init__(self, path: str, interval_seconds: float = 15.0, registry: MetricsRegistry = REGISTRY):
+        self.path = Path(path)
+        self.interval_seconds = interval_seconds
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-textfile", daemon=True)
+
+    def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop and write a final snapshot"""
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+    def write(self):
+        partial = self.path.with_name(self.path.name + ".partial")
+        try:
+            partial.write_text(self.registry.render(), encoding='utf-8')
+            os.replace(partial, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics file {self.path}: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.write()
+
+class MetricsHTTPServer:
+    """Serves the registry at http://<host>:<port>/metrics from a background thread"""
+
+    def __init__(self, port: int, host: str = "0.0.0.0", registry: MetricsRegistry = REGISTRY):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"metrics request: {format % args}")
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Serving metrics at http://localhost:{self.port}/metrics")
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
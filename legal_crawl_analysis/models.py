@@ -58,4 +58,15 @@ class PhaseTwoStats:
     technical_measures: Dict[str, int]
     processing_time_seconds: float
     openai_api_calls: int
-    total_tokens_used: int 
\ No newline at end of file
+    total_tokens_used: int
+
+@dataclass
+class ModelTierStats:
+    """Statistics for one model tier in Phase 3 model routing"""
+    tier: str
+    model: str
+    documents_routed: int
+    escalations_received: int
+    total_tokens_used: int
+    processing_time_seconds: float
+    routing_reasons: Dict[str, int]
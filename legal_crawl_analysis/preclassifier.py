@@ -0,0 +1,377 @@
+"""
+Lightweight pre-classifier for Phase 3
+Trains a CPU-only hashed n-gram logistic regression on past GPT analysis outputs
+and scores documents before they are sent to GPT, so confident negatives
+(documents that will yield no copyright clauses) can be skipped or deferred.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .config import GPT_PROMPT_TEXT_CHARS
+
+logger = logging.getLogger(__name__)
+
+# Bump when the artifact layout changes in a backward-incompatible way
+ARTIFACT_FORMAT_VERSION = 1
+
+# Categories that do not count as a useful copyright finding
+NEGATIVE_CATEGORIES = {'EASY_NEGATIVE_IRRELEVANT'}
+
+# Rough token accounting for skipped documents (mirrors GPTLegalAnalyzer truncation)
+PROMPT_OVERHEAD_TOKENS = 700
+PROMPT_TEXT_CHAR_LIMIT = GPT_PROMPT_TEXT_CHARS
+CHARS_PER_TOKEN = 4
+
+DEFAULT_THRESHOLDS = [0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.3, 0.5]
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+def is_positive_analysis(gpt_analysis: Dict) -> bool:
+    """A document is positive if GPT found at least one relevant copyright clause"""
+    for clause in gpt_analysis.get('copyright_clauses', []) or []:
+        if isinstance(clause, dict) and clause.get('category') not in NEGATIVE_CATEGORIES:
+            return True
+    return False
+
+def estimate_analysis_tokens(clean_text: str) -> int:
+    """Estimate the tokens a GPT analysis of this text would consume"""
+    return estimate_analysis_tokens_for_length(len(clean_text))
+
+def estimate_analysis_tokens_for_length(clean_text_length: int) -> int:
+    """Token estimate from the clean text length alone (e.g. Phase 2 metadata)"""
+    return PROMPT_OVERHEAD_TOKENS + min(clean_text_length, PROMPT_TEXT_CHAR_LIMIT) // CHARS_PER_TOKEN
+
+class HashedNgramFeaturizer:
+    """Maps text to a sparse, L2-normalised vector of hashed word n-grams"""
+
+    def __init__(self, n_features: int = 2 ** 18, ngram_range: Tuple[int, int] = (1, 2),
+                 max_chars: int = 20000):
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.max_chars = max_chars
+
+    def transform(self, text: str) -> Dict[int, float]:
+        """Featurize a single document"""
+        tokens = _TOKEN_RE.findall(text[:self.max_chars].lower())
+        counts: Dict[int, float] = {}
+
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            for i in range(len(tokens) - n + 1):
+                gram = ' '.join(tokens[i:i + n])
+                # crc32 is stable across processes, unlike hash()
+                index = zlib.crc32(gram.encode('utf-8')) % self.n_features
+                counts[index] = counts.get(index, 0.0) + 1.0
+
+        norm = math.sqrt(sum(v * v for v in counts.values()))
+        if norm > 0:
+            for index in counts:
+                counts[index] /= norm
+        return counts
+
+    def to_dict(self) -> Dict:
+        return {
+            'n_features': self.n_features,
+            'ngram_range': list(self.ngram_range),
+            'max_chars': self.max_chars
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'HashedNgramFeaturizer':
+        return cls(n_features=data['n_features'], ngram_range=tuple(data['ngram_range']),
+                   max_chars=data['max_chars'])
+
+@dataclass
+class TrainingExample:
+    """A labelled document reconstructed from Phase 3 outputs"""
+    url: str
+    text: str
+    label: bool
+    tokens_used: int
+
+class PreClassifier:
+    """Hashed n-gram logistic regression predicting P(document yields copyright clauses)"""
+
+    def __init__(self, featurizer: Optional[HashedNgramFeaturizer] = None):
+        self.featurizer = featurizer or HashedNgramFeaturizer()
+        self.weights: Dict[int, float] = {}
+        self.bias = 0.0
+        self.model_version = ''
+        self.metadata: Dict = {}
+
+    def fit(self, texts: Sequence[str], labels: Sequence[bool], epochs: int = 5,
+            learning_rate: float = 0.5, l2: float = 1e-6, seed: int = 13) -> 'PreClassifier':
+        """Train with plain SGD; positives are up-weighted to balance the classes"""
+        vectors = [self.featurizer.transform(t) for t in texts]
+        targets = [1.0 if y else 0.0 for y in labels]
+
+        positives = sum(targets)
+        negatives = len(targets) - positives
+        pos_weight = (negatives / positives) if positives else 1.0
+
+        order = list(range(len(vectors)))
+        rng = random.Random(seed)
+        weights = self.weights
+
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            lr = learning_rate / (1 + epoch)
+            for i in order:
+                x, y = vectors[i], targets[i]
+                p = self._sigmoid(self.bias + sum(weights.get(j, 0.0) * v for j, v in x.items()))
+                grad = (p - y) * (pos_weight if y else 1.0)
+                for j, v in x.items():
+                    w = weights.get(j, 0.0)
+                    weights[j] = w - lr * (grad * v + l2 * w)
+                self.bias -= lr * grad
+
+        # Drop near-zero weights to keep the artifact small
+        self.weights = {j: w for j, w in weights.items() if abs(w) > 1e-6}
+        self.metadata.update({
+            'training_documents': len(targets),
+            'training_positives': int(positives),
+            'epochs': epochs,
+            'learning_rate': learning_rate,
+            'l2': l2
+        })
+        return self
+
+    def predict_proba(self, text: str) -> float:
+        """Probability that the document yields at least one relevant copyright clause"""
+        x = self.featurizer.transform(text)
+        return self._sigmoid(self.bias + sum(self.weights.get(j, 0.0) * v for j, v in x.items()))
+
+    @staticmethod
+    def _sigmoid(z: float) -> float:
+        if z < -35:
+            return 0.0
+        if z > 35:
+            return 1.0
+        return 1.0 / (1.0 + math.exp(-z))
+
+    def save(self, path: Path) -> Path:
+        """
+        Save the model as a gzipped JSON artifact. If path is a directory the
+        file is named after the model version (preclassifier-<version>.json.gz)
+        """
+        path = Path(path)
+
+        payload = {
+            'format_version': ARTIFACT_FORMAT_VERSION,
+            'featurizer': self.featurizer.to_dict(),
+            'bias': self.bias,
+            'weights': {str(j): w for j, w in self.weights.items()},
+        }
+        if not self.model_version:
+            digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+            self.model_version = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{digest[:8]}"
+        payload['model_version'] = self.model_version
+        payload['metadata'] = self.metadata
+
+        if path.is_dir() or not path.suffix:
+            path = path / f"preclassifier-{self.model_version}.json.gz"
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(payload, f)
+        logger.info(f"Saved pre-classifier {self.model_version} to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> 'PreClassifier':
+        """Load a model artifact written by save()"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            payload = json.load(f)
+
+        if payload.get('format_version') != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported pre-classifier artifact format: {payload.get('format_version')}")
+
+        model = cls(HashedNgramFeaturizer.from_dict(payload['featurizer']))
+        model.bias = payload['bias']
+        model.weights = {int(j): w for j, w in payload['weights'].items()}
+        model.model_version = payload.get('model_version', '')
+        model.metadata = payload.get('metadata', {})
+        logger.info(f"Loaded pre-classifier {model.model_version} from {path}")
+        return model
+
+def _iter_gpt_analysis_rows(phase3_dir: Path) -> Iterator[List[Dict]]:
+    """Yield the rows of each *_gpt_analysis output, preferring parquet over JSON, then those rolled into segments"""
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    for json_file in sorted(phase3_dir.glob("*_gpt_analysis.json")):
+        parquet_file = json_file.with_suffix('.parquet')
+        if pd is not None and parquet_file.exists():
+            yield pd.read_parquet(parquet_file).to_dict('records')
+        else:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                yield json.load(f)
+
+    if pd is not None:
+        from .segments import SegmentRoller
+        for _, rows in SegmentRoller(phase3_dir).iter_table_rows('gpt_analysis'):
+            yield rows
+
+def load_training_examples(phase3_dir: Path, extractor=None) -> Iterator[TrainingExample]:
+    """
+    Rebuild labelled examples from Phase 3 outputs: labels come from the
+    *_gpt_analysis files, text is re-extracted from the WARC next to them
+    """
+    from warcio.archiveiterator import ArchiveIterator
+    from .segments import open_phase3_warc
+
+    if extractor is None:
+        from .extractor import HTMLContentExtractor
+        extractor = HTMLContentExtractor()
+
+    phase3_dir = Path(phase3_dir)
+    for rows in _iter_gpt_analysis_rows(phase3_dir):
+        rows_by_warc: Dict[str, Dict[str, Dict]] = {}
+        for row in rows:
+            rows_by_warc.setdefault(row['warc_file'], {})[row['url']] = row
+
+        for warc_name, rows_by_url in rows_by_warc.items():
+            # The WARC may have been rolled into an output segment
+            warc_stream = open_phase3_warc(phase3_dir, warc_name)
+            if warc_stream is None:
+                logger.warning(f"WARC file for training labels not found: {phase3_dir / warc_name}")
+                continue
+
+            with warc_stream, gzip.open(warc_stream, 'rb') as f:
+                for record in ArchiveIterator(f):
+                    if record.rec_type != 'response':
+                        continue
+                    url = record.rec_headers.get_header('WARC-Target-URI')
+                    row = rows_by_url.pop(url, None)
+                    if row is None:
+                        continue
+
+                    html_content = record.content_stream().read().decode('utf-8', errors='ignore')
+                    clean_text = extractor.extract_clean_text(html_content)
+                    if not clean_text:
+                        continue
+
+                    try:
+                        gpt_analysis = json.loads(row['gpt_analysis'])
+                    except (TypeError, json.JSONDecodeError):
+                        continue
+
+                    yield TrainingExample(
+                        url=url,
+                        text=clean_text,
+                        label=is_positive_analysis(gpt_analysis),
+                        tokens_used=int(row.get('tokens_used') or 0)
+                    )
+
+def evaluate_thresholds(scores: Sequence[float], labels: Sequence[bool], tokens: Sequence[int],
+                        thresholds: Sequence[float] = DEFAULT_THRESHOLDS) -> List[Dict]:
+    """Estimated recall loss vs. tokens saved if documents scoring below each threshold are skipped"""
+    total_positives = sum(1 for y in labels if y)
+    total_tokens = sum(tokens)
+    report = []
+
+    for threshold in thresholds:
+        skipped = [i for i, s in enumerate(scores) if s < threshold]
+        positives_lost = sum(1 for i in skipped if labels[i])
+        tokens_saved = sum(tokens[i] for i in skipped)
+        report.append({
+            'threshold': threshold,
+            'documents_skipped': len(skipped),
+            'skip_rate': len(skipped) / max(len(scores), 1),
+            'positives_lost': positives_lost,
+            'recall_loss': positives_lost / max(total_positives, 1),
+            'tokens_saved': tokens_saved,
+            'tokens_saved_fraction': tokens_saved / max(total_tokens, 1)
+        })
+
+    return report
+
+def train_from_outputs(phase3_dir: Path, holdout_fraction: float = 0.2, epochs: int = 5,
+                       thresholds: Sequence[float] = DEFAULT_THRESHOLDS) -> Tuple[PreClassifier, List[Dict]]:
+    """Train on past Phase 3 outputs and evaluate on a deterministic URL-hashed holdout"""
+    train: List[TrainingExample] = []
+    holdout: List[TrainingExample] = []
+
+    for example in load_training_examples(phase3_dir):
+        bucket = zlib.crc32(example.url.encode('utf-8')) % 1000
+        (holdout if bucket < holdout_fraction * 1000 else train).append(example)
+
+    if not train:
+        raise ValueError(f"No training examples found in {phase3_dir}")
+
+    logger.info(f"Training pre-classifier on {len(train)} documents ({len(holdout)} held out)")
+    model = PreClassifier().fit([e.text for e in train], [e.label for e in train], epochs=epochs)
+
+    evaluation = holdout or train
+    report = evaluate_thresholds(
+        [model.predict_proba(e.text) for e in evaluation],
+        [e.label for e in evaluation],
+        [e.tokens_used or estimate_analysis_tokens(e.text) for e in evaluation],
+        thresholds
+    )
+    model.metadata.update({
+        'source_dir': str(phase3_dir),
+        'evaluation_documents': len(evaluation),
+        'evaluation_on_holdout': bool(holdout),
+        'threshold_report': report
+    })
+    return model, report
+
+def write_threshold_report(report: List[Dict], path: Path, model_version: str = ''):
+    """Write the recall-loss vs. tokens-saved table as markdown"""
+    with open(path, 'w') as f:
+        f.write("# Pre-classifier Threshold Report\n\n")
+        if model_version:
+            f.write(f"**Model version:** {model_version}\n\n")
+        f.write("| Threshold | Skipped | Skip Rate | Positives Lost | Recall Loss | Tokens Saved | Tokens Saved % |\n")
+        f.write("|---|---|---|---|---|---|---|\n")
+        for row in report:
+            f.write(f"| {row['threshold']:.2f} | {row['documents_skipped']:,} | {row['skip_rate']:.1%} | "
+                    f"{row['positives_lost']:,} | {row['recall_loss']:.2%} | {row['tokens_saved']:,} | "
+                    f"{row['tokens_saved_fraction']:.1%} |\n")
+
+def main():
+    """Train a pre-classifier artifact from existing Phase 3 outputs"""
+    parser = argparse.ArgumentParser(description="Train the Phase 3 pre-classifier from past GPT analysis outputs")
+    parser.add_argument("phase3_dir", help="Directory containing *_gpt_analysis files and their WARCs")
+    parser.add_argument("--output-dir", default="models", help="Where to write the model artifact and report")
+    parser.add_argument("--epochs", type=int, default=5, help="Training epochs. Default: 5")
+    parser.add_argument("--holdout-fraction", type=float, default=0.2,
+                        help="Fraction of documents held out for the threshold report. Default: 0.2")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    model, report = train_from_outputs(Path(args.phase3_dir), args.holdout_fraction, args.epochs)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    artifact = model.save(output_dir)
+
+    with open(output_dir / f"preclassifier-{model.model_version}_report.json", 'w') as f:
+        json.dump(report, f, indent=2)
+    write_threshold_report(report, output_dir / f"preclassifier-{model.model_version}_report.md",
+                           model.model_version)
+
+    for row in report:
+        print(f"threshold={row['threshold']:.2f} skip_rate={row['skip_rate']:.1%} "
+              f"recall_loss={row['recall_loss']:.2%} tokens_saved={row['tokens_saved_fraction']:.1%}")
+    print(f"Model written to {artifact}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Per-phase profiling for production runs
+Each phase runs under a stack sampler (all threads, low overhead) and, in
+deterministic mode, additionally under cProfile (calling thread, exact call
+counts). For every phase the profiler writes `<phase>.pstats` and a
+`<phase>.collapsed` file in the format flamegraph.pl and speedscope read.
+"""
+
+import cProfile
+import logging
+import marshal
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Helper threads that only wait; sampling them would bury the pipeline's stacks
+IGNORED_THREAD_PREFIXES = ("profile-sampler", "metrics-", "concurrency-monitor", "lease-heartbeat", "claim-heartbeat")
+
+FunctionKey = Tuple[str, int, str]
+
+class StackSampler:
+    """Samples the Python stacks of all threads at a fixed interval"""
+
+    def __init__(self, interval_seconds: float = 0.005):
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self.ticks = 0
+        self.elapsed_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def seconds_per_tick(self) -> float:
+        """Measured time between samples (longer than the interval when the GIL is contended)"""
+        return self.elapsed_seconds / self.ticks if self.ticks else self.interval_seconds
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval_seconds):
+            now = time.perf_counter()
+            self.elapsed_seconds += now - last
+            self.ticks += 1
+            last = now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if name.startswith(IGNORED_THREAD_PREFIXES):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                stack.reverse()
+                self.stacks[(name, tuple(stack))] += 1
+
+    def write_collapsed(self, path: Path):
+        """One `thread;root;...;leaf count` line per distinct stack"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for (thread_name, stack), count in self.stacks.most_common():
+                frames = [f"thread:{thread_name}"] + [_frame_label(key) for key in stack]
+                f.write(";".join(frames) + f" {count}\n")
+
+    def to_pstats(self) -> Dict:
+        """Build a pstats-compatible table from the samples (calls = samples)"""
+        stats: Dict[FunctionKey, list] = {}
+
+        def entry(key):
+            return stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+
+        for (_, stack), count in self.stacks.items():
+            seconds = count * self.seconds_per_tick
+            entry(stack[-1])[2] += seconds
+            for key in set(stack):
+                row = entry(key)
+                row[0] += count
+                row[1] += count
+                row[3] += seconds
+            for caller, callee in set(zip(stack, stack[1:])):
+                callers = entry(callee)[4]
+                cc, nc, tt, ct = callers.get(caller, (0, 0, 0.0, 0.0))
+                callers[caller] = (cc + count, nc + count, tt + (seconds if callee == stack[-1] else 0.0), ct + seconds)
+        return {key: tuple(row) for key, row in stats.items()}
+
+def _frame_label(key: FunctionKey) -> str:
+    filename, lineno, name = key
+    short = "/".join(Path(filename).parts[-2:])
+    return f"{name} ({short}:{lineno})"
+
+class PhaseProfiler:
+    """Profiles named phases; re-entering a phase (e.g. once per WARC) accumulates into the same files"""
+
+    def __init__(self, mode: str = "sampling", sample_interval_seconds: float = 0.005, top_n: int = 15):
+        if mode not in ('sampling', 'deterministic'):
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.sample_interval_seconds = sample_interval_seconds
+        self.top_n = top_n
+        self._samplers: Dict[str, StackSampler] = {}
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._seconds: Dict[str, float] = {}
+        self.summaries: Dict[str, Dict] = {}
+
+    @contextmanager
+    def profile(self, phase: str, output_dir: Path):
+        sampler = self._samplers.setdefault(phase, StackSampler(self.sample_interval_seconds))
+        profile = self._profiles.setdefault(phase, cProfile.Profile()) if self.mode == 'deterministic' else None
+
+        start = time.perf_counter()
+        sampler.start()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            sampler.stop()
+            self._seconds[phase] = self._seconds.get(phase, 0.0) + time.perf_counter() - start
+            self._write(phase, Path(output_dir))
+
+    def _write(self, phase: str, output_dir: Path):
+        output_dir.mkdir(parents=True, exist_ok=True)
+        pstats_file = output_dir / f"{phase}.pstats"
+        collapsed_file = output_dir / f"{phase}.collapsed"
+
+        sampler = self._samplers[phase]
+        sampler.write_collapsed(collapsed_file)
+        if phase in self._profiles:
+            self._profiles[phase].dump_stats(str(pstats_file))
+        else:
+            with open(pstats_file, 'wb') as f:
+                marshal.dump(sampler.to_pstats(), f)
+
+        self.summaries[phase] = {
+            'mode': self.mode,
+            'wall_seconds': self._seconds[phase],
+            'samples': sum(sampler.stacks.values()),
+            'pstats_file': str(pstats_file),
+            'collapsed_file': str(collapsed_file),
+            'top_functions': self._top_functions(pstats_file)
+        }
+        logger.info(f"Profile for {phase} written to {pstats_file} and {collapsed_file}")
+
+    def _top_functions(self, pstats_file: Path) -> List[Dict]:
+        """Functions with the most self time"""
+        stats = pstats.Stats(str(pstats_file))
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top_n]
+        return [{
+            'function': _frame_label(key),
+            'calls': nc,
+            'self_seconds': tt,
+            'cumulative_seconds': ct
+        } for key, (cc, nc, tt, ct, callers) in rows]
+
+    def get_summary(self) -> Dict:
+        return dict(self.summaries)
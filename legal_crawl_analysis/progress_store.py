@@ -0,0 +1,250 @@
+"""
+SQLite (WAL) progress store
+Records completion per (phase, WARC) and per (phase, WARC, record) with stable
+keys, so resume skips finished work exactly and each update is a single row
+write instead of a rewrite of the whole progress file.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Set
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    phase INTEGER NOT NULL,
+    warc_key TEXT NOT NULL,
+    file_index INTEGER,
+    documents INTEGER NOT NULL DEFAULT 0,
+    records_processed INTEGER NOT NULL DEFAULT 0,
+    tokens_used INTEGER NOT NULL DEFAULT 0,
+    preclassifier_skipped INTEGER NOT NULL DEFAULT 0,
+    tokens_saved_estimate INTEGER NOT NULL DEFAULT 0,
+    completed_at TEXT,
+    PRIMARY KEY (phase, warc_key)
+);
+CREATE TABLE IF NOT EXISTS records (
+    phase INTEGER NOT NULL,
+    warc_key TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    tokens_used INTEGER NOT NULL DEFAULT 0,
+    completed_at TEXT,
+    PRIMARY KEY (phase, warc_key, record_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS spend (
+    phase INTEGER NOT NULL,
+    warc_key TEXT NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    tokens_used INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (phase, warc_key)
+);
+"""
+
+class SQLiteProgressTracker:
+    """
+    Drop-in replacement for ThreePhaseProgressTracker backed by SQLite in WAL mode.
+    progress_data keeps only the small run state; overall_stats are SQL aggregates.
+    """
+
+    def __init__(self, progress_file: str):
+        self.progress_file = progress_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(progress_file, isolation_level=None, check_same_thread=False, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        has_spend = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'spend'").fetchone()
+        self._conn.executescript(_SCHEMA)
+        if not has_spend:
+            # Stores created before spend tracking only know the tokens of successful records
+            self._conn.execute(
+                "INSERT OR IGNORE INTO spend (phase, warc_key, calls, tokens_used) "
+                "SELECT phase, warc_key, COUNT(*), SUM(tokens_used) FROM records GROUP BY phase, warc_key"
+            )
+        self.progress_data = self._load_progress()
+
+    @staticmethod
+    def _default_state() -> Dict:
+        return {
+            'crawl_name': '',
+            'start_time': '',
+            'total_files_to_process': 0,
+            'phase_1': {'completed': False, 'current_file_index': 0, 'stats': {}},
+            'phase_2': {'completed': False, 'current_file_index': 0, 'stats': {}},
+            'phase_3': {'completed': False, 'current_file_index': 0, 'stats': {}},
+        }
+
+    def _load_progress(self) -> Dict:
+        """Load the run state and compute overall stats from the stored rows"""
+        progress_data = self._default_state()
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = 'progress'").fetchone()
+        if row:
+            try:
+                progress_data.update(json.loads(row[0]))
+            except json.JSONDecodeError as e:
+                logger.warning(f"Could not load progress state: {e}")
+        progress_data['overall_stats'] = self.get_overall_stats()
+        return progress_data
+
+    def save_progress(self):
+        """Persist the small run state (per-file and per-record rows are written as they happen)"""
+        state = {key: value for key, value in self.progress_data.items() if key != 'overall_stats'}
+        try:
+            with self._lock:
+                self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('progress', ?)",
+                                   (json.dumps(state),))
+        except sqlite3.Error as e:
+            logger.error(f"Failed to save progress: {e}")
+
+    def _record_file(self, phase: int, warc_key: str, file_index: int, documents: int,
+                     records_processed: int = 0, tokens_used: int = 0, preclassifier_skipped: int = 0,
+                     tokens_saved_estimate: int = 0):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (phase, warc_key, file_index, documents, records_processed, "
+                "tokens_used, preclassifier_skipped, tokens_saved_estimate, completed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (phase, warc_key, file_index, documents, records_processed, tokens_used,
+                 preclassifier_skipped, tokens_saved_estimate, datetime.now().isoformat())
+            )
+        self.progress_data[f'phase_{phase}']['current_file_index'] = file_index
+        self.progress_data['overall_stats'] = self.get_overall_stats()
+        self.save_progress()
+
+    def update_phase_1(self, file_index: int, warc_path: str, legal_docs_found: int, records_processed: int):
+        """Update Phase 1 progress"""
+        self._record_file(1, warc_path, file_index, legal_docs_found, records_processed=records_processed)
+
+    def update_phase_2(self, file_index: int, warc_name: str, filtered_docs: int):
+        """Update Phase 2 progress"""
+        self._record_file(2, warc_name, file_index, filtered_docs)
+
+    def update_phase_3(self, file_index: int, warc_name: str, extracted_passages: int, tokens_used: int,
+                       preclassifier_skipped: int = 0, tokens_saved_estimate: int = 0):
+        """Update Phase 3 progress"""
+        self._record_file(3, warc_name, file_index, extracted_passages, tokens_used=tokens_used,
+                          preclassifier_skipped=preclassifier_skipped, tokens_saved_estimate=tokens_saved_estimate)
+
+    def mark_record_done(self, phase: int, warc_key: str, record_id: str, tokens_used: int = 0):
+        """Record that a single document finished a phase"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO records (phase, warc_key, record_id, tokens_used, completed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (phase, warc_key, record_id, tokens_used, datetime.now().isoformat())
+            )
+
+    def import_legacy_progress(self, legacy: Dict):
+        """Seed the store from the data of a legacy JSON progress file (file granularity, no per-record rows)"""
+        stat_columns = {
+            1: lambda s: (s.get('legal_docs_found', 0), s.get('records_processed', 0), 0, 0),
+            2: lambda s: (s.get('filtered_docs', 0), 0, 0, 0),
+            3: lambda s: (s.get('extracted_passages', 0), 0, s.get('tokens_used', 0), s.get('preclassifier_skipped', 0)),
+        }
+        rows = []
+        for phase, columns in stat_columns.items():
+            for warc_key, stats in legacy.get(f'phase_{phase}', {}).get('stats', {}).items():
+                rows.append((phase, warc_key, *columns(stats), stats.get('timestamp')))
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (phase, warc_key, documents, records_processed, tokens_used, "
+                "preclassifier_skipped, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO spend (phase, warc_key, calls, tokens_used) VALUES (?, ?, 0, ?)",
+                [(row[0], row[1], row[4]) for row in rows if row[0] == 3]
+            )
+            self._conn.execute("COMMIT")
+
+        for key, default in self._default_state().items():
+            value = legacy.get(key, default)
+            if key.startswith('phase_'):
+                value = {'completed': value.get('completed', False),
+                         'current_file_index': value.get('current_file_index', 0), 'stats': {}}
+            self.progress_data[key] = value
+        self.progress_data['overall_stats'] = self.get_overall_stats()
+        self.save_progress()
+
+    def record_spend(self, phase: int, warc_key: str, tokens_used: int):
+        """Add the tokens of one analysis, successful or not, to the WARC's spend"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO spend (phase, warc_key, calls, tokens_used) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (phase, warc_key) DO UPDATE SET calls = calls + 1, "
+                "tokens_used = tokens_used + excluded.tokens_used",
+                (phase, warc_key, tokens_used)
+            )
+
+    def get_completed_records(self, phase: int, warc_key: str) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record_id FROM records WHERE phase = ? AND warc_key = ?", (phase, warc_key)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def get_completed_files(self, phase: int) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT warc_key FROM files WHERE phase = ?", (phase,)).fetchall()
+        return {row[0] for row in rows}
+
+    def get_overall_stats(self) -> Dict:
+        """Totals across the run, aggregated in SQL"""
+        with self._lock:
+            records_processed, found_phase1 = self._conn.execute(
+                "SELECT COALESCE(SUM(records_processed), 0), COALESCE(SUM(documents), 0) FROM files WHERE phase = 1"
+            ).fetchone()
+            filtered_phase2 = self._conn.execute(
+                "SELECT COALESCE(SUM(documents), 0) FROM files WHERE phase = 2"
+            ).fetchone()[0]
+            skipped, tokens_saved = self._conn.execute(
+                "SELECT COALESCE(SUM(preclassifier_skipped), 0), COALESCE(SUM(tokens_saved_estimate), 0) "
+                "FROM files WHERE phase = 3"
+            ).fetchone()
+            # Phase 3 output is counted per record so resumed files are not double counted
+            passages = self._conn.execute("SELECT COUNT(*) FROM records WHERE phase = 3").fetchone()[0]
+            # Files imported from a JSON progress file have no records, only their passage count
+            passages += self._conn.execute(
+                "SELECT COALESCE(SUM(documents), 0) FROM files WHERE phase = 3 AND NOT EXISTS "
+                "(SELECT 1 FROM records WHERE records.phase = 3 AND records.warc_key = files.warc_key)"
+            ).fetchone()[0]
+            # Spend also covers failed and retried calls, which never become records
+            tokens = self._conn.execute(
+                "SELECT COALESCE(SUM(tokens_used), 0) FROM spend WHERE phase = 3"
+            ).fetchone()[0]
+
+        return {
+            'total_records_processed': records_processed,
+            'legal_documents_found_phase1': found_phase1,
+            'legal_documents_filtered_phase2': filtered_phase2,
+            'passages_extracted_phase3': passages,
+            'total_openai_tokens_used': tokens,
+            'preclassifier_skipped_phase3': skipped,
+            'preclassifier_tokens_saved_estimate': tokens_saved
+        }
+
+    def complete_phase(self, phase: int):
+        """Mark a phase as completed"""
+        self.progress_data[f'phase_{phase}']['completed'] = True
+        self.save_progress()
+
+    def get_phase_start_index(self, phase: int) -> int:
+        """Get the starting index for resuming a phase"""
+        return self.progress_data[f'phase_{phase}']['current_file_index']
+
+    def reset(self):
+        """Reset all progress"""
+        with self._lock:
+            self._conn.executescript("DELETE FROM state; DELETE FROM files; DELETE FROM records; DELETE FROM spend;")
+        self.progress_data = self._load_progress()
+        self.save_progress()
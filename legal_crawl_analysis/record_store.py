@@ -0,0 +1,278 @@
+"""
+Random-access WARC record store
+Every WARC the pipeline writes gets a CDXJ sidecar (`<warc>.cdxj`, one
+`<surt> <timestamp> {json}` line per record, the format UrlIndex reads) holding the
+URL, record ID, payload digest and the offset and length of the record's gzip
+member. WarcRecordStore looks records up by URL, record ID or digest, seeks to the
+member and decompresses only that, so one record costs O(1) instead of a file scan.
+"""
+
+import argparse
+import io
+import json
+import logging
+import shutil
+import sys
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+from .handoff import CLAIM_DIR_NAME
+from .config import RECORD_INDEX_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RecordEntry:
+    """Location and identity of one record: its gzip member in the WARC"""
+    url: Optional[str]
+    record_id: Optional[str]
+    digest: Optional[str]
+    rec_type: str
+    offset: int
+    length: int
+
+def index_path_for(warc_file: Path) -> Path:
+    return warc_file.with_name(warc_file.name + RECORD_INDEX_SUFFIX)
+
+def find_index(warc_file: Path) -> Optional[Path]:
+    """The sidecar of a WARC; a claimed WARC's sidecar stays in the hand-off directory"""
+    candidates = [index_path_for(warc_file)]
+    if warc_file.parent.name == CLAIM_DIR_NAME:
+        candidates.append(index_path_for(warc_file.parent.parent / warc_file.name))
+    return next((path for path in candidates if path.exists()), None)
+
+def surt_key(url: str) -> str:
+    """SURT-style sort key: reversed host labels without www, then path and query (`com,example)/terms`)"""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url.lower()
+    host = (parts.hostname or '').rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    key = ','.join(reversed(host.split('.'))) + ')' + (parts.path or '/')
+    if parts.query:
+        key += '?' + parts.query
+    return key.lower()
+
+def index_line(record, filename: str, offset: int, length: int) -> str:
+    """CDXJ line of a record written at offset with the given member length"""
+    url = record.rec_headers.get_header('WARC-Target-URI')
+    warc_date = record.rec_headers.get_header('WARC-Date') or ''
+    fields = {
+        'url': url,
+        'filename': filename,
+        'offset': offset,
+        'length': length,
+        'record_id': record.rec_headers.get_header('WARC-Record-ID'),
+        'digest': record.rec_headers.get_header('WARC-Payload-Digest'),
+        'rec_type': record.rec_type
+    }
+    if record.rec_type == 'response' and record.http_headers:
+        fields['status'] = record.http_headers.get_statuscode()
+    timestamp = ''.join(c for c in warc_date if c.isdigit())[:14] or '-'
+    return f"{surt_key(url) if url else '-'} {timestamp} {json.dumps(fields, ensure_ascii=False)}"
+
+def write_index(warc_file: Path, lines: List[str]):
+    """Write the sidecar of a WARC atomically, sorted by key as CDXJ is"""
+    path = index_path_for(warc_file)
+    partial = path.with_name(path.name + ".partial")
+    with open(partial, 'w', encoding='utf-8') as f:
+        for line in sorted(lines):
+            f.write(line + '\n')
+    partial.replace(path)
+
+def build_index(warc_file: Path, save: bool = True) -> List[str]:
+    """Index lines of an existing WARC from one scan (for WARCs written without a sidecar)"""
+    from warcio.archiveiterator import ArchiveIterator
+
+    lines = []
+    with open(warc_file, 'rb') as f:
+        iterator = ArchiveIterator(f)
+        for record in iterator:
+            # Offsets of the compressed member are only known once the record is read to its end
+            iterator.read_to_end(record)
+            lines.append(index_line(record, warc_file.name, iterator.get_record_offset(),
+                                    iterator.get_record_length()))
+    if save:
+        try:
+            write_index(warc_file, lines)
+        except OSError as e:
+            logger.warning(f"Could not save record index of {warc_file}: {e}")
+    return lines
+
+def move_warc(source: Path, destination: Path):
+    """Move a WARC together with its sidecar"""
+    index = find_index(source)
+    shutil.move(str(source), str(destination))
+    if index is not None:
+        shutil.move(str(index), str(index_path_for(destination)))
+
+def remove_warc(warc_file: Path):
+    """Delete a WARC and its sidecar"""
+    index = find_index(warc_file)
+    warc_file.unlink(missing_ok=True)
+    if index is not None:
+        index.unlink(missing_ok=True)
+
+def parse_index(lines: Iterable[str]) -> List[RecordEntry]:
+    """Entries of sidecar lines, in file order"""
+    entries = []
+    for line in lines:
+        parts = line.split(' ', 2)
+        if len(parts) < 3:
+            continue
+        fields = json.loads(parts[2])
+        entries.append(RecordEntry(fields.get('url'), fields.get('record_id'), fields.get('digest'),
+                                   fields.get('rec_type', 'response'), int(fields['offset']), int(fields['length'])))
+    entries.sort(key=lambda entry: entry.offset)
+    return entries
+
+class IndexingWarcWriter:
+    """Gzipped WARCWriter that notes where each record's member lands, for the sidecar of warc_file"""
+
+    def __init__(self, output_f, warc_file: Path):
+        from warcio.warcwriter import WARCWriter
+
+        self.output_f = output_f
+        self.warc_file = warc_file
+        self.writer = WARCWriter(output_f, gzip=True)
+        self.lines: List[str] = []
+
+    def write_record(self, record):
+        offset = self.output_f.tell()
+        self.writer.write_record(record)
+        self.lines.append(index_line(record, self.warc_file.name, offset, self.output_f.tell() - offset))
+
+    def write_index(self):
+        """Write the sidecar; before the WARC is published, so consumers always find it"""
+        write_index(self.warc_file, self.lines)
+
+class WarcRecordStore:
+    """Random access to the records of one WARC through its sidecar (built on first use if missing)"""
+
+    def __init__(self, warc_file: Path, build_missing: bool = True):
+        self.warc_file = Path(warc_file)
+        self.build_missing = build_missing
+        self._entries: Optional[List[RecordEntry]] = None
+        self._by_url: Dict[str, List[RecordEntry]] = {}
+        self._by_id: Dict[str, RecordEntry] = {}
+        self._by_digest: Dict[str, List[RecordEntry]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> List[RecordEntry]:
+        with self._lock:
+            if self._entries is not None:
+                return self._entries
+            index = find_index(self.warc_file)
+            entries = None
+            if index is not None:
+                with open(index, 'r', encoding='utf-8') as f:
+                    entries = parse_index(f.read().splitlines())
+                # A sidecar that does not end where the WARC ends belongs to another file of the same name
+                if (entries[-1].offset + entries[-1].length if entries else 0) != self.warc_file.stat().st_size:
+                    logger.warning(f"Record index of {self.warc_file.name} does not match the file; ignoring it")
+                    entries = None
+            if entries is None:
+                if not self.build_missing:
+                    raise FileNotFoundError(f"No record index for {self.warc_file}")
+                logger.info(f"No record index for {self.warc_file.name}; building it")
+                entries = parse_index(build_index(self.warc_file))
+            for entry in entries:
+                if entry.url:
+                    self._by_url.setdefault(entry.url, []).append(entry)
+                if entry.record_id:
+                    self._by_id[entry.record_id] = entry
+                if entry.digest:
+                    self._by_digest.setdefault(entry.digest, []).append(entry)
+            self._entries = entries
+            return entries
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def entries(self) -> List[RecordEntry]:
+        """All records, in file order"""
+        return list(self._load())
+
+    def lookup(self, url: Optional[str] = None, record_id: Optional[str] = None, digest: Optional[str] = None,
+               rec_types: Optional[Iterable[str]] = None) -> Optional[RecordEntry]:
+        """First record (in file order) matching the record ID, digest or URL, optionally of the given types"""
+        self._load()
+        if record_id is not None:
+            candidates = [self._by_id[record_id]] if record_id in self._by_id else []
+        elif digest is not None:
+            candidates = self._by_digest.get(digest, [])
+        else:
+            candidates = self._by_url.get(url, [])
+        if rec_types is not None:
+            rec_types = set(rec_types)
+            candidates = [entry for entry in candidates if entry.rec_type in rec_types]
+        return candidates[0] if candidates else None
+
+    def read(self, entry: RecordEntry):
+        """The record at an entry, parsed from its gzip member alone"""
+        from warcio.archiveiterator import ArchiveIterator
+
+        with open(self.warc_file, 'rb') as f:
+            f.seek(entry.offset)
+            data = f.read(entry.length)
+        return next(iter(ArchiveIterator(io.BytesIO(data))))
+
+    def get(self, url: Optional[str] = None, record_id: Optional[str] = None, digest: Optional[str] = None,
+            rec_types: Optional[Iterable[str]] = None):
+        """The matching record, or None"""
+        entry = self.lookup(url, record_id, digest, rec_types)
+        return self.read(entry) if entry else None
+
+    def iter_records(self, entries: Iterable[RecordEntry]) -> Iterator:
+        """Records of the given entries, read in file order"""
+        for entry in sorted(entries, key=lambda entry: entry.offset):
+            yield self.read(entry)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print one record of a pipeline WARC by URL, record ID or payload digest, or (re)build sidecars"
+    )
+    parser.add_argument("warc", nargs='+', help="WARC file(s)")
+    lookup = parser.add_mutually_exclusive_group()
+    lookup.add_argument("--url", help="Target URL of the record")
+    lookup.add_argument("--record-id", help="WARC-Record-ID, e.g. '<urn:uuid:...>'")
+    lookup.add_argument("--digest", help="WARC-Payload-Digest, e.g. 'sha1:...'")
+    lookup.add_argument("--list", action="store_true", help="List the indexed records")
+    lookup.add_argument("--build", action="store_true", help="Rebuild the sidecar index of each WARC")
+    parser.add_argument("--headers-only", action="store_true", help="Print the record headers without the payload")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+    if args.build:
+        for warc in args.warc:
+            lines = build_index(Path(warc))
+            print(f"{index_path_for(Path(warc))}: {len(lines)} records")
+        return
+
+    if args.list or not (args.url or args.record_id or args.digest):
+        for warc in args.warc:
+            for entry in WarcRecordStore(Path(warc)).entries():
+                print(f"{entry.offset}\t{entry.length}\t{entry.rec_type}\t{entry.record_id}\t{entry.url}")
+        return
+
+    for warc in args.warc:
+        record = WarcRecordStore(Path(warc)).get(args.url, args.record_id, args.digest)
+        if record is None:
+            continue
+        out = sys.stdout.buffer
+        out.write(record.rec_headers.to_str().encode('utf-8'))
+        if record.http_headers:
+            out.write(record.http_headers.to_str().encode('utf-8'))
+        if not args.headers_only:
+            out.write(record.content_stream().read())
+        out.flush()
+        return
+    sys.exit(f"No matching record in {', '.join(args.warc)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Model-tier routing for Phase 3
+Sends simple documents (e.g. a lone "all rights reserved" footer) to a cheaper,
+faster model tier and escalates only long or ambiguous documents to the full model.
+"""
+
+import logging
+import re
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+from .llm_backends import count_tokens
+from .models import ModelTierStats
+from .config import GPT_PROMPT_TEXT_CHARS
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ModelTier:
+    """A model the router can send documents to"""
+    name: str
+    model: str
+    max_tokens: int
+
+@dataclass
+class RoutingDecision:
+    """Which tier a document goes to and why"""
+    tier: ModelTier
+    reason: str
+    token_count: int
+
+class ModelTierRouter:
+    """Routes documents between a cheap tier and a full tier using token counts and Phase 2 signals"""
+
+    # Language that usually means a nuanced copyright/licensing clause worth the full model
+    LICENSING_PATTERNS = [
+        re.compile(r'\byou (?:hereby )?grant\b', re.IGNORECASE),
+        re.compile(r'\b(?:non-?exclusive|royalty-?free|perpetual|irrevocable|sublicensable)\b', re.IGNORECASE),
+        re.compile(r'\buser[- ](?:generated )?content\b', re.IGNORECASE),
+        re.compile(r'\byou (?:retain|own)\b', re.IGNORECASE),
+        re.compile(r'\b(?:public domain|creative commons|cc[- ]by)\b', re.IGNORECASE),
+        re.compile(r'\b(?:dmca|infring\w*)\b', re.IGNORECASE),
+        re.compile(r'\btext and data mining\b|\bmachine learning\b|\bscrap\w*\b', re.IGNORECASE),
+    ]
+
+    # Categories in a cheap-tier answer that trigger a second opinion from the full tier
+    ESCALATE_ON_CATEGORIES = {'AMBIGUOUS_COPYRIGHT'}
+
+    def __init__(self, fast_tier: ModelTier, full_tier: ModelTier, long_document_tokens: int = 1500,
+                 min_phase2_confidence: float = 0.5, ambiguity_margin: float = 0.15,
+                 token_count_chars: int = GPT_PROMPT_TEXT_CHARS):
+        self.fast_tier = fast_tier
+        self.full_tier = full_tier
+        self.long_document_tokens = long_document_tokens
+        self.min_phase2_confidence = min_phase2_confidence
+        self.ambiguity_margin = ambiguity_margin
+        self.token_count_chars = token_count_chars
+
+        self._lock = threading.Lock()
+        self.stats: Dict[str, ModelTierStats] = {
+            tier.name: ModelTierStats(
+                tier=tier.name, model=tier.model, documents_routed=0, escalations_received=0,
+                total_tokens_used=0, processing_time_seconds=0.0, routing_reasons={}
+            )
+            for tier in (fast_tier, full_tier)
+        }
+
+    def route(self, clean_text: str, phase2_result: Optional[Dict] = None) -> RoutingDecision:
+        """Pick a tier for a document before it is analyzed"""
+        # Counted over the text the prompt actually sends
+        token_count = count_tokens(clean_text[:self.token_count_chars], self.full_tier.model)
+
+        if token_count > self.long_document_tokens:
+            return RoutingDecision(self.full_tier, 'long_document', token_count)
+
+        if phase2_result:
+            scores = sorted((phase2_result.get('confidence_scores') or {}).values(), reverse=True)
+            if scores and scores[0] < self.min_phase2_confidence:
+                return RoutingDecision(self.full_tier, 'low_phase2_confidence', token_count)
+            if len(scores) > 1 and scores[0] - scores[1] < self.ambiguity_margin:
+                return RoutingDecision(self.full_tier, 'ambiguous_document_types', token_count)
+
+        if any(pattern.search(clean_text) for pattern in self.LICENSING_PATTERNS):
+            return RoutingDecision(self.full_tier, 'licensing_language', token_count)
+
+        return RoutingDecision(self.fast_tier, 'simple', token_count)
+
+    def needs_escalation(self, decision: RoutingDecision, analysis: Dict) -> bool:
+        """Whether a cheap-tier answer is ambiguous enough to re-run on the full tier"""
+        if decision.tier is not self.fast_tier:
+            return False
+        return any(clause.get('category') in self.ESCALATE_ON_CATEGORIES
+                   for clause in analysis.get('copyright_clauses', []))
+
+    def record(self, tier: ModelTier, reason: str, tokens_used: int, latency_seconds: float,
+               escalation: bool = False):
+        """Account tokens and latency for one analysis on a tier"""
+        with self._lock:
+            stats = self.stats[tier.name]
+            # An escalated document was routed to the cheap tier; here it counts only as an escalation
+            if escalation:
+                stats.escalations_received += 1
+            else:
+                stats.documents_routed += 1
+            stats.total_tokens_used += tokens_used
+            stats.processing_time_seconds += latency_seconds
+            stats.routing_reasons[reason] = stats.routing_reasons.get(reason, 0) + 1
+
+    def get_stats(self) -> List[Dict]:
+        """Per-tier token and latency accounting"""
+        with self._lock:
+            result = []
+            for stats in self.stats.values():
+                data = asdict(stats)
+                analyses = stats.documents_routed + stats.escalations_received
+                data['avg_tokens_per_document'] = stats.total_tokens_used / max(analyses, 1)
+                data['avg_latency_seconds'] = stats.processing_time_seconds / max(analyses, 1)
+                result.append(data)
+            return result
+
+def build_default_router(full_model: str, full_max_tokens: int, fast_model: str, fast_max_tokens: int,
+                         long_document_tokens: int) -> ModelTierRouter:
+    """Two-tier router from configuration values"""
+    return ModelTierRouter(
+        fast_tier=ModelTier('fast', fast_model, fast_max_tokens),
+        full_tier=ModelTier('full', full_model, full_max_tokens),
+        long_document_tokens=long_document_tokens
+    )
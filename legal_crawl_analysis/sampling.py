@@ -0,0 +1,259 @@
+"""
+Statistical sampling of a crawl
+Draws a stratified random sample of WARC files (strata are runs of consecutive crawl
+segments) and a hash-based random sample of records within each file, so the normal
+phases run on a small fraction of the crawl. Crawl-wide totals and prevalences are
+estimated with a two-stage (files, then records) estimator and normal-approximation
+confidence intervals. The plan, including every sampled record ID, is saved as JSON
+and can be loaded to rerun exactly the same sample.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import random
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from statistics import NormalDist, mean, variance
+from typing import Dict, List, Optional
+
+from .config import SAMPLE_RECORD_FRACTION, SAMPLE_SEED, SAMPLE_CONFIDENCE
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SampledFile:
+    """A sampled WARC and, once Phase 1 has read it, its record counts and sampled record IDs"""
+    warc_path: str
+    stratum: str
+    records_total: int = 0
+    phase1_candidates: int = 0
+    record_ids: List[str] = field(default_factory=list)
+    observed: bool = False
+
+def warc_segment(warc_path: str) -> str:
+    """CommonCrawl segment of a WARC path (`.../segments/<segment>/warc/...`), else its directory"""
+    parts = warc_path.split('/')
+    if 'segments' in parts[:-1]:
+        return parts[parts.index('segments') + 1]
+    return str(Path(warc_path).parent)
+
+def build_strata(warc_paths: List[str], n_strata: int) -> Dict[str, List[str]]:
+    """Group consecutive segments into about n_strata strata of similar file counts"""
+    segments: Dict[str, List[str]] = {}
+    for warc_path in warc_paths:
+        segments.setdefault(warc_segment(warc_path), []).append(warc_path)
+    names = sorted(segments)
+    n_strata = max(1, min(n_strata, len(names)))
+    per_stratum = len(warc_paths) / n_strata
+
+    strata: Dict[str, List[str]] = {}
+    group: List[str] = []
+    files = 0
+    for name in names:
+        group.append(name)
+        files += len(segments[name])
+        # Close the stratum once it reaches its share of the files (the last one takes the rest)
+        if files >= per_stratum * (len(strata) + 1) or name == names[-1]:
+            label = group[0] if len(group) == 1 else f"{group[0]}..{group[-1]}"
+            strata[label] = [path for segment in group for path in segments[segment]]
+            group = []
+    return strata
+
+def allocate(sizes: Dict[str, int], n: int) -> Dict[str, int]:
+    """Proportional allocation of n sampled files to strata (largest remainder, at most the stratum size)"""
+    total = sum(sizes.values())
+    quotas = {name: n * size / total for name, size in sizes.items()}
+    counts = {name: min(int(quota), sizes[name]) for name, quota in quotas.items()}
+    for name in sorted(quotas, key=lambda name: quotas[name] - int(quotas[name]), reverse=True):
+        if sum(counts.values()) >= n:
+            break
+        if counts[name] < sizes[name]:
+            counts[name] += 1
+    return counts
+
+def record_hash_fraction(seed: int, record_id: str) -> float:
+    """Stable uniform value in [0, 1) for a record, independent of file order and process"""
+    digest = hashlib.blake2b(f"{seed}:{record_id}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+def wilson_interval(successes: int, trials: int, z: float):
+    """Wilson score interval of a proportion"""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z ** 2 / trials
+    center = (p + z ** 2 / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+    return max(center - half_width, 0.0), min(center + half_width, 1.0)
+
+class CrawlSample:
+    """A stratified two-stage sample of a crawl: which WARCs and records the phases see, and the estimates"""
+
+    def __init__(self, files: int, record_fraction: float = SAMPLE_RECORD_FRACTION, seed: int = SAMPLE_SEED,
+                 confidence: float = SAMPLE_CONFIDENCE):
+        if files < 1:
+            raise ValueError(f"A sample needs at least one WARC file, got {files}")
+        if not 0 < record_fraction <= 1:
+            raise ValueError(f"Record fraction must be in (0, 1], got {record_fraction}")
+        self.files_requested = files
+        self.record_fraction = record_fraction
+        self.seed = seed
+        self.confidence = confidence
+        self.population: Dict[str, int] = {}  # stratum -> WARC files in the crawl
+        self.files: Dict[str, SampledFile] = {}
+        # A loaded plan selects exactly its recorded record IDs instead of hashing
+        self.fixed_record_ids = False
+        self._id_sets: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def draw_files(self, warc_paths: List[str]) -> List[str]:
+        """Sampled WARC paths, in crawl order (a loaded plan keeps its own files)"""
+        if not self.files:
+            # Two files per stratum, so every stratum has a between-file variance
+            strata = build_strata(warc_paths, max(1, self.files_requested // 2))
+            counts = allocate({name: len(paths) for name, paths in strata.items()}, self.files_requested)
+            rng = random.Random(self.seed)
+            self.population = {name: len(paths) for name, paths in strata.items()}
+            for name, paths in strata.items():
+                for warc_path in rng.sample(paths, counts[name]):
+                    self.files[warc_path] = SampledFile(warc_path, name)
+            logger.info(f"Sampled {len(self.files)} of {len(warc_paths):,} WARC files in {len(strata)} strata, "
+                        f"{self.record_fraction:.1%} of their records")
+        order = {warc_path: i for i, warc_path in enumerate(warc_paths)}
+        return sorted(self.files, key=lambda warc_path: order.get(warc_path, len(order)))
+
+    def selects(self, warc_path: str, record_id: Optional[str]) -> bool:
+        """Whether a record of a sampled WARC is in the sample"""
+        if self.fixed_record_ids:
+            if warc_path not in self._id_sets:
+                self._id_sets[warc_path] = set(self.files[warc_path].record_ids) if warc_path in self.files else set()
+            return record_id in self._id_sets[warc_path]
+        return record_id is not None and record_hash_fraction(self.seed, record_id) < self.record_fraction
+
+    def observe_file(self, warc_path: str, records_total: int, record_ids: List[str], phase1_candidates: int):
+        """Record what Phase 1 saw of a sampled WARC"""
+        with self._lock:
+            sampled = self.files.setdefault(warc_path, SampledFile(warc_path, warc_segment(warc_path)))
+            sampled.records_total = records_total
+            sampled.record_ids = list(record_ids)
+            sampled.phase1_candidates = phase1_candidates
+            sampled.observed = True
+
+    def restore_observations(self, path: Path):
+        """Take over the observations of files an interrupted run already read (same seed and fraction)"""
+        previous = CrawlSample.load(path)
+        with self._lock:
+            for warc_path, sampled in previous.files.items():
+                if sampled.observed and warc_path in self.files:
+                    self.files[warc_path] = sampled
+
+    def save(self, path: Path):
+        with self._lock:
+            data = {
+                'files_requested': self.files_requested,
+                'record_fraction': self.record_fraction,
+                'seed': self.seed,
+                'confidence': self.confidence,
+                'population': self.population,
+                'files': [asdict(sampled) for sampled in self.files.values()]
+            }
+        partial = path.with_name(path.name + ".partial")
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        partial.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'CrawlSample':
+        """A saved plan; it selects the same WARCs and record IDs again"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        sample = cls(data['files_requested'], data['record_fraction'], data['seed'],
+                     data.get('confidence', SAMPLE_CONFIDENCE))
+        sample.population = data['population']
+        sample.files = {row['warc_path']: SampledFile(**row) for row in data['files']}
+        sample.fixed_record_ids = all(sampled.observed for sampled in sample.files.values())
+        return sample
+
+    def estimate(self, counts: Dict[str, Dict[str, int]]) -> Dict:
+        """
+        Crawl-wide totals and prevalences from per-file counts of sampled records
+        (warc_path -> metric -> count); only files Phase 1 observed contribute
+        """
+        observed = [sampled for sampled in self.files.values() if sampled.observed and sampled.record_ids]
+        z = NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        metrics = sorted({metric for file_counts in counts.values() for metric in file_counts})
+        summary = {
+            'confidence': self.confidence,
+            'files_in_crawl': sum(self.population.values()),
+            'files_sampled': len(observed),
+            'record_fraction': self.record_fraction,
+            'records_sampled': sum(len(sampled.record_ids) for sampled in observed),
+            'strata': len(self.population),
+            'variance': 'between-file',
+            'estimates': {}
+        }
+        if not observed:
+            return summary
+
+        # Strata with a single observed file have no variance of their own: pool all files instead
+        by_stratum: Dict[str, List[SampledFile]] = {}
+        for sampled in observed:
+            by_stratum.setdefault(sampled.stratum, []).append(sampled)
+        if any(len(files) < 2 for files in by_stratum.values()) and len(observed) >= 2:
+            by_stratum = {'all': observed}
+            population = {'all': sum(self.population.values()) or len(observed)}
+            summary['variance'] = 'between-file (strata collapsed)'
+        else:
+            population = {name: self.population.get(name, len(files)) for name, files in by_stratum.items()}
+        if len(observed) < 2:
+            summary['variance'] = 'within-file only'
+
+        records_total = self._stratified_total(by_stratum, population, lambda sampled: sampled.records_total)
+        summary['records_in_crawl_estimate'] = round(records_total)
+        for metric in metrics:
+            def expanded(sampled: SampledFile) -> float:
+                # Records of the file with the metric: sampled count scaled to all records of the file
+                return counts.get(sampled.warc_path, {}).get(metric, 0) * sampled.records_total / len(sampled.record_ids)
+            total = self._stratified_total(by_stratum, population, expanded)
+            prevalence = total / records_total if records_total else 0.0
+            row = {
+                'sample_count': sum(counts.get(sampled.warc_path, {}).get(metric, 0) for sampled in observed),
+                'estimate': round(total),
+                'prevalence': prevalence
+            }
+            if len(observed) >= 2:
+                # Linearized variance of the ratio estimator from between-file residuals
+                residual_variance = self._stratified_variance(
+                    by_stratum, population, lambda sampled: expanded(sampled) - prevalence * sampled.records_total)
+                prevalence_se = math.sqrt(residual_variance) / records_total if records_total else 0.0
+                total_se = math.sqrt(self._stratified_variance(by_stratum, population, expanded))
+                row.update({
+                    'ci_low': max(round(total - z * total_se), 0),
+                    'ci_high': round(total + z * total_se),
+                    'prevalence_ci_low': max(prevalence - z * prevalence_se, 0.0),
+                    'prevalence_ci_high': min(prevalence + z * prevalence_se, 1.0)
+                })
+            else:
+                # One file: only the record sampling is random (Wilson interval); the file itself is not
+                low, high = wilson_interval(row['sample_count'], summary['records_sampled'], z)
+                row.update({'ci_low': None, 'ci_high': None, 'prevalence_ci_low': low, 'prevalence_ci_high': high})
+            summary['estimates'][metric] = row
+        return summary
+
+    @staticmethod
+    def _stratified_total(by_stratum: Dict[str, List[SampledFile]], population: Dict[str, int], value) -> float:
+        return sum(population[name] * mean(value(sampled) for sampled in files) for name, files in by_stratum.items())
+
+    @staticmethod
+    def _stratified_variance(by_stratum: Dict[str, List[SampledFile]], population: Dict[str, int], value) -> float:
+        """Variance of a stratified total with finite population correction (files as the sampling units)"""
+        total = 0.0
+        for name, files in by_stratum.items():
+            n, big_n = len(files), population[name]
+            if n < 2:
+                continue
+            total += big_n ** 2 * (1 - n / big_n) * variance([value(sampled) for sampled in files]) / n
+        return total
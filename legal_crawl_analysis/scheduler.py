@@ -0,0 +1,227 @@
+"""
+Budget-aware priority scheduling for Phase 3
+Orders documents across all Phase 2 outputs by a priority function, spends a
+token or dollar budget on the highest-value documents first and records
+whatever could not be afforded so a later run can pick it up.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .config import GPT_COST_PER_TOKEN_USD, PHASE3_PRIORITY, DOMAIN_NOVELTY_DECAY, PHASE3_DEFERRED_FILE
+from .preclassifier import estimate_analysis_tokens_for_length
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Phase3WorkItem:
+    """A single document waiting for Phase 3 analysis"""
+    warc_file: str
+    url: str
+    domain: str
+    priority: float
+    estimated_tokens: int
+    metadata: Dict = field(default_factory=dict)
+
+def _phase2_analysis(metadata: Dict) -> Dict:
+    analysis = metadata.get('phase2_analysis') or {}
+    if isinstance(analysis, str):
+        try:
+            analysis = json.loads(analysis)
+        except json.JSONDecodeError:
+            analysis = {}
+    return analysis
+
+def confidence_priority(metadata: Dict) -> float:
+    """Phase 2 total confidence"""
+    return float(metadata.get('confidence_score') or _phase2_analysis(metadata).get('total_confidence', 0.0))
+
+def copyright_priority(metadata: Dict) -> float:
+    """Copyright documents first, then documents mentioning copyright, ties broken by confidence"""
+    analysis = _phase2_analysis(metadata)
+    if analysis.get('primary_type') == 'copyright':
+        boost = 2.0
+    elif 'copyright' in (analysis.get('document_types') or []):
+        boost = 1.0
+    else:
+        boost = 0.0
+    return boost + confidence_priority(metadata)
+
+def preclassifier_priority(metadata: Dict) -> float:
+    """Pre-classifier score when Phase 2 recorded one, otherwise Phase 2 confidence"""
+    score = metadata.get('preclassifier_score')
+    return float(score) if score is not None else confidence_priority(metadata)
+
+def links_priority(metadata: Dict) -> float:
+    """Link-graph targets first, by how many of their site's pages link to them, ties broken by confidence"""
+    boost = 0.0
+    if metadata.get('link_target'):
+        boost = 2.0 + min(int(metadata.get('link_sources') or 0), 100) / 100
+    return boost + confidence_priority(metadata)
+
+PRIORITY_FUNCTIONS: Dict[str, Callable[[Dict], float]] = {
+    'confidence': confidence_priority,
+    'copyright': copyright_priority,
+    'preclassifier': preclassifier_priority,
+    'links': links_priority,
+}
+
+class TokenBudget:
+    """Token/dollar budget with an optional tokens-per-minute throttle"""
+
+    def __init__(self, max_tokens: Optional[int] = None, max_usd: Optional[float] = None,
+                 cost_per_token_usd: float = GPT_COST_PER_TOKEN_USD, max_tokens_per_minute: Optional[int] = None):
+        limits = []
+        if max_tokens is not None:
+            limits.append(max_tokens)
+        if max_usd is not None:
+            limits.append(int(max_usd / cost_per_token_usd))
+        self.max_tokens = min(limits) if limits else None
+        self.cost_per_token_usd = cost_per_token_usd
+        self.max_tokens_per_minute = max_tokens_per_minute
+
+        self.tokens_spent = 0
+        self._lock = threading.Lock()
+        self._window: List[Tuple[float, int]] = []
+
+    @property
+    def remaining_tokens(self) -> Optional[int]:
+        if self.max_tokens is None:
+            return None
+        return max(self.max_tokens - self.tokens_spent, 0)
+
+    def can_afford(self, estimated_tokens: int) -> bool:
+        with self._lock:
+            return self.max_tokens is None or self.tokens_spent + estimated_tokens <= self.max_tokens
+
+    def charge(self, tokens: int):
+        with self._lock:
+            self.tokens_spent += tokens
+            if self.max_tokens_per_minute:
+                self._window.append((time.monotonic(), tokens))
+
+    def throttle(self):
+        """Block until the last minute's spend is under the tokens-per-minute limit"""
+        if not self.max_tokens_per_minute:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._window = [(t, n) for t, n in self._window if now - t < 60]
+                spent = sum(n for _, n in self._window)
+                if spent < self.max_tokens_per_minute:
+                    return
+                wait = 60 - (now - self._window[0][0])
+            logger.info(f"Phase 3 throttled: {spent:,} tokens in the last minute, waiting {wait:.1f}s")
+            time.sleep(max(wait, 0.1))
+
+    def get_stats(self) -> Dict:
+        return {
+            'max_tokens': self.max_tokens,
+            'tokens_spent': self.tokens_spent,
+            'estimated_cost_usd': self.tokens_spent * self.cost_per_token_usd,
+            'remaining_tokens': self.remaining_tokens
+        }
+
+class Phase3Scheduler:
+    """Builds a global priority order over Phase 2 outputs and splits it into a plan and a deferred list"""
+
+    def __init__(self, budget: TokenBudget, priority: str = PHASE3_PRIORITY,
+                 domain_novelty_decay: float = DOMAIN_NOVELTY_DECAY, deferred_file: str = PHASE3_DEFERRED_FILE):
+        if priority not in PRIORITY_FUNCTIONS:
+            raise ValueError(f"Unknown Phase 3 priority function: {priority}")
+        self.budget = budget
+        self.priority = priority
+        self.priority_function = PRIORITY_FUNCTIONS[priority]
+        self.domain_novelty_decay = domain_novelty_decay
+        self.deferred_file = deferred_file
+
+    def collect_candidates(self, phase2_dir: Path, phase3_dir: Path) -> List[Phase3WorkItem]:
+        """All documents from Phase 2 metadata plus documents deferred by an earlier run"""
+        items = []
+        seen = set()
+
+        for metadata_json in sorted(phase2_dir.glob("*_metadata.json")):
+            warc_name = metadata_json.name.replace('_metadata.json', '.gz')
+            if not (phase2_dir / warc_name).exists():
+                continue
+            with open(metadata_json, 'r', encoding='utf-8') as f:
+                for doc in json.load(f):
+                    items.append(self._make_item(warc_name, doc))
+                    seen.add((warc_name, doc['url']))
+
+        # Deferred documents of WARCs that were never started are already covered above
+        deferred_path = phase3_dir / self.deferred_file
+        if deferred_path.exists():
+            with open(deferred_path, 'r', encoding='utf-8') as f:
+                for entry in json.load(f).get('documents', []):
+                    if (entry['warc_file'], entry['url']) not in seen:
+                        items.append(self._make_item(entry['warc_file'], entry['metadata']))
+
+        return items
+
+    def _make_item(self, warc_name: str, metadata: Dict) -> Phase3WorkItem:
+        return Phase3WorkItem(
+            warc_file=warc_name,
+            url=metadata['url'],
+            domain=metadata.get('registered_domain') or metadata.get('domain', ''),
+            priority=self.priority_function(metadata),
+            estimated_tokens=estimate_analysis_tokens_for_length(int(metadata.get('clean_text_length') or 0)),
+            metadata=metadata
+        )
+
+    def order(self, items: List[Phase3WorkItem]) -> List[Phase3WorkItem]:
+        """Sort by priority, decaying repeated domains so novel sites come first"""
+        items = sorted(items, key=lambda item: (-item.priority, item.url))
+        if self.domain_novelty_decay < 1.0:
+            seen = defaultdict(int)
+            for item in items:
+                item.priority *= self.domain_novelty_decay ** seen[item.domain]
+                seen[item.domain] += 1
+            items.sort(key=lambda item: (-item.priority, item.url))
+        return items
+
+    def plan(self, items: List[Phase3WorkItem]) -> Tuple[List[Phase3WorkItem], List[Phase3WorkItem]]:
+        """Greedily select the highest-priority documents whose estimates fit the budget"""
+        selected, deferred = [], []
+        planned_tokens = 0
+        limit = self.budget.remaining_tokens
+
+        for item in self.order(items):
+            if limit is None or planned_tokens + item.estimated_tokens <= limit:
+                selected.append(item)
+                planned_tokens += item.estimated_tokens
+            else:
+                deferred.append(item)
+
+        logger.info(f"Phase 3 plan: {len(selected)} documents (~{planned_tokens:,} tokens) selected, "
+                    f"{len(deferred)} deferred")
+        return selected, deferred
+
+    def write_deferred(self, phase3_dir: Path, deferred: List[Phase3WorkItem]):
+        """Record deferred documents for a later run (removes the file when nothing is left)"""
+        deferred_path = phase3_dir / self.deferred_file
+        if not deferred:
+            if deferred_path.exists():
+                deferred_path.unlink()
+            return
+
+        with open(deferred_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'priority': self.priority,
+                'budget': self.budget.get_stats(),
+                'documents': [
+                    {'warc_file': item.warc_file, 'url': item.url, 'priority': item.priority,
+                     'estimated_tokens': item.estimated_tokens, 'metadata': item.metadata}
+                    for item in deferred
+                ]
+            }, f, indent=2, ensure_ascii=False)
+        logger.info(f"Recorded {len(deferred)} deferred Phase 3 documents in {deferred_path}")
@@ -0,0 +1,378 @@
+"""
+Rolled output segments
+Phase 3 leaves about five files per input WARC: the WARC and its record index, and
+the metadata and GPT analysis as JSON and Parquet. SegmentRoller instead appends the
+outputs of finished WARCs to target-size segments. WARC records go to
+`legal_docs-NNNNN.warc.gz`; gzip members concatenate into a valid WARC, and the record
+index follows with shifted offsets. Table rows go to `<table>-NNNNN.parquet`. A
+JSON-lines manifest maps each source WARC to its segment, byte range and row ranges.
+"""
+
+import io
+import json
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .record_store import build_index, find_index, index_path_for, remove_warc
+from .config import SEGMENT_WARC_BYTES, SEGMENT_PARQUET_BYTES, SEGMENT_DIR_NAME, SEGMENT_MANIFEST_FILE
+
+logger = logging.getLogger(__name__)
+
+WARC_SEGMENT_PREFIX = "legal_docs"
+
+# Per-WARC Phase 3 outputs rolled into Parquet segments, by table (JSON file, Parquet twin)
+TABLES = {
+    'metadata': ("{stem}_metadata.json", "{stem}_metadata.parquet"),
+    'gpt_analysis': ("{stem}_gpt_analysis.json", "{stem}_gpt_analysis.parquet"),
+    'preclassifier_skipped': ("{stem}_preclassifier_skipped.json", None),
+}
+
+def segment_name(prefix: str, number: int, suffix: str) -> str:
+    return f"{prefix}-{number:05d}{suffix}"
+
+def segment_number(path: Path) -> int:
+    return int(path.name.split('-')[-1].split('.')[0])
+
+def source_files(phase3_dir: Path, warc_name: str) -> List[Path]:
+    """Per-WARC outputs a rolled WARC leaves behind (except the WARC and its record index)"""
+    stem = Path(warc_name).stem
+    return [phase3_dir / pattern.format(stem=stem) for patterns in TABLES.values() for pattern in patterns if pattern]
+
+def source_rows(phase3_dir: Path, warc_name: str, table: str) -> List[Dict]:
+    """Rows of one per-WARC output table (skipped documents carry the pre-classifier version and threshold)"""
+    json_file = phase3_dir / TABLES[table][0].format(stem=Path(warc_name).stem)
+    if not json_file.exists():
+        return []
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if table == 'preclassifier_skipped':
+        return [{**doc, 'warc_file': warc_name, 'model_version': data.get('model_version'),
+                 'threshold': data.get('threshold')} for doc in data.get('documents', [])]
+    return data
+
+class _RangeReader(io.RawIOBase):
+    """Read-only stream over one byte range of a file"""
+
+    def __init__(self, path: Path, offset: int, length: int):
+        self._file = open(path, 'rb')
+        self._file.seek(offset)
+        self._remaining = length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._file.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+class _WarcSegmentWriter:
+    """Appends WARCs and their record index lines to the current WARC segment, rolling at the target size"""
+
+    def __init__(self, segment_dir: Path, target_bytes: int):
+        self.segment_dir = segment_dir
+        self.target_bytes = target_bytes
+        existing = sorted(segment_dir.glob(f"{WARC_SEGMENT_PREFIX}-*.warc.gz"), key=segment_number)
+        self.number = segment_number(existing[-1]) if existing else 0
+        self.written: List[Path] = []
+
+    @property
+    def path(self) -> Path:
+        return self.segment_dir / segment_name(WARC_SEGMENT_PREFIX, self.number, ".warc.gz")
+
+    def append(self, warc_file: Path) -> Dict:
+        size = self.path.stat().st_size if self.path.exists() else 0
+        if size and size + warc_file.stat().st_size > self.target_bytes:
+            self.number += 1
+            size = 0
+
+        index = find_index(warc_file)
+        if index is not None:
+            with open(index, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        else:
+            lines = build_index(warc_file, save=False)
+
+        with open(warc_file, 'rb') as source, open(self.path, 'ab') as segment:
+            shutil.copyfileobj(source, segment, 1024 * 1024)
+            length = segment.tell() - size
+
+        # The source's index, moved to where its records now are
+        shifted = []
+        for line in lines:
+            key, timestamp, fields = line.split(' ', 2)
+            fields = json.loads(fields)
+            fields.update(offset=int(fields['offset']) + size, filename=self.path.name)
+            shifted.append(f"{key} {timestamp} {json.dumps(fields, ensure_ascii=False)}")
+        with open(index_path_for(self.path), 'a', encoding='utf-8') as f:
+            f.writelines(line + '\n' for line in shifted)
+
+        if self.path not in self.written:
+            self.written.append(self.path)
+        return {'warc_segment': self.path.name, 'offset': size, 'length': length, 'records': len(lines)}
+
+    def sync(self):
+        for path in self.written:
+            with open(path, 'rb') as f:
+                os.fsync(f.fileno())
+
+class _TableSegmentWriter:
+    """Collects the rows of one table into the current Parquet segment, rolling at the target size"""
+
+    def __init__(self, segment_dir: Path, table: str, target_bytes: int):
+        import pandas as pd
+
+        self.segment_dir = segment_dir
+        self.table = table
+        self.target_bytes = target_bytes
+        existing = sorted(segment_dir.glob(f"{table}-*.parquet"), key=segment_number)
+        self.frames = []
+        self.rows = 0
+        self.estimated_bytes = 0
+        self.changed = False
+        if existing and existing[-1].stat().st_size < target_bytes:
+            # Parquet cannot be appended to: the open segment is rewritten with the new rows
+            self.number = segment_number(existing[-1])
+            self.frames.append(pd.read_parquet(existing[-1]))
+            self.rows = len(self.frames[0])
+            self.estimated_bytes = existing[-1].stat().st_size
+        else:
+            self.number = segment_number(existing[-1]) + 1 if existing else 0
+
+    @property
+    def path(self) -> Path:
+        return self.segment_dir / segment_name(self.table, self.number, ".parquet")
+
+    def append(self, rows: List[Dict], estimated_bytes: int) -> Dict:
+        import pandas as pd
+
+        if self.rows and self.estimated_bytes + estimated_bytes > self.target_bytes:
+            self.flush()
+            self.number += 1
+            self.frames, self.rows, self.estimated_bytes = [], 0, 0
+
+        location = {'segment': self.path.name, 'row': self.rows, 'rows': len(rows)}
+        self.frames.append(pd.DataFrame(rows))
+        self.rows += len(rows)
+        self.estimated_bytes += estimated_bytes
+        self.changed = True
+        return location
+
+    def flush(self):
+        import pandas as pd
+
+        if not self.changed:
+            return
+        partial = self.path.with_name(self.path.name + ".partial")
+        pd.concat(self.frames, ignore_index=True).to_parquet(partial, index=False)
+        os.replace(partial, self.path)
+        self.changed = False
+
+class SegmentRoller:
+    """Rolls finished Phase 3 outputs into target-size segments and reads them back through the manifest"""
+
+    def __init__(self, phase3_dir: Path, warc_bytes: int = SEGMENT_WARC_BYTES,
+                 parquet_bytes: int = SEGMENT_PARQUET_BYTES):
+        self.phase3_dir = Path(phase3_dir)
+        self.segment_dir = self.phase3_dir / SEGMENT_DIR_NAME
+        self.manifest_path = self.segment_dir / SEGMENT_MANIFEST_FILE
+        self.warc_bytes = warc_bytes
+        self.parquet_bytes = parquet_bytes
+        self._lock = threading.Lock()
+        self._manifest_cache: Tuple[Optional[Tuple[int, float]], Dict[str, Dict]] = (None, {})
+        self._segment_cache: Tuple[Optional[str], List[Dict]] = (None, [])
+
+    def manifest(self) -> Dict[str, Dict]:
+        """Manifest entries by source WARC name (a later entry for the same name replaces an earlier one)"""
+        if not self.manifest_path.exists():
+            return {}
+        stat = self.manifest_path.stat()
+        version = (stat.st_size, stat.st_mtime)
+        if self._manifest_cache[0] != version:
+            entries = {}
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries[entry['warc_name']] = entry
+            self._manifest_cache = (version, entries)
+        return self._manifest_cache[1]
+
+    @contextmanager
+    def _exclusive(self):
+        """One roller at a time per segment directory, across threads and processes"""
+        self.segment_dir.mkdir(exist_ok=True)
+        with self._lock, open(self.segment_dir / ".lock", 'w') as lock_file:
+            try:
+                import fcntl
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            except ImportError:
+                # No advisory locks (Windows): only one process may roll a crawl directory
+                pass
+            yield
+
+    def roll(self, warc_names: Iterable[str]) -> int:
+        """Append the outputs of finished WARCs (file names in the Phase 3 directory) to segments; returns WARCs rolled"""
+        with self._exclusive():
+            manifest = self.manifest()
+            self._recover(manifest)
+            warc_writer = _WarcSegmentWriter(self.segment_dir, self.warc_bytes)
+            table_writers = {table: _TableSegmentWriter(self.segment_dir, table, self.parquet_bytes) for table in TABLES}
+
+            new_entries = []
+            for warc_name in sorted(set(warc_names)):
+                warc_file = self.phase3_dir / warc_name
+                if not warc_file.exists():
+                    continue
+                previous = manifest.get(warc_name)
+                if previous and previous['length'] == warc_file.stat().st_size:
+                    # Rolled by a run that was interrupted before it removed the originals
+                    self._remove_source(warc_name)
+                    continue
+
+                entry = {'warc_name': warc_name, **warc_writer.append(warc_file), 'tables': {}}
+                for table, (_, parquet_pattern) in TABLES.items():
+                    rows = source_rows(self.phase3_dir, warc_name, table)
+                    if not rows:
+                        continue
+                    json_file = self.phase3_dir / TABLES[table][0].format(stem=Path(warc_name).stem)
+                    parquet_file = self.phase3_dir / parquet_pattern.format(stem=Path(warc_name).stem) if parquet_pattern else None
+                    estimated_bytes = (parquet_file.stat().st_size if parquet_file and parquet_file.exists()
+                                       else json_file.stat().st_size // 4)
+                    entry['tables'][table] = table_writers[table].append(rows, estimated_bytes)
+                entry['rolled_at'] = datetime.now().isoformat()
+                new_entries.append(entry)
+
+            if not new_entries:
+                return 0
+
+            # Segments are durable before the manifest points into them, the manifest before originals go
+            for writer in table_writers.values():
+                writer.flush()
+            warc_writer.sync()
+            with open(self.manifest_path, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(entry) + '\n' for entry in new_entries)
+                f.flush()
+                os.fsync(f.fileno())
+            for entry in new_entries:
+                self._remove_source(entry['warc_name'])
+
+        logger.info(f"Rolled {len(new_entries)} WARC outputs into segments in {self.segment_dir}")
+        return len(new_entries)
+
+    def _remove_source(self, warc_name: str):
+        remove_warc(self.phase3_dir / warc_name)
+        for path in source_files(self.phase3_dir, warc_name):
+            path.unlink(missing_ok=True)
+
+    def _recover(self, manifest: Dict[str, Dict]):
+        """Cut segments back to what the manifest references (an interrupted roll may have appended more)"""
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        warc_ends: Dict[str, int] = {}
+        table_rows: Dict[str, int] = {}
+        for entry in manifest.values():
+            warc_ends[entry['warc_segment']] = max(warc_ends.get(entry['warc_segment'], 0), entry['offset'] + entry['length'])
+            for location in entry['tables'].values():
+                table_rows[location['segment']] = max(table_rows.get(location['segment'], 0),
+                                                      location['row'] + location['rows'])
+
+        for partial in self.segment_dir.glob("*.partial"):
+            partial.unlink()
+
+        for path in self.segment_dir.glob(f"{WARC_SEGMENT_PREFIX}-*.warc.gz"):
+            end = warc_ends.get(path.name, 0)
+            if path.stat().st_size <= end:
+                continue
+            logger.warning(f"Truncating {path.name} to the {end:,} bytes its manifest references")
+            if not end:
+                remove_warc(path)
+                continue
+            os.truncate(path, end)
+            index = index_path_for(path)
+            if index.exists():
+                with open(index, 'r', encoding='utf-8') as f:
+                    lines = [line for line in f if int(json.loads(line.split(' ', 2)[2])['offset']) < end]
+                with open(index, 'w', encoding='utf-8') as f:
+                    f.writelines(lines)
+
+        for table in TABLES:
+            for path in self.segment_dir.glob(f"{table}-*.parquet"):
+                rows = table_rows.get(path.name, 0)
+                if not rows:
+                    path.unlink()
+                elif pq.ParquetFile(path).metadata.num_rows > rows:
+                    logger.warning(f"Truncating {path.name} to the {rows:,} rows its manifest references")
+                    partial = path.with_name(path.name + ".partial")
+                    pd.read_parquet(path).iloc[:rows].to_parquet(partial, index=False)
+                    os.replace(partial, path)
+
+    def open_warc(self, warc_name: str) -> Optional[BinaryIO]:
+        """The records of a rolled source WARC, as a gzip stream of its byte range in the segment"""
+        entry = self.manifest().get(warc_name)
+        if entry is None:
+            return None
+        return io.BufferedReader(_RangeReader(self.segment_dir / entry['warc_segment'], entry['offset'], entry['length']))
+
+    def table_rows(self, warc_name: str, table: str) -> Optional[List[Dict]]:
+        """Rows a rolled source WARC contributed to a table, None if it was not rolled"""
+        entry = self.manifest().get(warc_name)
+        if entry is None:
+            return None
+        location = entry['tables'].get(table)
+        if location is None:
+            return []
+        return self._segment_rows(location['segment'])[location['row']:location['row'] + location['rows']]
+
+    def iter_table_rows(self, table: str) -> Iterator[Tuple[str, List[Dict]]]:
+        """(source WARC name, rows) of every rolled source, segment by segment"""
+        entries = [entry for entry in self.manifest().values() if table in entry['tables']]
+        entries.sort(key=lambda entry: (entry['tables'][table]['segment'], entry['tables'][table]['row']))
+        for entry in entries:
+            yield entry['warc_name'], self.table_rows(entry['warc_name'], table)
+
+    def _segment_rows(self, name: str) -> List[Dict]:
+        import pandas as pd
+
+        # Sources of one segment are usually read one after another
+        if self._segment_cache[0] != name:
+            rows = pd.read_parquet(self.segment_dir / name).to_dict('records')
+            self._segment_cache = (name, rows)
+        return self._segment_cache[1]
+
+    def stats(self) -> Dict:
+        """Segment counts and sizes for the report"""
+        if not self.segment_dir.exists():
+            return {}
+        files = [path for path in self.segment_dir.iterdir() if path.is_file()]
+        warc_segments = [path for path in files if path.name.endswith('.warc.gz')]
+        return {
+            'sources_rolled': len(self.manifest()),
+            'warc_segments': len(warc_segments),
+            'warc_segment_bytes': sum(path.stat().st_size for path in warc_segments),
+            'table_segments': {table: sum(1 for path in files if path.name.startswith(f"{table}-")
+                                          and path.suffix == '.parquet') for table in TABLES},
+            'manifest': str(self.manifest_path)
+        }
+
+def open_phase3_warc(phase3_dir: Path, warc_name: str) -> Optional[BinaryIO]:
+    """A Phase 3 WARC as a binary stream, whether it is still its own file or rolled into a segment"""
+    warc_file = Path(phase3_dir) / warc_name
+    if warc_file.exists():
+        return open(warc_file, 'rb')
+    return SegmentRoller(phase3_dir).open_warc(warc_name)
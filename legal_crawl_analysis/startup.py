@@ -0,0 +1,111 @@
+"""
+Startup time budget
+Measures how long fresh processes take to get going (`legal-crawl-analyzer --help`,
+and a worker that imports and constructs the analyzer) above bare interpreter
+startup, and fails when a probe exceeds its budget. Worker spawn time adds up once
+phases fan out to process pools and short-lived batch jobs.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from .config import STARTUP_BUDGET_HELP_SECONDS, STARTUP_BUDGET_WORKER_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# What a queue worker does before it claims its first WARC
+WORKER_SNIPPET = (
+    "from legal_crawl_analysis.analyzer import ThreePhaseLegalAnalyzer\n"
+    "ThreePhaseLegalAnalyzer(output_dir='out', progress_file='progress.db', preclassifier_path=None)\n"
+)
+
+PROBES = {
+    'cli_help': ["-m", "legal_crawl_analysis.main", "--help"],
+    'worker': ["-c", WORKER_SNIPPET],
+}
+
+def _run_seconds(args: List[str], cwd: str, env: Dict) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=cwd, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def slowest_imports(args: List[str], cwd: str, env: Dict, top_n: int = 10) -> List[Dict]:
+    """Modules with the largest cumulative import time (python -X importtime) for one probe"""
+    result = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=cwd, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            imports.append({'module': module.strip(), 'cumulative_ms': int(cumulative) / 1000})
+    return sorted(imports, key=lambda row: row['cumulative_ms'], reverse=True)[:top_n]
+
+def measure_startup(runs: int = 5, budgets: Dict[str, float] = None) -> Dict:
+    """Median wall time of each probe over `runs` fresh processes, minus bare interpreter startup"""
+    budgets = budgets or {'cli_help': STARTUP_BUDGET_HELP_SECONDS, 'worker': STARTUP_BUDGET_WORKER_SECONDS}
+    env = dict(os.environ)
+    # The probes run in a scratch directory, so point them at this checkout of the package
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+
+    with tempfile.TemporaryDirectory(prefix="legal-crawl-startup-") as cwd:
+        baseline = statistics.median(_run_seconds(["-c", "pass"], cwd, env) for _ in range(runs))
+        probes = {}
+        for name, args in PROBES.items():
+            _run_seconds(args, cwd, env)  # warm the page cache and bytecode
+            median = statistics.median(_run_seconds(args, cwd, env) for _ in range(runs))
+            overhead = max(median - baseline, 0.0)
+            probes[name] = {
+                'median_seconds': median,
+                'overhead_seconds': overhead,
+                'budget_seconds': budgets[name],
+                'within_budget': overhead <= budgets[name]
+            }
+            if not probes[name]['within_budget']:
+                probes[name]['slowest_imports'] = slowest_imports(args, cwd, env)
+
+    return {
+        'python': sys.version.split()[0],
+        'runs': runs,
+        'interpreter_seconds': baseline,
+        'probes': probes,
+        'passed': all(probe['within_budget'] for probe in probes.values())
+    }
+
+def main():
+    """Check CLI and worker startup against their budgets"""
+    parser = argparse.ArgumentParser(description="Measure process startup time against the startup budget")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per probe (median is used). Default: 5")
+    parser.add_argument("--output", help="Write the measurements as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    report = measure_startup(args.runs)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    print(f"Interpreter startup: {report['interpreter_seconds'] * 1000:.0f} ms")
+    for name, probe in report['probes'].items():
+        status = "ok" if probe['within_budget'] else "OVER BUDGET"
+        print(f"{name:<10} {probe['overhead_seconds'] * 1000:>6.0f} ms above interpreter "
+              f"(budget {probe['budget_seconds'] * 1000:.0f} ms) {status}")
+        for row in probe.get('slowest_imports', []):
+            print(f"    {row['cumulative_ms']:>8.1f} ms  {row['module']}")
+    sys.exit(0 if report['passed'] else 1)
+
+
+if __name__ == "__main__":
+    main()
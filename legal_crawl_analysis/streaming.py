@@ -0,0 +1,171 @@
+"""
+Bounded in-memory stages for the fused streaming pipeline
+Each stage runs its own worker threads and pulls from a bounded queue, so a slow
+stage (usually GPT) blocks the stages feeding it instead of letting records pile up.
+"""
+
+import io
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from .metrics import ERRORS, QUEUE_DEPTH, STAGE_SECONDS, STAGE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Sentinel that shuts a stage down once everything queued before it is handled
+STOP = object()
+
+@dataclass
+class StreamingWarcContext:
+    """Per input WARC state carried through the streaming stages"""
+    file_index: int
+    warc_path: str
+    phase1_warc_file: Path
+    records_processed: int = 0
+    legal_docs_found: int = 0
+    filtered_documents: List[Dict] = field(default_factory=list)
+    extracted_passages: List[Dict] = field(default_factory=list)
+    skipped_documents: List[Dict] = field(default_factory=list)
+    deferred_documents: List[tuple] = field(default_factory=list)
+    done_urls: Set[str] = field(default_factory=set)
+    tokens_used: int = 0
+    link_graph: Optional[object] = None  # link_graph.LinkGraph of the WARC when link discovery is on
+
+@dataclass
+class WarcEnd:
+    """Marks the end of one input WARC as it flows through the stages"""
+    context: StreamingWarcContext
+
+class PipelineStage:
+    """
+    Worker threads fed by a bounded queue; the handler forwards results with emit().
+    With a limiter, up to max_workers threads exist but only limiter.controller.limit of
+    them take items at a time. A WarcEnd is handled only after every item dequeued before
+    it has finished, so downstream stages still see it after all of that file's records.
+    """
+
+    def __init__(self, name: str, handler: Callable, output: Optional['PipelineStage'] = None,
+                 queue_size: int = 64, limiter=None, max_workers: int = 1):
+        self.name = name
+        self.handler = handler
+        self.output = output
+        self.limiter = limiter
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._threads = [threading.Thread(target=self._run, name=f"stage-{name}-{n}", daemon=True)
+                         for n in range(max_workers)]
+
+        # Dequeue order, so WarcEnd markers can wait for the items ahead of them
+        self._get_lock = threading.Lock()
+        self._progress = threading.Condition()
+        self._next_seq = 0
+        self._in_progress: Set[int] = set()
+
+        # Stage accounting
+        self.items_processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self._queue_depth_metric = QUEUE_DEPTH.labels(stage=name)
+        self._latency_metric = STAGE_SECONDS.labels(stage=f"pipeline_{name}")
+
+    @property
+    def concurrency(self) -> int:
+        return self.limiter.controller.limit if self.limiter else len(self._threads)
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, item):
+        """Queue an item, blocking while the stage is full (backpressure)"""
+        start = time.perf_counter()
+        self.queue.put(item)
+        self.blocked_seconds += time.perf_counter() - start
+        depth = self.queue.qsize()
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._queue_depth_metric.set(depth)
+
+    def emit(self, item):
+        if self.output is not None:
+            self.output.put(item)
+
+    def close(self):
+        """Drain the queue, stop the workers and then close the downstream stage"""
+        for _ in self._threads:
+            self.queue.put(STOP)
+        for thread in self._threads:
+            thread.join()
+        if self.output is not None:
+            self.output.close()
+
+    def _run(self):
+        while True:
+            if self.limiter:
+                self.limiter.acquire()
+            try:
+                with self._get_lock:
+                    item = self.queue.get()
+                    self._queue_depth_metric.set(self.queue.qsize())
+                    if item is STOP:
+                        return
+                    with self._progress:
+                        seq = self._next_seq
+                        self._next_seq += 1
+                        self._in_progress.add(seq)
+                self._handle(item, seq)
+            finally:
+                if self.limiter:
+                    self.limiter.release()
+
+    def _handle(self, item, seq: int):
+        if isinstance(item, WarcEnd):
+            with self._progress:
+                self._progress.wait_for(lambda: min(self._in_progress) == seq)
+
+        STAGE_WORKERS.labels(stage=self.name).set(self.concurrency)
+        start = time.perf_counter()
+        failed = False
+        try:
+            self.handler(item, self.emit)
+        except Exception as e:
+            failed = True
+            ERRORS.labels(stage=f"pipeline_{self.name}").inc()
+            logger.error(f"Streaming stage {self.name} failed on an item: {e}")
+        finally:
+            self._latency_metric.observe(time.perf_counter() - start)
+            with self._progress:
+                self._in_progress.discard(seq)
+                self.busy_seconds += time.perf_counter() - start
+                self.items_processed += 1
+                self.errors += failed
+                self._progress.notify_all()
+
+    def get_stats(self) -> Dict:
+        return {
+            'stage': self.name,
+            'items_processed': self.items_processed,
+            'errors': self.errors,
+            'busy_seconds': self.busy_seconds,
+            'upstream_blocked_seconds': self.blocked_seconds,
+            'max_queue_depth': self.max_queue_depth,
+            'workers': self.concurrency
+        }
+
+def buffer_record(record) -> bytes:
+    """
+    Read a record's raw payload once and make it re-readable, so the same parsed
+    record can be both inspected via content_stream() and copied with WARCWriter
+    """
+    raw = record.raw_stream.read()
+    record.raw_stream = io.BytesIO(raw)
+    return raw
+
+def rewind_record(record, raw: bytes):
+    """Reset a buffered record's payload before reading or writing it again"""
+    record.raw_stream = io.BytesIO(raw)
@@ -0,0 +1,272 @@
+"""
+Response schemas and tolerant parsing for GPT legal analysis
+The compact wire schema uses short keys and category codes to cut output tokens
+and is expanded back into the verbose analysis dict used everywhere else.
+"""
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Compact category codes -> full copyright categories
+CATEGORY_CODES = {
+    'RS': 'COPYRIGHT_RETAINED_SITE',
+    'RU': 'COPYRIGHT_RETAINED_USER',
+    'LS': 'COPYRIGHT_LICENSED_TO_SITE',
+    'W': 'COPYRIGHT_WAIVED',
+    'ND': 'HARD_NEGATIVE_DMCA',
+    'NT': 'HARD_NEGATIVE_THIRD_PARTY',
+    'NL': 'HARD_NEGATIVE_LICENSE_GRANT',
+    'NI': 'EASY_NEGATIVE_IRRELEVANT',
+    'A': 'AMBIGUOUS_COPYRIGHT',
+}
+
+# Compact access level codes -> full access levels
+ACCESS_LEVEL_CODES = {
+    'L0': 'L0_OPEN_ACCESS',
+    'L1': 'L1_ROBOTS_DISALLOW',
+    'L2': 'L2_DYNAMIC_CONTENT',
+    'L3': 'L3_ACCESS_CONTROL_SIMPLE',
+    'L4': 'L4_ACCESS_CONTROL_CAPTCHA',
+    'L5': 'L5_ANTI_BOT_SERVICE',
+    'L6': 'L6_PAYWALL',
+    'L7': 'L7_BLOCKED',
+}
+
+# Compact list keys -> verbose list keys
+COMPACT_LIST_KEYS = {
+    'tpm': 'technical_protection_measures',
+    'lia': 'liability_clauses',
+    'jur': 'jurisdiction_clauses',
+    'dl': 'data_licensing',
+}
+
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+COMPACT_RESPONSE_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "properties": {
+        "c": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": False,
+                "properties": {
+                    "t": {"type": "string"},
+                    "k": {"type": "string", "enum": list(CATEGORY_CODES)},
+                    "p": {"type": "number"}
+                },
+                "required": ["t", "k", "p"]
+            }
+        },
+        "a": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "l": {"type": "string", "enum": list(ACCESS_LEVEL_CODES)},
+                "i": _STRING_LIST,
+                "p": {"type": "number"}
+            },
+            "required": ["l", "i", "p"]
+        },
+        **{key: _STRING_LIST for key in COMPACT_LIST_KEYS}
+    },
+    "required": ["c", "a", *COMPACT_LIST_KEYS]
+}
+
+VERBOSE_RESPONSE_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "properties": {
+        "copyright_clauses": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": False,
+                "properties": {
+                    "text": {"type": "string"},
+                    "category": {"type": "string", "enum": list(CATEGORY_CODES.values())},
+                    "confidence": {"type": "number"},
+                    "context": {"type": "string"}
+                },
+                "required": ["text", "category", "confidence", "context"]
+            }
+        },
+        "access_level": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "level": {"type": "string", "enum": list(ACCESS_LEVEL_CODES.values())},
+                "indicators": _STRING_LIST,
+                "confidence": {"type": "number"}
+            },
+            "required": ["level", "indicators", "confidence"]
+        },
+        **{key: _STRING_LIST for key in COMPACT_LIST_KEYS.values()}
+    },
+    "required": ["copyright_clauses", "access_level", *COMPACT_LIST_KEYS.values()]
+}
+
+def get_response_format(mode: str, compact: bool) -> Optional[Dict]:
+    """Build the response_format request parameter for the given mode"""
+    if mode == 'json_schema':
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "legal_analysis_compact" if compact else "legal_analysis",
+                "strict": True,
+                "schema": COMPACT_RESPONSE_SCHEMA if compact else VERBOSE_RESPONSE_SCHEMA
+            }
+        }
+    if mode == 'json_object':
+        return {"type": "json_object"}
+    return None
+
+def empty_analysis() -> Dict:
+    """Return empty analysis structure"""
+    return {
+        "copyright_clauses": [],
+        "access_level": {
+            "level": "L0_OPEN_ACCESS",
+            "indicators": [],
+            "confidence": 0.0
+        },
+        "technical_protection_measures": [],
+        "liability_clauses": [],
+        "jurisdiction_clauses": [],
+        "data_licensing": []
+    }
+
+def has_analysis_keys(data: Dict) -> bool:
+    """Whether a parsed response carries any field of the compact or verbose schema"""
+    return any(key in data for key in COMPACT_RESPONSE_SCHEMA['properties']) or \
+        any(key in data for key in VERBOSE_RESPONSE_SCHEMA['properties'])
+
+def is_compact(data: Dict) -> bool:
+    """Whether a parsed response uses the compact wire schema"""
+    return 'c' in data or 'a' in data or any(key in data for key in COMPACT_LIST_KEYS)
+
+def expand_compact_analysis(data: Dict) -> Dict:
+    """Expand a compact wire response into the verbose analysis dict"""
+    analysis = empty_analysis()
+
+    for clause in data.get('c') or []:
+        # Clauses cut off by truncation lack their quote or category
+        if not isinstance(clause, dict) or not clause.get('t') or not clause.get('k'):
+            continue
+        code = clause['k']
+        analysis['copyright_clauses'].append({
+            'text': clause['t'],
+            'category': CATEGORY_CODES.get(code, code),
+            'confidence': clause.get('p', 0.0),
+            'context': ''
+        })
+
+    access = data.get('a')
+    if isinstance(access, dict):
+        code = access.get('l', 'L0')
+        analysis['access_level'] = {
+            'level': ACCESS_LEVEL_CODES.get(code, code),
+            'indicators': access.get('i') or [],
+            'confidence': access.get('p', 0.0)
+        }
+
+    for compact_key, verbose_key in COMPACT_LIST_KEYS.items():
+        values = data.get(compact_key)
+        if isinstance(values, list):
+            analysis[verbose_key] = values
+
+    return analysis
+
+def normalize_analysis(data: Dict) -> Dict:
+    """Bring a (possibly compact or partial) response into the full verbose shape"""
+    if is_compact(data):
+        return expand_compact_analysis(data)
+
+    analysis = empty_analysis()
+    for key, default in analysis.items():
+        value = data.get(key)
+        if isinstance(value, type(default)):
+            analysis[key] = value
+
+    analysis['copyright_clauses'] = [
+        clause for clause in analysis['copyright_clauses']
+        if isinstance(clause, dict) and clause.get('text') and clause.get('category')
+    ]
+    analysis['access_level'] = {**empty_analysis()['access_level'], **analysis['access_level']}
+    return analysis
+
+def strip_code_fences(text: str) -> str:
+    """Remove markdown code fences, including an unterminated opening fence"""
+    text = text.strip()
+    match = re.match(r'^```[a-zA-Z]*\s*(.*?)(?:```\s*)?$', text, re.DOTALL)
+    return match.group(1).strip() if match else text
+
+def _truncation_candidates(text: str) -> List[Tuple[int, List[str]]]:
+    """
+    Scan JSON text and return (cut position, open containers) pairs at which the
+    prefix is a sequence of complete values that can be closed off
+    """
+    candidates = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+            candidates.append((i + 1, list(stack)))
+        elif ch in '}]':
+            if stack:
+                stack.pop()
+            candidates.append((i + 1, list(stack)))
+        elif ch == ',' and stack:
+            # Cutting before the comma keeps the preceding member intact
+            candidates.append((i, list(stack)))
+
+    return candidates
+
+def salvage_json(text: str) -> Tuple[Optional[Dict], bool]:
+    """
+    Tolerantly parse a model response. Returns (parsed dict or None, repaired),
+    where repaired is True when the JSON had to be truncated and closed off
+    """
+    text = strip_code_fences(text)
+    start = text.find('{')
+    if start < 0:
+        return None, False
+    text = text[start:]
+
+    # Complete object, possibly followed by trailing chatter
+    try:
+        parsed, _ = json.JSONDecoder().raw_decode(text)
+        if isinstance(parsed, dict):
+            return parsed, False
+    except json.JSONDecodeError:
+        pass
+
+    # Truncated object: close it off at the latest point that still parses
+    for position, stack in reversed(_truncation_candidates(text)):
+        candidate = text[:position].rstrip().rstrip(',') + ''.join(reversed(stack))
+        try:
+            parsed = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        # A cut right after the opening brace closes off to an object with no fields,
+        # which is not an analysis
+        if isinstance(parsed, dict) and has_analysis_keys(parsed):
+            return parsed, True
+
+    return None, False
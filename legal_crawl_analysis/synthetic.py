@@ -0,0 +1,379 @@
+"""
+Synthetic WARC corpus generator
+Writes CommonCrawl-shaped `.warc.gz` files (warcinfo, then request/response/metadata
+per capture) with a controllable mix of legal and non-legal pages, page sizes,
+charsets and duplicate rates. Every file gets a `<name>.labels.jsonl` sidecar with
+the ground truth of each response record, for benchmarks and recall checks, and
+optionally a `<name>.warc.wet.gz` with a plain-text conversion record per response
+and a `<name>.warc.wat.gz` with a link-metadata record per response.
+"""
+
+import argparse
+import io
+import json
+import logging
+import math
+import random
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from warcio.statusandheaders import StatusAndHeaders
+from warcio.warcwriter import WARCWriter
+
+from .fetcher import wet_path_for, wat_path_for
+from .link_graph import html_links
+
+logger = logging.getLogger(__name__)
+
+# Sentences per legal document type; each page mixes its own type with a little of the others
+LEGAL_SENTENCES = {
+    'privacy': [
+        "We collect information you provide directly to us, such as your name and email address.",
+        "This privacy policy explains how we process personal data in accordance with the GDPR.",
+        "We use cookies and similar tracking technologies to analyse traffic.",
+        "You may opt-out of the sale of personal information under the CCPA.",
+        "Third-party services may receive data to provide analytics on our behalf.",
+        "California residents have specific privacy rights described below.",
+    ],
+    'terms': [
+        "By accessing the service you agree to these terms and conditions.",
+        "The following uses of the service are prohibited: scraping, reselling and reverse engineering.",
+        "To the maximum extent permitted by law, our limitation of liability applies to all claims.",
+        "These terms are governed by the laws of the State of Delaware.",
+        "Any dispute resolution shall take place through binding arbitration.",
+        "This user agreement may be updated from time to time without notice.",
+    ],
+    'cookies': [
+        "This cookie policy describes the cookies we place on your device.",
+        "Strictly necessary cookies cannot be switched off in our systems.",
+        "You can manage your cookie consent preferences at any time.",
+        "Analytics cookies help us understand how visitors interact with the website.",
+    ],
+    'copyright': [
+        "Copyright © 2024 Example Media Ltd. All rights reserved.",
+        "No part of this website may be reproduced without prior written permission.",
+        "You retain ownership of any content you submit, and grant us a worldwide licence to use it.",
+        "Content on this site is licensed under a Creative Commons Attribution 4.0 licence.",
+        "Text and data mining of this content is expressly reserved under Article 4 of the DSM Directive.",
+        "Automated access, crawling and AI training on this content are prohibited.",
+    ],
+    'dmca': [
+        "To file a DMCA takedown notice, contact our designated copyright agent.",
+        "Your notice must identify the copyrighted work claimed to have been infringed.",
+        "We respond to notices of alleged infringement under the Digital Millennium Copyright Act.",
+    ],
+    'imprint': [
+        "Impressum: Angaben gemäß § 5 TMG.",
+        "Verantwortlich für den Inhalt: Müller & Söhne GmbH, Straße 12, München.",
+        "Mentions légales : éditeur du site et hébergeur.",
+        "Haftungsausschluss und Datenschutzerklärung finden Sie auf einer separaten Seite.",
+    ],
+}
+
+LEGAL_PATHS = {
+    'privacy': ['privacy-policy', 'privacy', 'legal/privacy-notice', 'datenschutz'],
+    'terms': ['terms-of-service', 'terms', 'tos', 'legal/user-agreement'],
+    'cookies': ['cookie-policy', 'cookies', 'legal/cookie-notice'],
+    'copyright': ['copyright', 'legal/copyright-notice', 'license'],
+    'dmca': ['dmca', 'legal/dmca-policy'],
+    'imprint': ['impressum', 'mentions-legales', 'imprint'],
+}
+
+TOPIC_SENTENCES = [
+    "Our new collection arrives just in time for the summer season.",
+    "The recipe takes about forty minutes and serves four people.",
+    "Local officials announced that the bridge will reopen next month.",
+    "Customers praised the battery life and the bright display of the device.",
+    "The team scored twice in the second half to secure the win.",
+    "Researchers observed the effect across several independent samples.",
+    "Book early to get the best rates for the holiday weekend.",
+    "Our café serves crème brûlée and fresh crêpes every morning.",
+    "The museum extends its opening hours on Thursdays.",
+    "Shipping is free on orders over fifty euros – returns within 30 days.",
+]
+
+TOPIC_PATHS = ['blog', 'news', 'products', 'recipes', 'sports', 'travel', 'article', 'shop', 'events']
+
+# Many ordinary pages link to their legal pages from the header or footer
+NAV_LINKS = '<a href="/privacy-policy">Privacy Policy</a> | <a href="/terms">Terms</a> | <a href="/cookies">Cookie settings</a>'
+
+# Earlier pages kept as duplicate sources (bounds memory on large corpora)
+DUPLICATE_POOL_SIZE = 500
+
+SCRIPT_BLOCK = ("<script>window.dataLayer=window.dataLayer||[];function gtag(){dataLayer.push(arguments);}"
+                "gtag('js',new Date());gtag('config','UA-000000-1');</script>")
+STYLE_BLOCK = "<style>body{font-family:sans-serif;margin:0}.nav a{padding:4px}.footer{color:#666}</style>"
+
+SCRIPT_STYLE_RE = re.compile(r'<(script|style)\b.*?</\1>', re.DOTALL | re.IGNORECASE)
+BLOCK_TAG_RE = re.compile(r'</?(?:p|div|h1|title|br)\b[^>]*>', re.IGNORECASE)
+TAG_RE = re.compile(r'<[^>]+>')
+
+@dataclass
+class SyntheticCorpusSpec:
+    """Knobs for one synthetic WARC file; the seed makes the output reproducible"""
+    records: int = 1000
+    legal_fraction: float = 0.1
+    # Fraction of non-legal pages that link to Privacy/Terms in their header (Phase 1 false positives)
+    nav_link_fraction: float = 0.3
+    median_page_kb: float = 30.0
+    page_size_sigma: float = 0.8
+    max_page_kb: float = 1024.0
+    duplicate_rate: float = 0.05
+    # Relative weights of the declared charsets
+    encodings: Dict[str, float] = field(default_factory=lambda: {
+        'utf-8': 0.85, 'iso-8859-1': 0.08, 'windows-1252': 0.05, 'utf-16': 0.02})
+    domains: int = 200
+    include_request_and_metadata: bool = True
+    # Also write a WET file (CommonCrawl-style extracted text) next to the WARC
+    write_wet: bool = False
+    # Also write a WAT file (CommonCrawl-style JSON metadata with each page's links)
+    write_wat: bool = False
+    seed: int = 42
+
+def html_to_text(html: str) -> str:
+    """WET-style plain text: scripts and styles dropped, one line per block element"""
+    text = TAG_RE.sub(' ', BLOCK_TAG_RE.sub('\n', SCRIPT_STYLE_RE.sub('', html)))
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+class SyntheticWarcGenerator:
+    """Generates pages and writes them as WARC records"""
+
+    def __init__(self, spec: SyntheticCorpusSpec):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        self._encodings = list(spec.encodings)
+        self._encoding_weights = [spec.encodings[name] for name in self._encodings]
+
+    def _target_size(self) -> int:
+        kb = self.rng.lognormvariate(math.log(self.spec.median_page_kb), self.spec.page_size_sigma)
+        return int(min(max(kb, 1.0), self.spec.max_page_kb) * 1024)
+
+    def _paragraphs(self, sentences: List[str], target_chars: int) -> List[str]:
+        paragraphs, size = [], 0
+        while size < target_chars:
+            paragraph = " ".join(self.rng.choice(sentences) for _ in range(self.rng.randint(3, 8)))
+            paragraphs.append(f"<p>{paragraph}</p>")
+            size += len(paragraph) + 7
+        return paragraphs
+
+    def build_page(self, index: int) -> Tuple[str, str, Dict]:
+        """One page as (url, html, label)"""
+        domain = f"site{self.rng.randrange(self.spec.domains)}.example.{self.rng.choice(['com', 'org', 'de', 'co.uk'])}"
+        target = self._target_size()
+        is_legal = self.rng.random() < self.spec.legal_fraction
+
+        if is_legal:
+            doc_type = self.rng.choice(list(LEGAL_SENTENCES))
+            path = self.rng.choice(LEGAL_PATHS[doc_type])
+            sentences = LEGAL_SENTENCES[doc_type] * 4 + [s for group in LEGAL_SENTENCES.values() for s in group]
+            title = path.split('/')[-1].replace('-', ' ').title()
+            header_nav = False
+        else:
+            doc_type = None
+            path = f"{self.rng.choice(TOPIC_PATHS)}/{index}-{self.rng.randrange(10 ** 6)}"
+            sentences = TOPIC_SENTENCES
+            title = f"Page {index}"
+            header_nav = self.rng.random() < self.spec.nav_link_fraction
+
+        boilerplate = [f"<html><head><title>{title}</title>", STYLE_BLOCK, SCRIPT_BLOCK, "</head><body>",
+                       f'<div class="nav"><a href="/">Home</a> {NAV_LINKS if header_nav else ""}</div>']
+        footer = [f'<div class="footer">{NAV_LINKS}</div>', "</body></html>"]
+        body = self._paragraphs(sentences, max(target - sum(len(part) for part in boilerplate + footer), 200))
+        html = "\n".join(boilerplate + [f"<h1>{title}</h1>"] + body + footer)
+
+        label = {'is_legal': is_legal, 'doc_type': doc_type, 'header_nav_links': header_nav}
+        return f"https://{domain}/{path}", html, label
+
+    def write(self, output_path: Path) -> Dict:
+        """Write the WARC, its labels sidecar and optionally its WET and WAT files; returns corpus statistics"""
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        labels_path = labels_path_for(output_path)
+        wet_path = Path(wet_path_for(str(output_path)))
+        wat_path = Path(wat_path_for(str(output_path)))
+        start = datetime(2025, 2, 1)
+        pages: List[Tuple[str, bytes, str, Dict]] = []
+        stats = {'records': 0, 'legal': 0, 'duplicates': 0, 'payload_bytes': 0, 'encodings': {}}
+
+        with open(output_path, 'wb') as f, open(labels_path, 'w', encoding='utf-8') as labels_f, \
+                (open(wet_path, 'wb') if self.spec.write_wet else io.BytesIO()) as wet_f, \
+                (open(wat_path, 'wb') if self.spec.write_wat else io.BytesIO()) as wat_f:
+            writer = WARCWriter(f, gzip=True)
+            writer.write_record(writer.create_warcinfo_record(output_path.name, {
+                'software': 'legal-crawl-analysis synthetic generator',
+                'format': 'WARC File Format 1.1',
+                'description': json.dumps(asdict(self.spec))}))
+            wet_writer = WARCWriter(wet_f, gzip=True)
+            if self.spec.write_wet:
+                wet_writer.write_record(wet_writer.create_warcinfo_record(wet_path.name, {
+                    'software': 'legal-crawl-analysis synthetic generator',
+                    'format': 'WARC File Format 1.1',
+                    'description': f"Text conversions of {output_path.name}"}))
+            wat_writer = WARCWriter(wat_f, gzip=True)
+            if self.spec.write_wat:
+                wat_writer.write_record(wat_writer.create_warcinfo_record(wat_path.name, {
+                    'software': 'legal-crawl-analysis synthetic generator',
+                    'format': 'WARC File Format 1.1',
+                    'description': f"Metadata of {output_path.name}"}))
+
+            for index in range(self.spec.records):
+                duplicate_of = None
+                if pages and self.rng.random() < self.spec.duplicate_rate:
+                    # Same payload under another URL, like mirrored or syndicated pages
+                    source_url, payload, encoding, source_label = self.rng.choice(pages)
+                    url = f"https://mirror{self.rng.randrange(self.spec.domains)}.example.net/{source_url.split('/', 3)[-1]}"
+                    label = dict(source_label)
+                    duplicate_of = source_url
+                else:
+                    url, html, label = self.build_page(index)
+                    encoding = self.rng.choices(self._encodings, self._encoding_weights)[0]
+                    payload = html.encode(encoding, errors='xmlcharrefreplace')
+                    if len(pages) < DUPLICATE_POOL_SIZE:
+                        pages.append((url, payload, encoding, label))
+                    else:
+                        pages[self.rng.randrange(DUPLICATE_POOL_SIZE)] = (url, payload, encoding, label)
+
+                date = (start + timedelta(seconds=index)).strftime('%Y-%m-%dT%H:%M:%SZ')
+                response_id = self._write_capture(writer, url, payload, encoding, date)
+                if self.spec.write_wet:
+                    text = html_to_text(payload.decode(encoding, errors='replace')).encode('utf-8')
+                    wet_writer.write_record(wet_writer.create_warc_record(
+                        url, 'conversion', payload=io.BytesIO(text), warc_content_type='text/plain',
+                        warc_headers_dict={'WARC-Date': date, 'WARC-Refers-To': response_id}))
+                if self.spec.write_wat:
+                    envelope = wat_envelope(url, payload.decode(encoding, errors='replace'), date)
+                    wat_writer.write_record(wat_writer.create_warc_record(
+                        url, 'metadata', payload=io.BytesIO(json.dumps(envelope).encode('utf-8')),
+                        warc_content_type='application/json',
+                        warc_headers_dict={'WARC-Date': date, 'WARC-Refers-To': response_id}))
+
+                stats['records'] += 1
+                stats['legal'] += int(label['is_legal'])
+                stats['duplicates'] += int(duplicate_of is not None)
+                stats['payload_bytes'] += len(payload)
+                stats['encodings'][encoding] = stats['encodings'].get(encoding, 0) + 1
+                labels_f.write(json.dumps({'url': url, **label, 'encoding': encoding,
+                                           'bytes': len(payload), 'duplicate_of': duplicate_of}) + "\n")
+
+        stats['file_bytes'] = output_path.stat().st_size
+        if self.spec.write_wet:
+            stats['wet_file_bytes'] = wet_path.stat().st_size
+        if self.spec.write_wat:
+            stats['wat_file_bytes'] = wat_path.stat().st_size
+        logger.info(f"Wrote {stats['records']} synthetic records ({stats['legal']} legal) to {output_path}")
+        return stats
+
+    def _write_capture(self, writer: WARCWriter, url: str, payload: bytes, encoding: str, date: str) -> str:
+        """Write one capture; returns the WARC-Record-ID of its response"""
+        if self.spec.include_request_and_metadata:
+            host = url.split('/')[2]
+            request_headers = StatusAndHeaders(f"GET /{url.split('/', 3)[-1]} HTTP/1.1",
+                                               [('Host', host), ('User-Agent', 'CCBot/2.0')], is_http_request=True)
+            writer.write_record(writer.create_warc_record(url, 'request', http_headers=request_headers,
+                                                          warc_headers_dict={'WARC-Date': date}))
+
+        http_headers = StatusAndHeaders('200 OK', [('Content-Type', f'text/html; charset={encoding}'),
+                                                   ('Content-Length', str(len(payload)))], protocol='HTTP/1.1')
+        response = writer.create_warc_record(url, 'response', payload=io.BytesIO(payload), http_headers=http_headers,
+                                             warc_headers_dict={'WARC-Date': date})
+        writer.write_record(response)
+
+        if self.spec.include_request_and_metadata:
+            metadata = f"fetchTimeMs: {self.rng.randint(50, 2000)}\ncharset-detected: {encoding}\n".encode('utf-8')
+            writer.write_record(writer.create_warc_record(url, 'metadata', payload=io.BytesIO(metadata),
+                                                          warc_content_type='application/warc-fields',
+                                                          warc_headers_dict={
+                                                              'WARC-Date': date,
+                                                              'WARC-Concurrent-To': response.rec_headers.get_header('WARC-Record-ID')}))
+        return response.rec_headers.get_header('WARC-Record-ID')
+
+def wat_envelope(url: str, html: str, date: str) -> Dict:
+    """The parts of a CommonCrawl WAT record that link discovery reads"""
+    return {'Envelope': {
+        'WARC-Header-Metadata': {'WARC-Type': 'response', 'WARC-Target-URI': url, 'WARC-Date': date},
+        'Payload-Metadata': {'HTTP-Response-Metadata': {'HTML-Metadata': {
+            'Links': [{'path': 'A@/href', 'url': href, 'text': text} for href, text in html_links(html)]
+        }}}
+    }}
+
+def labels_path_for(warc_path: Path) -> Path:
+    """`X.warc.gz` (or its WET/WAT file `X.warc.wet.gz`, `X.warc.wat.gz`) -> `X.labels.jsonl`"""
+    name = Path(warc_path).name
+    for suffix in ('.warc.wet.gz', '.warc.wat.gz', '.warc.gz', '.warc'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return Path(warc_path).with_name(f"{name}.labels.jsonl")
+
+def load_labels(warc_path: Path) -> List[Dict]:
+    """Ground-truth rows written next to a synthetic WARC"""
+    with open(labels_path_for(warc_path), encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def generate_corpus(output_dir: Path, spec: SyntheticCorpusSpec, files: int = 1,
+                    prefix: str = "SYNTH") -> List[Tuple[Path, Dict]]:
+    """Write `files` WARCs (seeded seed, seed+1, ...) and return (path, stats) pairs"""
+    written = []
+    for i in range(files):
+        file_spec = SyntheticCorpusSpec(**{**asdict(spec), 'seed': spec.seed + i})
+        path = Path(output_dir) / f"{prefix}-{i:05d}.warc.gz"
+        written.append((path, SyntheticWarcGenerator(file_spec).write(path)))
+    return written
+
+def _parse_encodings(value: str) -> Dict[str, float]:
+    """'utf-8=0.9,iso-8859-1=0.1' -> {'utf-8': 0.9, 'iso-8859-1': 0.1}"""
+    weights = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+def add_spec_arguments(parser: argparse.ArgumentParser):
+    """Corpus options shared by the generator and the benchmark CLI"""
+    defaults = SyntheticCorpusSpec()
+    parser.add_argument("--records", type=int, default=defaults.records, help=f"Pages per WARC. Default: {defaults.records}")
+    parser.add_argument("--legal-fraction", type=float, default=defaults.legal_fraction,
+                        help=f"Fraction of legal pages. Default: {defaults.legal_fraction}")
+    parser.add_argument("--nav-link-fraction", type=float, default=defaults.nav_link_fraction,
+                        help=f"Fraction of non-legal pages with Privacy/Terms links in the header. Default: {defaults.nav_link_fraction}")
+    parser.add_argument("--median-page-kb", type=float, default=defaults.median_page_kb,
+                        help=f"Median page size (log-normal). Default: {defaults.median_page_kb}")
+    parser.add_argument("--duplicate-rate", type=float, default=defaults.duplicate_rate,
+                        help=f"Fraction of records that repeat an earlier payload. Default: {defaults.duplicate_rate}")
+    parser.add_argument("--encodings", type=_parse_encodings, default=None,
+                        help="Charset weights, e.g. 'utf-8=0.9,iso-8859-1=0.1'")
+    parser.add_argument("--wet", action="store_true", help="Also write a WET file of plain-text conversion records")
+    parser.add_argument("--wat", action="store_true", help="Also write a WAT file of link-metadata records")
+    parser.add_argument("--seed", type=int, default=defaults.seed, help=f"Random seed. Default: {defaults.seed}")
+
+def spec_from_args(args: argparse.Namespace) -> SyntheticCorpusSpec:
+    spec = SyntheticCorpusSpec(records=args.records, legal_fraction=args.legal_fraction,
+                               nav_link_fraction=args.nav_link_fraction, median_page_kb=args.median_page_kb,
+                               duplicate_rate=args.duplicate_rate, write_wet=args.wet,
+                               write_wat=args.wat, seed=args.seed)
+    if args.encodings:
+        spec.encodings = args.encodings
+    return spec
+
+def main():
+    """Write a synthetic corpus"""
+    parser = argparse.ArgumentParser(description="Generate synthetic CommonCrawl-style WARC files with ground-truth labels")
+    parser.add_argument("output_dir", help="Directory for the .warc.gz, .labels.jsonl, (--wet) .warc.wet.gz "
+                                           "and (--wat) .warc.wat.gz files")
+    parser.add_argument("--files", type=int, default=1, help="Number of WARC files. Default: 1")
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    for path, stats in generate_corpus(Path(args.output_dir), spec_from_args(args), args.files):
+        print(f"{path}: {stats['records']} records, {stats['legal']} legal, {stats['duplicates']} duplicates, "
+              f"{stats['file_bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
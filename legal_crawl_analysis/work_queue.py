@@ -0,0 +1,233 @@
+"""
+Lease-based work queue for multi-node crawls
+WARC paths are held in a SQLite file on shared storage. Workers claim a path
+with a time-limited lease, renew it with heartbeats while they run the phases,
+and report stats when done. Leases of crashed workers expire and are re-issued.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    warc_path TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    stats TEXT,
+    error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS work_items_status ON work_items (status, position);
+CREATE TABLE IF NOT EXISTS queue_info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def default_worker_id() -> str:
+    """Host name plus process id, unique across a cluster"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+@dataclass
+class WorkLease:
+    """A claimed work item; valid until lease_expires unless renewed"""
+    warc_path: str
+    worker_id: str
+    lease_expires: float
+    attempt: int
+
+class LeaseLostError(Exception):
+    """The lease expired and the item was re-issued to another worker"""
+
+class WorkQueue:
+    """SQLite-backed queue of WARC paths with leases, heartbeats and expiry"""
+
+    def __init__(self, path: str, lease_seconds: float = 900.0, max_attempts: int = 3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # A fresh connection per operation keeps the queue usable from heartbeat threads
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that holds the database lock from the first read"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def seed(self, warc_paths: Iterable[str], crawl_name: str) -> int:
+        """Add WARC paths (already-known paths are left untouched); returns how many were new"""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO queue_info (key, value) VALUES ('crawl_name', ?)", (crawl_name,))
+            start = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM work_items").fetchone()[0]
+            added = 0
+            for offset, warc_path in enumerate(warc_paths):
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO work_items (warc_path, position, updated_at) VALUES (?, ?, ?)",
+                    (warc_path, start + offset, time.time())
+                )
+                added += cursor.rowcount
+        logger.info(f"Seeded work queue {self.path} with {added} new WARC paths")
+        return added
+
+    def get_crawl_name(self) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM queue_info WHERE key = 'crawl_name'").fetchone()
+        return row[0] if row else None
+
+    def claim(self, worker_id: str) -> Optional[WorkLease]:
+        """Lease the next pending item, or an item whose lease has expired"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT warc_path, attempts, worker_id FROM work_items "
+                "WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) AND attempts < ? "
+                "ORDER BY position LIMIT 1",
+                (now, self.max_attempts)
+            ).fetchone()
+            if row is None:
+                # Expired leases that used up their attempts will never be claimed again
+                conn.execute(
+                    "UPDATE work_items SET status = 'failed', error = 'lease expired', updated_at = ? "
+                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, self.max_attempts)
+                )
+                return None
+
+            warc_path, attempts, previous_worker = row
+            lease_expires = now + self.lease_seconds
+            conn.execute(
+                "UPDATE work_items SET status = 'leased', worker_id = ?, lease_expires = ?, attempts = ?, "
+                "updated_at = ? WHERE warc_path = ?",
+                (worker_id, lease_expires, attempts + 1, now, warc_path)
+            )
+
+        if previous_worker and previous_worker != worker_id:
+            logger.warning(f"Re-issuing {warc_path} after lease of {previous_worker} expired")
+        return WorkLease(warc_path, worker_id, lease_expires, attempts + 1)
+
+    def heartbeat(self, lease: WorkLease) -> WorkLease:
+        """Extend a lease; raises LeaseLostError when another worker has taken the item over"""
+        now = time.time()
+        lease_expires = now + self.lease_seconds
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE work_items SET lease_expires = ?, updated_at = ? "
+                "WHERE warc_path = ? AND worker_id = ? AND status = 'leased'",
+                (lease_expires, now, lease.warc_path, lease.worker_id)
+            )
+        if cursor.rowcount == 0:
+            raise LeaseLostError(f"Lease on {lease.warc_path} lost by {lease.worker_id}")
+        lease.lease_expires = lease_expires
+        return lease
+
+    def complete(self, lease: WorkLease, stats: Dict):
+        """Mark an item done and store the worker's stats for it"""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE work_items SET status = 'done', stats = ?, error = NULL, lease_expires = NULL, "
+                "updated_at = ? WHERE warc_path = ? AND worker_id = ?",
+                (json.dumps(stats), time.time(), lease.warc_path, lease.worker_id)
+            )
+
+    def fail(self, lease: WorkLease, error: str):
+        """Release an item after an error; it is retried until max_attempts is reached"""
+        status = 'failed' if lease.attempt >= self.max_attempts else 'pending'
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE work_items SET status = ?, error = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE warc_path = ? AND worker_id = ?",
+                (status, error[:1000], time.time(), lease.warc_path, lease.worker_id)
+            )
+        logger.warning(f"Work item {lease.warc_path} failed (attempt {lease.attempt}, now {status}): {error}")
+
+    def get_summary(self) -> Dict:
+        """Item counts by status, active workers and summed worker stats"""
+        now = time.time()
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM work_items GROUP BY status").fetchall())
+            workers = [row[0] for row in conn.execute(
+                "SELECT DISTINCT worker_id FROM work_items WHERE status = 'leased' AND lease_expires >= ?", (now,))]
+            stats_rows = conn.execute("SELECT stats FROM work_items WHERE status = 'done' AND stats IS NOT NULL")
+            totals: Dict[str, float] = {}
+            for (stats_json,) in stats_rows:
+                for key, value in json.loads(stats_json).items():
+                    if isinstance(value, (int, float)):
+                        totals[key] = totals.get(key, 0) + value
+
+        return {
+            'crawl_name': self.get_crawl_name(),
+            'total': sum(counts.values()),
+            'pending': counts.get('pending', 0),
+            'leased': counts.get('leased', 0),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'active_workers': workers,
+            'totals': totals
+        }
+
+    def get_failed(self) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT warc_path, attempts, error FROM work_items WHERE status = 'failed' ORDER BY position"
+            ).fetchall()
+        return [{'warc_path': path, 'attempts': attempts, 'error': error} for path, attempts, error in rows]
+
+class LeaseHeartbeat:
+    """Background thread that renews a lease while the work item is processed"""
+
+    def __init__(self, work_queue: WorkQueue, lease: WorkLease, interval_seconds: Optional[float] = None):
+        self.work_queue = work_queue
+        self.lease = lease
+        self.interval_seconds = interval_seconds or work_queue.lease_seconds / 3
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+
+    def __enter__(self) -> 'LeaseHeartbeat':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.work_queue.heartbeat(self.lease)
+            except LeaseLostError as e:
+                logger.error(str(e))
+                self.lost = True
+                return
+            except sqlite3.Error as e:
+                # Shared storage hiccups: keep trying until the lease actually expires
+                logger.warning(f"Heartbeat for {self.lease.warc_path} failed: {e}")